@@ -0,0 +1,173 @@
+# app_logging.py
+# Leveled, structured logging for the API.
+#
+#   init_logging(app)                     # once, in server.py
+#   log = logging.getLogger(__name__)     # in each module
+#   log.info("Import finished", extra={"rows": 20000, "kind": "work"})
+#
+# Records are handed to a queue in the calling thread and written to stderr
+# by a background listener, so a request never blocks on the terminal or a
+# log shipper. Every record carries the request id of the request (or the
+# import job) that produced it.
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import uuid
+from datetime import datetime, timezone
+from flask import g, request
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")        # json | text
+REQUEST_ID_HEADER = "X-Request-ID"
+
+_request_id = contextvars.ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+_listener = None
+_queue = None
+
+
+def current_request_id():
+    return _request_id.get()
+
+
+def set_request_id(request_id):
+    """Bind `request_id` to the current context (thread); returns a reset token."""
+    return _request_id.set(request_id)
+
+
+def reset_request_id(token):
+    _request_id.reset(token)
+
+
+class RequestIdFilter(logging.Filter):
+    # Runs in the emitting thread, before the record crosses the queue
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        return True
+
+
+class AsyncHandler(logging.handlers.QueueHandler):
+    """QueueHandler that renders the message and traceback up front but leaves
+    the formatting (JSON or text) to the listener thread."""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        doc = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            doc["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and not key.startswith("_"):
+                doc[key] = value
+        if record.exc_text:
+            doc["exc"] = record.exc_text
+        return json.dumps(doc, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        extra = " ".join(f"{k}={v}" for k, v in vars(record).items()
+                         if k not in _RECORD_FIELDS and not k.startswith("_"))
+        line = f"{self.formatTime(record)} {record.levelname:<7} [{getattr(record, 'request_id', None) or '-'}] " \
+               f"{record.name}: {record.getMessage()}"
+        if extra:
+            line += f" | {extra}"
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+def _start_listener():
+    global _listener
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+    _listener = logging.handlers.QueueListener(_queue, stream, respect_handler_level=False)
+    _listener.start()
+
+
+def _restart_after_fork():
+    # The listener thread does not survive fork(); give the child its own
+    global _queue
+    if _listener is None:
+        return
+    _queue = queue.SimpleQueue()
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, AsyncHandler):
+            handler.queue = _queue
+    _start_listener()
+
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+
+def setup_logging(level=LOG_LEVEL):
+    """Route the root logger through the async queue handler (idempotent)."""
+    global _queue
+    if _listener is not None:
+        return
+    _queue = queue.SimpleQueue()
+    handler = AsyncHandler(_queue)
+    handler.addFilter(RequestIdFilter())
+    root = logging.getLogger()
+    for old in list(root.handlers):
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(level)
+    _start_listener()
+    os.register_at_fork(after_in_child=_restart_after_fork)
+    atexit.register(_stop_listener)
+
+
+def _assign_request_id():
+    incoming = request.headers.get(REQUEST_ID_HEADER, "")
+    # Accept the proxy's id if it looks sane, otherwise mint one
+    rid = incoming if 0 < len(incoming) <= 64 and incoming.isprintable() else uuid.uuid4().hex[:16]
+    g._request_id_token = set_request_id(rid)
+
+
+def _echo_request_id(response):
+    rid = current_request_id()
+    if rid:
+        response.headers[REQUEST_ID_HEADER] = rid
+    return response
+
+
+def _clear_request_id(exc=None):
+    token = g.pop("_request_id_token", None)
+    if token is not None:
+        try:
+            reset_request_id(token)
+        except ValueError:
+            pass
+
+
+def init_logging(app):
+    setup_logging()
+    app.before_request(_assign_request_id)
+    app.after_request(_echo_request_id)
+    app.teardown_request(_clear_request_id)
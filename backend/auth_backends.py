@@ -0,0 +1,129 @@
+# auth_backends.py
+# Where ID tokens get verified. verify_token() / verify_id_token_cached() in
+# auth_utils ask get_verifier() instead of calling firebase_admin directly.
+#
+#   AUTH_BACKEND=firebase   (default) Google-issued Firebase ID tokens
+#   AUTH_BACKEND=local      RS256 tokens minted by LocalTokenIssuer - for load
+#                           tests and offline development only
+#
+# Both sides of local mode (the API and whoever issues tokens, e.g.
+# benchmarks/load_driver.py) read the same PEM key from LOCAL_AUTH_KEY_PATH;
+# it is generated on first use if missing.
+import logging
+import os
+import tempfile
+import threading
+import time
+import jwt
+
+AUTH_BACKEND = os.getenv("AUTH_BACKEND", "firebase")
+LOCAL_AUTH_KEY_PATH = os.getenv(
+    "LOCAL_AUTH_KEY_PATH", os.path.join(tempfile.gettempdir(), "portal-local-auth.pem"))
+LOCAL_AUTH_ISSUER = "portal-local-auth"
+LOCAL_AUTH_AUDIENCE = "technician-portal"
+LOCAL_TOKEN_TTL = 3600
+
+log = logging.getLogger(__name__)
+
+
+class FirebaseVerifier:
+    """Production: firebase_admin.auth.verify_id_token (loads credentials on first use)."""
+
+    name = "firebase"
+
+    def verify(self, id_token):
+        import firebase_app  # noqa: F401  (initializes the Firebase app once)
+        from firebase_admin import auth
+        return auth.verify_id_token(id_token)
+
+
+def load_local_key(path=LOCAL_AUTH_KEY_PATH):
+    """Private key for local mode; created (0600) if `path` does not exist yet."""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    if not os.path.exists(path):
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        pem = key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+        try:
+            # O_EXCL: if another worker got there first, use its key
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, "wb") as f:
+                f.write(pem)
+            return key
+        except FileExistsError:
+            time.sleep(0.1)
+    with open(path, "rb") as f:
+        return serialization.load_pem_private_key(f.read(), password=None)
+
+
+class LocalTokenIssuer:
+    """Mints Firebase-shaped RS256 ID tokens for local mode."""
+
+    def __init__(self, key=None):
+        self.key = key or load_local_key()
+
+    def issue(self, uid, email, name="", ttl=LOCAL_TOKEN_TTL):
+        now = int(time.time())
+        claims = {
+            "iss": LOCAL_AUTH_ISSUER,
+            "aud": LOCAL_AUTH_AUDIENCE,
+            "sub": uid,
+            "email": email,
+            "name": name,
+            "iat": now,
+            "exp": now + ttl,
+        }
+        return jwt.encode(claims, self.key, algorithm="RS256")
+
+
+class LocalVerifier:
+    """Verifies LocalTokenIssuer tokens: signature, exp, iss and aud."""
+
+    name = "local"
+
+    def __init__(self, public_key=None):
+        self.public_key = public_key or load_local_key().public_key()
+
+    def verify(self, id_token):
+        claims = jwt.decode(
+            id_token,
+            self.public_key,
+            algorithms=["RS256"],
+            audience=LOCAL_AUTH_AUDIENCE,
+            issuer=LOCAL_AUTH_ISSUER,
+        )
+        # Same shape as firebase_admin's decoded token
+        claims["uid"] = claims["sub"]
+        return claims
+
+
+_verifier = None
+_verifier_lock = threading.Lock()
+
+
+def get_verifier():
+    global _verifier
+    if _verifier is None:
+        with _verifier_lock:
+            if _verifier is None:
+                if AUTH_BACKEND == "local":
+                    log.warning("AUTH_BACKEND=local: accepting locally issued tokens, never enable in production",
+                                extra={"key_path": LOCAL_AUTH_KEY_PATH})
+                    _verifier = LocalVerifier()
+                elif AUTH_BACKEND == "firebase":
+                    _verifier = FirebaseVerifier()
+                else:
+                    raise ValueError(f"Unknown AUTH_BACKEND: {AUTH_BACKEND}")
+    return _verifier
+
+
+def set_verifier(verifier):
+    """Swap the verifier in-process (benchmarks); clears nothing else."""
+    global _verifier
+    with _verifier_lock:
+        _verifier = verifier
@@ -1,6 +1,72 @@
 # auth_utils.py
+import copy
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
 from flask import request, jsonify
-from firebase_admin import auth
+from auth_backends import get_verifier
+from metrics import observe_token_verify
+
+# === Verified-token cache ===
+# Firebase ID tokens live ~1h and the calendar sends the same one to /me/,
+# /work/ and /travel/ back to back, so keep decoded claims around until the
+# token's own `exp` (or the TTL below, whichever comes first).
+TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "1024"))
+TOKEN_CACHE_TTL = float(os.getenv("AUTH_TOKEN_CACHE_TTL", "300"))
+
+# Callers get their own copy of the claims: one that edits them (adds a
+# role, pops a field) must not change what the next request sees
+_token_cache = OrderedDict()   # sha256(token) -> (expires_at, decoded)
+_token_cache_lock = threading.Lock()
+_token_cache_stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+
+def _token_key(id_token):
+    return hashlib.sha256(id_token.encode("utf-8")).hexdigest()
+
+
+def verify_id_token_cached(id_token):
+    """Verify with the configured backend (see auth_backends), reusing recent verifications."""
+    started = time.perf_counter()
+    key = _token_key(id_token)
+    now = time.time()
+    with _token_cache_lock:
+        entry = _token_cache.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                _token_cache.move_to_end(key)
+                _token_cache_stats["hits"] += 1
+                observe_token_verify(time.perf_counter() - started, "hit")
+                return copy.deepcopy(entry[1])
+            del _token_cache[key]
+            _token_cache_stats["expired"] += 1
+        _token_cache_stats["misses"] += 1
+
+    decoded = get_verifier().verify(id_token)
+    observe_token_verify(time.perf_counter() - started, "miss")
+
+    expires_at = min(float(decoded.get("exp", now)), now + TOKEN_CACHE_TTL)
+    if expires_at > now and TOKEN_CACHE_SIZE > 0:
+        with _token_cache_lock:
+            _token_cache[key] = (expires_at, copy.deepcopy(decoded))
+            _token_cache.move_to_end(key)
+            while len(_token_cache) > TOKEN_CACHE_SIZE:
+                _token_cache.popitem(last=False)
+                _token_cache_stats["evictions"] += 1
+    return decoded
+
+
+def token_cache_stats():
+    with _token_cache_lock:
+        return {"size": len(_token_cache), "max_size": TOKEN_CACHE_SIZE, **_token_cache_stats}
+
+
+def clear_token_cache():
+    with _token_cache_lock:
+        _token_cache.clear()
+
 
 def verify_token():
     auth_header = request.headers.get("Authorization")
@@ -9,7 +75,7 @@ def verify_token():
 
     id_token = auth_header.split(" ")[1]
     try:
-        decoded = auth.verify_id_token(id_token)
+        decoded = verify_id_token_cached(id_token)
         return decoded, None, None
     except Exception as e:
         return None, jsonify({"error": str(e)}), 401
@@ -0,0 +1,94 @@
+# bench_calendar_render.py
+# Compare the two /work/ and /travel/ render paths on a synthetic table:
+#   python - fetch RealDictCursor rows, build event dicts, json.dumps
+#   db     - json_build_object per row, streamed from a server-side cursor
+#
+# Needs a database with the portal schema (DB_* env vars, same as the app).
+# Run from backend/:  python -m benchmarks.bench_calendar_render --rows 100000
+import argparse
+import json
+import statistics
+import time
+from db import get_db_connection
+from event_queries import build_event_query, json_event_columns, stream_json_docs
+from routes.work_routes import WORK_SOURCE
+from routes.travel_routes import TRAVEL_SOURCE
+
+SEED_SQL = {
+    "work_events": """
+        INSERT INTO {table} (id, employee_id, date_and_time, customer_name, property, job, visit,
+                             description, job_type, primary_technician, department, visit_status,
+                             address_line, city, state, zipcode)
+        SELECT g, g %% 40, timestamp '2024-01-01' + g * interval '7 minutes',
+               'Customer ' || g %% 500, 'Property ' || g %% 900, (100000 + g)::text, (g %% 7)::text,
+               'Service call ' || g, 'Maintenance', 'Tech ' || g %% 40, 'Dept ' || g %% 5, 'Scheduled',
+               g || ' Main St', 'Houston', 'TX', '770' || lpad((g %% 100)::text, 2, '0')
+        FROM generate_series(1, %s) g
+    """,
+    "travel_events": """
+        INSERT INTO {table} (id, employee_id, planned_start_time_utc, name, property, job_number,
+                             visit_number, description, event_type, technician_name, department_name,
+                             status, additional_technicians)
+        SELECT g, g %% 40, timestamp '2024-01-01' + g * interval '7 minutes',
+               'Travel ' || g, 'Property ' || g %% 900, (100000 + g)::text, (g %% 7)::text,
+               'Drive to site ' || g, 'Travel', 'Tech ' || g %% 40, 'Dept ' || g %% 5, 'Scheduled', NULL
+        FROM generate_series(1, %s) g
+    """,
+}
+
+NO_WINDOW = {"start": None, "end": None, "limit": None, "cursor": None}
+
+
+def render_python(source):
+    sql, values = build_event_query(source.table, source.time_column, source.columns, NO_WINDOW)
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql, values)
+            rows = cur.fetchall()
+    return json.dumps([source.to_event(r) for r in rows], default=str).encode("utf-8")
+
+
+def render_db(source):
+    sql, values = build_event_query(source.table, source.time_column, json_event_columns(source), NO_WINDOW)
+    return b"".join(stream_json_docs(get_db_connection(), sql, values))
+
+
+def bench(fn, source, repeat):
+    timings, size = [], 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = fn(source)
+        timings.append(time.perf_counter() - start)
+        size = len(body)
+    return statistics.median(timings), min(timings), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for base in (WORK_SOURCE, TRAVEL_SOURCE):
+        table = f"bench_{base.table}"
+        source = base._replace(table=table)
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"DROP TABLE IF EXISTS {table}")
+                cur.execute(f"CREATE UNLOGGED TABLE {table} AS SELECT * FROM {base.table} WITH NO DATA")
+                cur.execute(SEED_SQL[base.table].format(table=table), (args.rows,))
+                cur.execute(f"ANALYZE {table}")
+        try:
+            print(f"\n{base.table}: {args.rows:,} events, median of {args.repeat}")
+            for name, fn in (("python", render_python), ("db", render_db)):
+                median, best, size = bench(fn, source, args.repeat)
+                print(f"  {name:<7} median {median * 1000:8.1f} ms   best {best * 1000:8.1f} ms   "
+                      f"{args.rows / median:10,.0f} events/s   {size / 1e6:6.1f} MB")
+        finally:
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+if __name__ == "__main__":
+    main()
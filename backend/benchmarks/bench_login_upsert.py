@@ -0,0 +1,124 @@
+# bench_login_upsert.py
+# /login's database work, old vs new:
+#   select+write - SELECT * by email, then INSERT or an unconditional UPDATE
+#   upsert       - one INSERT ... ON CONFLICT (email) DO UPDATE ... WHERE
+#
+# Each round logs in --users existing users (the common case: nothing
+# changed) and commits after every login, like the route does. Runs against
+# a copy of `users` in a scratch schema; the real table (and its id sequence)
+# is not touched.
+# Latency here is over a local socket; against a remote database add one
+# network round trip per statement (plus one for COMMIT) to each figure.
+#
+# Needs a database with the portal schema (DB_* env vars, same as the app).
+# Run from backend/:  python -m benchmarks.bench_login_upsert --users 2000
+import argparse
+import statistics
+import time
+from db import get_db_connection
+from routes.auth_routes import upsert_login_user
+
+SCHEMA = "bench_login"
+
+
+def login_select_write(cur, uid, name, email):
+    # The handler as it was before the upsert
+    cur.execute("SELECT * FROM users WHERE email = %s", (email,))
+    user = cur.fetchone()
+    if not user:
+        cur.execute("""
+            INSERT INTO users (firebase_uid, name, email, role)
+            VALUES (%s, %s, %s, %s)
+            RETURNING id, email, name, firebase_uid, role
+        """, (uid, name, email, "technician"))
+    else:
+        cur.execute("""
+            UPDATE users
+            SET firebase_uid = %s, name = %s
+            WHERE email = %s
+            RETURNING id, email, name, firebase_uid, role
+        """, (uid, name, email))
+    return cur.fetchone()
+
+
+class CountingCursor:
+    """Counts execute() calls: each one is a network round trip in production."""
+
+    def __init__(self, cur):
+        self.cur = cur
+        self.executes = 0
+
+    def execute(self, *args):
+        self.executes += 1
+        return self.cur.execute(*args)
+
+    def __getattr__(self, name):
+        return getattr(self.cur, name)
+
+
+def wal_bytes(cur):
+    cur.execute("SELECT pg_current_wal_lsn() - '0/0'::pg_lsn AS lsn")
+    return int(cur.fetchone()["lsn"])
+
+
+def bench(conn, fn, users, repeat):
+    timings = []
+    with conn.cursor() as cur:
+        counted = CountingCursor(cur)
+        wal_start = wal_bytes(cur)
+        conn.commit()
+        for _ in range(repeat):
+            for i in range(users):
+                start = time.perf_counter()
+                fn(counted, f"uid-{i}", f"User {i}", f"user{i}@stinte.co")
+                conn.commit()
+                timings.append(time.perf_counter() - start)
+        wal = wal_bytes(cur) - wal_start
+        conn.commit()
+    timings.sort()
+    return {
+        "p50": statistics.median(timings),
+        "p99": timings[int(len(timings) * 0.99) - 1],
+        "wal_per_login": wal / len(timings),
+        "statements": counted.executes / len(timings),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            cur.execute(f"CREATE SCHEMA {SCHEMA}")
+            cur.execute(f"CREATE TABLE {SCHEMA}.users (LIKE public.users INCLUDING ALL)")
+            # The copied id default is nextval('public.users_id_seq'): give the
+            # copy ids of its own so the benchmark never advances the real sequence
+            cur.execute(f"ALTER TABLE {SCHEMA}.users ALTER COLUMN id DROP DEFAULT, "
+                        f"ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY")
+            cur.execute(f"""
+                INSERT INTO {SCHEMA}.users (firebase_uid, name, email, role)
+                SELECT 'uid-' || g, 'User ' || g, 'user' || g || '@stinte.co', 'technician'
+                FROM generate_series(0, %s - 1) g
+            """, (args.users,))
+            cur.execute(f"ANALYZE {SCHEMA}.users")
+            # Unqualified `users` in both variants now resolves to the copy
+            cur.execute(f"SET search_path TO {SCHEMA}, public")
+        conn.commit()
+        try:
+            print(f"\n/login, {args.users:,} returning users x {args.repeat}")
+            for name, fn in (("upsert", upsert_login_user), ("select+write", login_select_write)):
+                r = bench(conn, fn, args.users, args.repeat)
+                print(f"  {name:<13} p50 {r['p50'] * 1000:7.3f} ms   p99 {r['p99'] * 1000:7.3f} ms   "
+                      f"WAL {r['wal_per_login']:6.0f} B/login   {r['statements']:.0f} statement(s)/login")
+        finally:
+            with conn.cursor() as cur:
+                cur.execute("RESET search_path")
+                cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# bench_response_encoding.py
+# Encode time and bytes on the wire for a /work/ response, in memory (no
+# database): rows shaped like the RealDictCursor rows are turned into events
+#   jsonify  - one list through Flask's JSON provider (the old path)
+#   dumps    - one list through response_encoding.dumps (orjson if installed)
+#   stream   - STREAM_BATCH_SIZE batches through encode_items, as /work/ streams
+# and the streamed body is then compressed at several gzip/brotli levels.
+#
+# Run from backend/:  python -m benchmarks.bench_response_encoding --events 10000 100000
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta
+from flask import Flask
+from event_queries import STREAM_BATCH_SIZE
+from response_encoding import available_encodings, compress_stream, dumps, encode_items, orjson
+from routes.work_routes import WORK_SOURCE
+
+LEVELS = [("gzip", {"gzip_level": 1}), ("gzip", {"gzip_level": 6}), ("gzip", {"gzip_level": 9}),
+          ("br", {"brotli_quality": 1}), ("br", {"brotli_quality": 2}), ("br", {"brotli_quality": 5})]
+
+
+def work_rows(count):
+    start = datetime(2025, 1, 6, 7, 0)
+    return [{
+        "id": i,
+        "date_and_time": start + timedelta(minutes=7 * i),
+        "description": f"Service call {i}",
+        "job": str(100000 + i),
+        "property": f"Property {i % 900}",
+        "visit_status": "Scheduled",
+        "primary_technician": f"Tech {i % 40}",
+        "department": f"Dept {i % 5}",
+        "customer_name": f"Customer {i % 500}",
+        "visit": str(i % 7),
+        "job_type": "Maintenance",
+        "address_line": f"{i} Main St",
+        "city": "Houston",
+        "state": "TX",
+        "zipcode": f"770{i % 100:02d}",
+    } for i in range(count)]
+
+
+def encode_jsonify(app, rows):
+    with app.app_context():
+        return app.json.response([WORK_SOURCE.to_event(r) for r in rows]).get_data()
+
+
+def encode_dumps(rows):
+    return dumps([WORK_SOURCE.to_event(r) for r in rows])
+
+
+def stream_chunks(rows):
+    yield b"["
+    for i in range(0, len(rows), STREAM_BATCH_SIZE):
+        chunk = encode_items(WORK_SOURCE.to_event(r) for r in rows[i:i + STREAM_BATCH_SIZE])
+        yield chunk if i == 0 else b"," + chunk
+    yield b"]"
+
+
+def timed(fn, repeat):
+    timings, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON encode time and compressed size for event lists")
+    parser.add_argument("--events", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    print(f"encoder: {'orjson' if orjson else 'json (orjson not installed)'}; "
+          f"codings: {', '.join(available_encodings())}")
+    for count in args.events:
+        rows = work_rows(count)
+        print(f"\n{count:,} events, median of {args.repeat}")
+        print(f"  {'encode':<16}{'ms':>10}{'MB':>10}{'largest chunk':>16}")
+        for name, fn in (
+            ("jsonify", lambda: encode_jsonify(app, rows)),
+            ("dumps", lambda: encode_dumps(rows)),
+            ("stream", lambda: list(stream_chunks(rows))),
+        ):
+            elapsed, body = timed(fn, args.repeat)
+            chunks = body if isinstance(body, list) else [body]
+            size = sum(len(c) for c in chunks)
+            print(f"  {name:<16}{elapsed * 1000:>10.1f}{size / 1e6:>10.2f}{max(map(len, chunks)) / 1e6:>13.2f} MB")
+
+        chunks = list(stream_chunks(rows))
+        identity = sum(len(c) for c in chunks)
+        print(f"  {'compress':<16}{'ms':>10}{'MB':>10}{'ratio':>16}")
+        for encoding, level in LEVELS:
+            if encoding not in available_encodings():
+                continue
+            elapsed, body = timed(lambda: b"".join(compress_stream(iter(chunks), encoding, **level)), args.repeat)
+            label = f"{encoding} {next(iter(level.values()))}"
+            print(f"  {label:<16}{elapsed * 1000:>10.1f}{len(body) / 1e6:>10.2f}{identity / len(body):>15.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# bench_startup.py
+# Cold-start cost of the API: wall time to `import server` (which builds the
+# app) in a fresh interpreter, plus a -X importtime breakdown by top-level
+# package, and what the lazily loaded pieces cost on first use.
+#
+# Needs no database. Run from backend/:
+#   python -m benchmarks.bench_startup --repeat 5
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TIMED_IMPORT = "import time; t = time.perf_counter(); {stmt}; print(time.perf_counter() - t)"
+
+# Loaded on first use, not at startup
+LAZY = {
+    "first upload (pandas, openpyxl)": "import pandas, openpyxl",
+    "first Firebase verification (firebase_admin)": "import firebase_admin.auth",
+}
+
+
+def _python(code, *flags, env=None):
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code],
+        cwd=BACKEND, capture_output=True, text=True, check=True,
+        env={**os.environ, **(env or {})},
+    )
+
+
+def wall_time(stmt, repeat):
+    return statistics.median(
+        float(_python(TIMED_IMPORT.format(stmt=stmt)).stdout.strip().splitlines()[-1]) for _ in range(repeat)
+    )
+
+
+def import_breakdown(stmt):
+    """{top-level package: cumulative microseconds} from -X importtime.
+
+    A package is charged where it was imported from a different package,
+    including whatever it imports in turn (flask's figure contains
+    werkzeug's). The app's own modules are left out.
+    """
+    entries = []
+    for line in _python(stmt, "-X", "importtime").stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        package = name.strip().split(".")[0]
+        if os.path.exists(os.path.join(BACKEND, package + ".py")) or os.path.isdir(os.path.join(BACKEND, package)):
+            package = "backend"
+        entries.append((len(name) - len(name.lstrip()), package, int(cumulative)))
+
+    # -X importtime prints children before their parent (less indented)
+    totals = defaultdict(int)
+    for i, (indent, package, cumulative) in enumerate(entries):
+        parent = next((p for d, p, _ in entries[i + 1:] if d < indent), None)
+        if parent != package and package != "backend":
+            totals[package] += cumulative
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure API cold start")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=12)
+    args = parser.parse_args()
+
+    total = wall_time("import server", args.repeat)
+    print(f"import server (create_app): {total * 1000:8.1f} ms  (median of {args.repeat})")
+
+    print("\nTop packages by cumulative import time:")
+    breakdown = import_breakdown("import server")
+    for name, micros in sorted(breakdown.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"  {name:<28} {micros / 1000:8.1f} ms")
+
+    print("\nDeferred to first use:")
+    baseline = wall_time("import server", args.repeat)
+    for label, stmt in LAZY.items():
+        extra = wall_time(f"import server; {stmt}", args.repeat) - baseline
+        print(f"  {label:<46} +{max(extra, 0) * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+# bench_suite.py
+# End-to-end benchmarks for the upload, calendar and login paths, driven
+# through the Flask test client against a scratch database (see fixtures.py).
+#
+# Per scenario: throughput, p50/p99 latency and peak RSS of this process.
+#
+# Run from backend/:
+#   python -m benchmarks.bench_suite --rows 20000 --technicians 40 --noise 0.1
+#   python -m benchmarks.bench_suite --json after.json --baseline before.json
+#
+# With --baseline, scenarios whose p50 or throughput got worse by more than
+# --tolerance are listed and the exit status is 1.
+import argparse
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from benchmarks.fixtures import bench_app, bench_database, bench_token, install_local_auth, seed_people
+
+
+# === Measurement ===
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # No /proc: fall back to the process-lifetime peak (KB on Linux)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+@contextmanager
+def rss_sampler(interval=0.005):
+    """Track peak resident memory while the block runs; yields a dict."""
+    result = {"start": _rss_bytes(), "peak": 0}
+    result["peak"] = result["start"]
+    stop = threading.Event()
+
+    def sample():
+        while not stop.is_set():
+            result["peak"] = max(result["peak"], _rss_bytes())
+            stop.wait(interval)
+
+    thread = threading.Thread(target=sample, daemon=True)
+    thread.start()
+    try:
+        yield result
+    finally:
+        stop.set()
+        thread.join()
+        result["peak"] = max(result["peak"], _rss_bytes())
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def run_scenario(name, unit, fn, iterations):
+    """Call fn() `iterations` times; fn returns the number of `unit`s it handled."""
+    latencies, units = [], 0
+    with rss_sampler() as rss:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            units += fn()
+            latencies.append(time.perf_counter() - t0)
+        total = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "scenario": name,
+        "iterations": iterations,
+        "throughput": units / total if total else 0.0,
+        "unit": unit,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "peak_rss_mb": rss["peak"] / 2**20,
+        "rss_growth_mb": (rss["peak"] - rss["start"]) / 2**20,
+    }
+
+
+# === Scenarios ===
+
+def _check(response, expected=200):
+    if response.status_code != expected:
+        raise RuntimeError(f"{response.request.path}: HTTP {response.status_code} {response.get_data(as_text=True)[:300]}")
+    return response
+
+
+def upload(client, auth, path, kind, mode):
+    def fn():
+        with open(path, "rb") as f:
+            response = _check(client.post(
+                f"/api/{kind}/upload/?wait=1&mode={mode}",
+                data={"file": (f, os.path.basename(path))},
+                headers=auth, content_type="multipart/form-data"))
+        return response.get_json()["stats"]["rows"]
+    return fn
+
+
+def get_events(client, auth, url):
+    def fn():
+        response = _check(client.get(url, headers=auth))
+        body = response.get_data()
+        return 1 if body else 0
+    return fn
+
+
+def walk_pages(client, auth, url, limit):
+    # Requests per iteration vary with the data; count pages as the unit
+    def fn():
+        pages, cursor = 0, None
+        while True:
+            page_url = f"{url}?limit={limit}" + (f"&cursor={cursor}" if cursor else "")
+            response = _check(client.get(page_url, headers=auth))
+            pages += 1
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                return pages
+    return fn
+
+
+def logins(client, uids):
+    state = {"i": 0}
+
+    def fn():
+        uid = uids[state["i"] % len(uids)]
+        state["i"] += 1
+        token = bench_token(uid, f"{uid}@stinte.co")
+        _check(client.post("/api/login", json={"idToken": token}))
+        return 1
+    return fn
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Portal benchmark suite")
+    parser.add_argument("--rows", type=int, default=20_000, help="rows per synthetic export")
+    parser.add_argument("--technicians", type=int, default=40)
+    parser.add_argument("--noise", type=float, default=0.1, help="share of rows with mangled technician names")
+    parser.add_argument("--uploads", type=int, default=3, help="iterations per upload scenario")
+    parser.add_argument("--requests", type=int, default=30, help="iterations per read scenario")
+    parser.add_argument("--only", help="comma-separated scenario name prefixes")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="compare against a previous --json file")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+
+    results = []
+    with bench_database(), tempfile.TemporaryDirectory(prefix="portal-bench-") as tmp:
+        from benchmarks.synthetic import technician_names, write_travel_export, write_work_export
+        install_local_auth()
+        technicians = technician_names(args.technicians)
+        uids = seed_people(technicians)
+        admin = {"Authorization": f"Bearer {bench_token(uids[0], 'bench0@stinte.co')}"}
+        tech = {"Authorization": f"Bearer {bench_token(uids[1], 'bench1@stinte.co')}"}
+
+        files = {}
+        for kind, writer in (("work", write_work_export), ("travel", write_travel_export)):
+            for ext in ("xlsx", "csv"):
+                files[kind, ext] = writer(os.path.join(tmp, f"{kind}.{ext}"), args.rows, technicians, args.noise)
+
+        client = bench_app().test_client()
+        window = "start=2025-01-06T00:00:00&end=2025-01-13T00:00:00"
+        scenarios = [
+            ("upload_work_xlsx_append", "rows/s", upload(client, admin, files["work", "xlsx"], "work", "append"), args.uploads),
+            ("upload_work_csv_append", "rows/s", upload(client, admin, files["work", "csv"], "work", "append"), args.uploads),
+            ("upload_work_xlsx_upsert", "rows/s", upload(client, admin, files["work", "xlsx"], "work", "upsert"), args.uploads),
+            ("upload_travel_xlsx_append", "rows/s", upload(client, admin, files["travel", "xlsx"], "travel", "append"), args.uploads),
+            ("upload_travel_xlsx_upsert", "rows/s", upload(client, admin, files["travel", "xlsx"], "travel", "upsert"), args.uploads),
+            ("get_work_all", "req/s", get_events(client, admin, "/api/work/"), args.requests),
+            ("get_work_all_db_render", "req/s", get_events(client, admin, "/api/work/?render=db"), args.requests),
+            ("get_work_week", "req/s", get_events(client, admin, f"/api/work/?{window}"), args.requests),
+            ("get_work_week_technician", "req/s", get_events(client, tech, f"/api/work/?{window}"), args.requests),
+            ("get_work_paged_500", "pages/s", walk_pages(client, admin, "/api/work/", 500), max(1, args.requests // 10)),
+            ("get_travel_all", "req/s", get_events(client, admin, "/api/travel/"), args.requests),
+            ("get_travel_week", "req/s", get_events(client, admin, f"/api/travel/?{window}"), args.requests),
+            ("get_calendar_week", "req/s", get_events(client, admin, f"/api/calendar/?{window}"), args.requests),
+            ("login", "req/s", logins(client, uids), args.requests * 10),
+        ]
+        only = tuple(args.only.split(",")) if args.only else None
+        for name, unit, fn, iterations in scenarios:
+            if only and not name.startswith(only):
+                continue
+            result = run_scenario(name, unit, fn, iterations)
+            results.append(result)
+            print(f"{name:<28} {result['throughput']:>10,.1f} {unit:<7}  p50 {result['p50_ms']:8.1f} ms  "
+                  f"p99 {result['p99_ms']:8.1f} ms  peak RSS {result['peak_rss_mb']:6.0f} MB "
+                  f"(+{result['rss_growth_mb']:.0f})", flush=True)
+
+    meta = {"rows": args.rows, "technicians": args.technicians, "noise": args.noise}
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            before = {r["scenario"]: r for r in json.load(f)["results"]}
+        regressions = []
+        for r in results:
+            b = before.get(r["scenario"])
+            if not b:
+                continue
+            if r["p50_ms"] > b["p50_ms"] * (1 + args.tolerance):
+                regressions.append(f"{r['scenario']}: p50 {b['p50_ms']:.1f} -> {r['p50_ms']:.1f} ms")
+            if r["throughput"] < b["throughput"] * (1 - args.tolerance):
+                regressions.append(f"{r['scenario']}: {b['throughput']:.1f} -> {r['throughput']:.1f} {r['unit']}")
+        if regressions:
+            print("\nRegressions vs baseline:")
+            for line in regressions:
+                print("  " + line)
+            sys.exit(1)
+        print("\nNo regressions vs baseline.")
+
+
+if __name__ == "__main__":
+    main()
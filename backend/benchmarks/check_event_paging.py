@@ -0,0 +1,84 @@
+# check_event_paging.py
+# Fails (exit 1) if walking /api/work/ and /api/travel/ page by page
+# (limit + X-Next-Cursor) loses, repeats or reorders events compared to one
+# unpaged request. The seeded tables mix events with and without a time, and
+# page sizes are chosen so pages end both on a timed row and inside the
+# timeless tail.
+#
+# Run from backend/ (same database setup as the benchmark suite):
+#   python -m benchmarks.check_event_paging
+import argparse
+import sys
+from benchmarks.fixtures import bench_app, bench_database, bench_token, install_local_auth, seed_people
+
+TIMED_ROWS = 23
+TIMELESS_ROWS = 7
+PAGE_SIZES = [1, 3, 5, 22, 23, 24, 50]
+
+
+def seed_events(employee_ids):
+    from db import get_db_connection
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            for i in range(TIMED_ROWS + TIMELESS_ROWS):
+                employee_id = employee_ids[i % len(employee_ids)]
+                # Timed rows share timestamps in pairs, so ids break ties
+                when = f"2025-01-{6 + i // 2:02d} 08:00:00" if i < TIMED_ROWS else None
+                cur.execute(
+                    "INSERT INTO work_events (employee_id, date_and_time, job, visit, description) "
+                    "VALUES (%s, %s, %s, '1', %s)",
+                    (employee_id, when, str(100000 + i), f"Call {i}"))
+                cur.execute(
+                    "INSERT INTO travel_events (employee_id, planned_start_time_utc, job_number, visit_number, name) "
+                    "VALUES (%s, %s, %s, '1', %s)",
+                    (employee_id, when, str(100000 + i), f"Travel {i}"))
+
+
+def walk(client, headers, path, query, limit):
+    """Every event id from following X-Next-Cursor; None on an error response."""
+    ids, cursor = [], None
+    while True:
+        url = f"{path}?{query}&limit={limit}" + (f"&cursor={cursor}" if cursor else "")
+        response = client.get(url, headers=headers)
+        if response.status_code != 200:
+            print(f"  {url} -> {response.status_code} {response.get_data(as_text=True)[:200]}")
+            return None
+        ids.extend(event["id"] for event in response.get_json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return ids
+
+
+def main():
+    argparse.ArgumentParser(description="Check keyset paging over events with and without a time").parse_args()
+    from db import get_db_connection
+
+    failures = 0
+    with bench_database():
+        install_local_auth()
+        uids = seed_people(["Tech A", "Tech B"], users=3)
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT id, firebase_uid FROM users WHERE firebase_uid = ANY(%s)", (uids,))
+                user_ids = {r["firebase_uid"]: r["id"] for r in cur.fetchall()}
+        seed_events([user_ids[uids[1]], user_ids[uids[2]]])
+
+        client = bench_app().test_client()
+        for label, uid in (("admin", uids[0]), ("technician", uids[1])):
+            headers = {"Authorization": f"Bearer {bench_token(uid, f'{uid}@stinte.co')}"}
+            for path in ("/api/work/", "/api/travel/"):
+                for query in ("render=python", "render=db"):
+                    expected = [e["id"] for e in client.get(f"{path}?{query}", headers=headers).get_json()]
+                    bad = [limit for limit in PAGE_SIZES if walk(client, headers, path, query, limit) != expected]
+                    failures += len(bad)
+                    detail = f"limit {', '.join(map(str, bad))} differ" if bad else f"{len(expected)} events"
+                    print(f"{'FAIL' if bad else 'ok':<5} {label:<11} {path}?{query:<14} {detail}")
+
+    if failures:
+        print(f"\n{failures} paged walk(s) differ from the unpaged list.")
+        sys.exit(1)
+    print("\nPaging returns every event exactly once, in order.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+# check_query_plans.py
+# Fails (exit 1) if a hot query has no index to use and would read its table
+# with a sequential scan. Runs EXPLAIN against a scratch schema built by the
+# migrations (see fixtures.py), with sequential scans disabled: the planner
+# then picks an index whenever one can serve the query, and a Seq Scan left
+# in the plan means none can.
+#
+# The queries come from the code that runs them where it exposes them
+# (build_event_query, LOGIN_UPSERT_SQL, USER_BY_UID_SQL, MATERIALS_SQL).
+#
+# Run from backend/ (in CI after a schema change):
+#   python -m benchmarks.check_query_plans
+# tests/test_query_plans.py runs the same checks under pytest.
+import argparse
+import json
+import sys
+from datetime import datetime, timedelta
+from benchmarks.fixtures import bench_database
+
+# Enough rows, spread like production, for the planner's estimates to mean something
+SEED_SQL = [
+    """INSERT INTO users (firebase_uid, name, email)
+       SELECT 'uid-' || g, 'User ' || g, 'user' || g || '@stinte.co' FROM generate_series(1, 500) g""",
+    """INSERT INTO materials (type, category, description)
+       SELECT CASE WHEN g % 2 = 0 THEN 'data' ELSE 'electrical' END, 'Cat ' || g % 20, 'Item ' || g
+       FROM generate_series(1, 2000) g""",
+    """INSERT INTO work_events (employee_id, date_and_time, job, visit, description)
+       SELECT g % 40, timestamp '2024-01-01' + g * interval '17 minutes', (100000 + g)::text, '1', 'Call ' || g
+       FROM generate_series(1, 50000) g""",
+    """INSERT INTO travel_events (employee_id, planned_start_time_utc, job_number, visit_number, name)
+       SELECT g % 40, timestamp '2024-01-01' + g * interval '17 minutes', (100000 + g)::text, '1', 'Travel ' || g
+       FROM generate_series(1, 50000) g""",
+    "ANALYZE",
+]
+SEED_START, SEED_SPAN = datetime(2024, 1, 1), timedelta(minutes=17 * 50000)
+
+WINDOW = {"start": "2025-01-06 00:00:00", "end": "2025-01-13 00:00:00", "limit": None, "cursor": None}
+
+
+def hot_queries():
+    """[(name, sql, values)] for what a page load or an upload runs."""
+    from event_queries import MAX_PAGE_SIZE, build_event_query, json_event_columns
+    from materials_catalog import MATERIALS_SQL
+    from routes.auth_routes import LOGIN_UPSERT_SQL
+    from routes.travel_routes import TRAVEL_SOURCE
+    from routes.work_routes import WORK_SOURCE
+    from user_cache import USER_BY_UID_SQL
+
+    queries = [
+        ("user by firebase_uid", USER_BY_UID_SQL, ("uid-1",)),
+        ("login upsert", LOGIN_UPSERT_SQL, {"uid": "uid-1", "name": "A", "email": "a@stinte.co"}),
+        ("materials lists", MATERIALS_SQL, ()),
+        ("import job status", "SELECT * FROM import_jobs WHERE id = %s", ("job",)),
+        ("tombstones since",
+         "SELECT event_id FROM event_tombstones WHERE source = %s AND deleted_xid >= %s::xid8",
+         ("work_events", "1000")),
+    ]
+    for source in (WORK_SOURCE, TRAVEL_SOURCE):
+        label = source.table.split("_")[0]
+        variants = [
+            ("technician window", WINDOW, 7),
+            ("admin window", WINDOW, None),
+            ("technician page", dict(WINDOW, end=None, limit=MAX_PAGE_SIZE,
+                                     cursor=("2025-01-06 08:00:00", 10)), 7),
+            ("unbounded page", dict(WINDOW, start=None, end=None, limit=MAX_PAGE_SIZE,
+                                    cursor=("2025-01-06 08:00:00", 10)), 7),
+            ("admin sync", dict(WINDOW, since=1000), None),
+        ]
+        for name, params, employee_id in variants:
+            sql, values = build_event_query(source.table, source.time_column, source.columns, params, employee_id)
+            queries.append((f"{label} {name}", sql, values))
+        sql, values = build_event_query(source.table, source.time_column, json_event_columns(source), WINDOW, 7)
+        queries.append((f"{label} technician window (render=db)", sql, values))
+    return queries
+
+
+def plan_nodes(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def explain(cur, sql, values):
+    cur.execute("EXPLAIN (FORMAT JSON) " + sql, values)
+    plan = cur.fetchone()["QUERY PLAN"]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return list(plan_nodes(plan[0]["Plan"]))
+
+
+def seed_months():
+    from event_partitions import add_months, month_start
+
+    month, last = month_start(SEED_START), month_start(SEED_START + SEED_SPAN)
+    while month <= last:
+        yield month
+        month = add_months(month, 1)
+
+
+def seed(conn):
+    """Fill the scratch schema and leave `conn` with sequential scans disabled."""
+    from event_partitions import PARTITIONED_TABLES, ensure_partitions
+
+    with conn.cursor() as cur:
+        # Month partitions as imports would have created them
+        for table in PARTITIONED_TABLES:
+            ensure_partitions(cur, table, seed_months())
+        for sql in SEED_SQL:
+            cur.execute(sql)
+        conn.commit()
+        cur.execute("SET enable_seqscan = off")
+
+
+def check_plan(cur, sql, values):
+    """(tables read by a Seq Scan, one-line summary of the plan's scans)."""
+    nodes = explain(cur, sql, values)
+    scans = [n for n in nodes if "Relation Name" in n or "Index Name" in n]
+    seq = [n["Relation Name"] for n in scans if n["Node Type"] == "Seq Scan"]
+    detail = ", ".join(
+        n["Node Type"]
+        + (f" on {n['Relation Name']}" if "Relation Name" in n else "")
+        + (f" using {n['Index Name']}" if "Index Name" in n else "")
+        for n in scans
+    )
+    return seq, detail
+
+
+def main():
+    argparse.ArgumentParser(description="Check that hot queries are served by indexes").parse_args()
+    from db import get_db_connection
+
+    failures = 0
+    with bench_database():
+        with get_db_connection() as conn:
+            seed(conn)
+            with conn.cursor() as cur:
+                for name, sql, values in hot_queries():
+                    seq, detail = check_plan(cur, sql, values)
+                    failures += bool(seq)
+                    print(f"{'FAIL' if seq else 'ok':<5} {name:<40} {detail}")
+            conn.rollback()
+
+    if failures:
+        print(f"\n{failures} hot quer{'y' if failures == 1 else 'ies'} would scan a whole table; "
+              "add an index in a new migration.")
+        sys.exit(1)
+    print("\nEvery hot query is served by an index.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# fixtures.py
+# Database, auth and app scaffolding for the benchmark suite.
+#
+# bench_database() points the app's pool at a scratch schema:
+#   - DB_HOST set in the environment: that server (same DB_* vars as the app)
+#   - otherwise: a throwaway local Postgres via `pgserver` (pip install pgserver),
+#     no Docker or system install needed
+# The scratch schema is first on search_path and built by the app's own
+# migrations, so unqualified table names resolve to it and the real tables
+# are never touched.
+import os
+import tempfile
+from contextlib import contextmanager
+import config
+
+SCHEMA = "bench_suite"
+
+
+def _start_pgserver():
+    try:
+        import pgserver
+    except ImportError:
+        raise SystemExit("No DB_HOST set and pgserver is not installed: "
+                         "pip install pgserver, or point DB_* at a scratch database.")
+    data_dir = os.getenv("BENCH_PGDATA") or tempfile.mkdtemp(prefix="portal-bench-pg-")
+    server = pgserver.get_server(data_dir, cleanup_mode="delete" if not os.getenv("BENCH_PGDATA") else None)
+    # pgserver listens on a unix socket in its data directory, trust auth
+    config.DB_CONFIG.update(host=data_dir, dbname="postgres", user="postgres", password="")
+    return server
+
+
+def _create_schema(conn):
+    from schema_migrations import migrate
+    with conn.cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        cur.execute(f"CREATE SCHEMA {SCHEMA}")
+    conn.commit()
+    # Unqualified DDL lands in the first search_path schema: the scratch one
+    migrate(conn)
+
+
+@contextmanager
+def bench_database():
+    """Point the app at a fresh scratch schema for the duration of the block."""
+    server = None if os.getenv("DB_HOST") else _start_pgserver()
+    # libpq applies PGOPTIONS to every new connection, including the pool's
+    previous_options = os.environ.get("PGOPTIONS")
+    os.environ["PGOPTIONS"] = f"-c search_path={SCHEMA},public"
+
+    import db
+    with db.get_db_connection() as conn:
+        _create_schema(conn)
+    try:
+        yield
+    finally:
+        db.get_pool().closeall()
+        import psycopg2
+        import psycopg2.extras
+        with psycopg2.connect(**config.DB_CONFIG, cursor_factory=psycopg2.extras.RealDictCursor) as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        if previous_options is None:
+            os.environ.pop("PGOPTIONS", None)
+        else:
+            os.environ["PGOPTIONS"] = previous_options
+        if server is not None:
+            server.cleanup()
+
+
+def seed_people(technicians, users=50):
+    """Insert one employee per technician name and `users` portal users.
+
+    Returns the Firebase UIDs of the seeded users; the first is an admin
+    (sees every event), the rest technicians.
+    """
+    import psycopg2.extras
+    from db import get_db_connection
+    uids = [f"bench-uid-{i}" for i in range(users)]
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            psycopg2.extras.execute_values(
+                cur, "INSERT INTO employees (name, position, email) VALUES %s",
+                [(name, "Technician", f"tech{i}@stinte.co") for i, name in enumerate(technicians)])
+            psycopg2.extras.execute_values(
+                cur, "INSERT INTO users (firebase_uid, name, email, role) VALUES %s",
+                [(uid, f"Bench User {i}", f"bench{i}@stinte.co", "admin" if i == 0 else "technician")
+                 for i, uid in enumerate(uids)])
+    from employee_directory import employee_directory
+    employee_directory.invalidate()
+    return uids
+
+
+# === Local auth ===
+# Tokens come from the local RS256 issuer (auth_backends), so the numbers
+# measure the portal, not Google's certificate fetch.
+
+_issuer = None
+
+
+def bench_token(uid, email):
+    return _issuer.issue(uid, email, name=uid)
+
+
+def install_local_auth():
+    global _issuer
+    from auth_backends import LocalTokenIssuer, LocalVerifier, set_verifier
+    from auth_utils import clear_token_cache
+    _issuer = LocalTokenIssuer()
+    set_verifier(LocalVerifier(_issuer.key.public_key()))
+    clear_token_cache()
+
+
+def bench_app():
+    """The API as built by server.create_app() (no Firebase credentials needed in local auth)."""
+    from server import create_app
+    return create_app()
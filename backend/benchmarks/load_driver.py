@@ -0,0 +1,201 @@
+# load_driver.py
+# Concurrent load against a running API in local-auth mode.
+#
+#   AUTH_BACKEND=local gunicorn server:app -w 2 --threads 4       # the API
+#   python -m benchmarks.load_driver --url http://127.0.0.1:8000 \
+#       --users 40 --concurrency 16 --duration 60
+#
+# Both processes must see the same LOCAL_AUTH_KEY_PATH (the default is a
+# fixed file in the temp dir). Virtual users log in once (which creates
+# their users row), then replay MIX until --duration runs out. Reports
+# throughput and per-endpoint latency percentiles.
+import argparse
+import http.client
+import json
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from urllib.parse import urlsplit
+from auth_backends import LocalTokenIssuer
+
+# (name, weight) - roughly what the calendar page and the admin pages send
+MIX = [
+    ("login", 2),
+    ("me", 15),
+    ("work_week", 22),
+    ("travel_week", 22),
+    ("calendar_week", 8),
+    ("materials_data", 8),
+    ("materials_electrical", 8),
+    ("employees", 8),
+    ("company_info", 5),
+    ("upload_work", 1),
+    ("upload_travel", 1),
+]
+
+WEEK = "start=2025-01-06T00:00:00&end=2025-01-13T00:00:00"
+
+
+class Client:
+    """One keep-alive HTTP connection per driver thread."""
+
+    def __init__(self, base_url, timeout=60):
+        parts = urlsplit(base_url)
+        cls = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self._make = lambda: cls(parts.hostname, parts.port, timeout=timeout)
+        self.conn = self._make()
+
+    def request(self, method, path, body=None, headers=None):
+        for attempt in (1, 2):
+            try:
+                self.conn.request(method, path, body=body, headers=headers or {})
+                response = self.conn.getresponse()
+                return response.status, response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                self.conn.close()
+                self.conn = self._make()
+                if attempt == 2:
+                    raise
+
+
+def multipart(field, filename, payload):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field}\"; filename=\"{filename}\"\r\n"
+        f"Content-Type: application/octet-stream\r\n\r\n"
+    ).encode("utf-8") + payload + f"\r\n--{boundary}--\r\n".encode("utf-8")
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+class Driver:
+    def __init__(self, args):
+        self.args = args
+        self.issuer = LocalTokenIssuer()
+        self.users = [(f"load-uid-{i}", f"load{i}@stinte.co") for i in range(args.users)]
+        self.tokens = {uid: self.issuer.issue(uid, email, name=f"Load User {i}")
+                       for i, (uid, email) in enumerate(self.users)}
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock = threading.Lock()
+        self.uploads = {}
+        self.mix = MIX if args.upload_rows else [(n, w) for n, w in MIX if not n.startswith("upload_")]
+
+    def prepare_uploads(self):
+        # Small CSV exports; imports run in the background (202 + job)
+        from benchmarks.synthetic import technician_names, write_travel_export, write_work_export
+        tmp = tempfile.mkdtemp(prefix="portal-load-")
+        names = technician_names(20)
+        for kind, writer in (("work", write_work_export), ("travel", write_travel_export)):
+            path = writer(os.path.join(tmp, f"{kind}.csv"), self.args.upload_rows, names, noise=0.1)
+            with open(path, "rb") as f:
+                self.uploads[kind] = f.read()
+
+    def call(self, client, name, uid):
+        auth = {"Authorization": f"Bearer {self.tokens[uid]}"}
+        if name == "login":
+            body = json.dumps({"idToken": self.tokens[uid]}).encode("utf-8")
+            return client.request("POST", "/api/login", body, {"Content-Type": "application/json"})
+        if name.startswith("upload_"):
+            kind = name.split("_", 1)[1]
+            body, content_type = multipart("file", f"{kind}.csv", self.uploads[kind])
+            return client.request("POST", f"/api/{kind}/upload/", body, {**auth, "Content-Type": content_type})
+        path = {
+            "me": "/api/me/",
+            "work_week": f"/api/work/?{WEEK}",
+            "travel_week": f"/api/travel/?{WEEK}",
+            "calendar_week": f"/api/calendar/?{WEEK}",
+            "materials_data": "/api/materials/data",
+            "materials_electrical": "/api/materials/electrical",
+            "employees": "/api/employees",
+            "company_info": "/api/company-info",
+        }[name]
+        return client.request("GET", path, headers=auth)
+
+    def record(self, name, elapsed, status):
+        with self.lock:
+            self.latencies[name].append(elapsed)
+            if status >= 400:
+                self.errors[name] += 1
+
+    def worker(self, seed, deadline):
+        rng = random.Random(seed)
+        client = Client(self.args.url)
+        names, weights = zip(*self.mix)
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            uid = rng.choice(self.users)[0]
+            start = time.perf_counter()
+            try:
+                status, _ = self.call(client, name, uid)
+            except Exception:
+                status = 599
+            self.record(name, time.perf_counter() - start, status)
+
+    def run(self):
+        if self.args.upload_rows:
+            self.prepare_uploads()
+
+        # Every virtual user logs in once so its users row exists
+        client = Client(self.args.url)
+        for uid, _ in self.users:
+            status, body = self.call(client, "login", uid)
+            if status != 200:
+                raise SystemExit(f"Login failed for {uid}: HTTP {status} {body[:200]!r} "
+                                 "(is the API running with AUTH_BACKEND=local and the same key?)")
+
+        deadline = time.perf_counter() + self.args.duration
+        started = time.perf_counter()
+        threads = [threading.Thread(target=self.worker, args=(i, deadline)) for i in range(self.args.concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return time.perf_counter() - started
+
+    def report(self, elapsed):
+        total = sum(len(v) for v in self.latencies.values())
+        errors = sum(self.errors.values())
+        print(f"\n{total:,} requests in {elapsed:.1f}s with {self.args.concurrency} threads: "
+              f"{total / elapsed:,.1f} req/s, {errors} errors\n")
+        print(f"{'endpoint':<22}{'count':>8}{'errors':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+        everything = []
+        for name, _ in self.mix:
+            values = sorted(self.latencies.get(name, []))
+            if not values:
+                continue
+            everything.extend(values)
+            print(f"{name:<22}{len(values):>8}{self.errors[name]:>8}"
+                  + "".join(f"{v * 1000:>10.1f}" for v in (
+                      statistics.median(values), _pct(values, 90), _pct(values, 99), values[-1])))
+        everything.sort()
+        if everything:
+            print(f"{'all':<22}{len(everything):>8}{errors:>8}"
+                  + "".join(f"{v * 1000:>10.1f}" for v in (
+                      statistics.median(everything), _pct(everything, 90), _pct(everything, 99), everything[-1])))
+
+
+def _pct(sorted_values, pct):
+    return sorted_values[max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a realistic request mix against a running API")
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--users", type=int, default=40, help="virtual users (each gets its own token)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--upload-rows", type=int, default=200, help="rows per upload in the mix; 0 disables uploads")
+    args = parser.parse_args()
+
+    driver = Driver(args)
+    elapsed = driver.run()
+    driver.report(elapsed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# local_replica.py
+# Starts a local streaming replica of the database named by the DB_* vars,
+# for trying read-replica routing (DB_REPLICAS) without any infrastructure:
+# a base backup of the primary, started as a hot standby on another port.
+#
+# Run from backend/, as a user Postgres will run as (not root):
+#   python -m benchmarks.local_replica --port 5433
+# then start the app with the DB_REPLICAS value it prints. Ctrl-C stops the
+# replica (and deletes it unless --data-dir was given).
+#
+# Needs the Postgres server binaries: --bin-dir, else `pg_ctl` on PATH, else
+# the ones bundled with pgserver.
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from config import DB_CONFIG
+
+
+def find_bin_dir():
+    pg_ctl = shutil.which("pg_ctl")
+    if pg_ctl:
+        return os.path.dirname(pg_ctl)
+    try:
+        import pgserver
+    except ImportError:
+        raise SystemExit("No Postgres binaries found: pass --bin-dir, or pip install pgserver.")
+    return os.path.join(os.path.dirname(pgserver.__file__), "pginstall", "bin")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local hot standby of the DB_* database")
+    parser.add_argument("--port", type=int, default=5433)
+    parser.add_argument("--data-dir", help="keep the replica here (default: a temp dir, removed on exit)")
+    parser.add_argument("--bin-dir", help="directory holding pg_basebackup and pg_ctl")
+    args = parser.parse_args()
+
+    bin_dir = args.bin_dir or find_bin_dir()
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="portal-replica-")
+    host = DB_CONFIG["host"]
+    # A primary on a unix socket gets a replica on one too (in its data dir)
+    socket_primary = host.startswith("/")
+    replica_host = data_dir if socket_primary else "127.0.0.1"
+
+    env = dict(os.environ, PGPASSWORD=DB_CONFIG["password"] or "")
+    options = f"-p {args.port} -k {data_dir if socket_primary else '/tmp'} -c hot_standby=on"
+    options += " -c listen_addresses=''" if socket_primary else " -c listen_addresses=127.0.0.1"
+    pg_ctl = os.path.join(bin_dir, "pg_ctl")
+    started = False
+    try:
+        subprocess.run([
+            os.path.join(bin_dir, "pg_basebackup"),
+            "-h", host, "-p", str(DB_CONFIG["port"]), "-U", DB_CONFIG["user"],
+            "-D", data_dir, "-R", "-X", "stream", "-c", "fast",
+        ], env=env, check=True)
+        os.chmod(data_dir, 0o700)
+        subprocess.run([pg_ctl, "-D", data_dir, "-o", options, "-l", os.path.join(data_dir, "replica.log"),
+                        "-w", "start"], check=True)
+        started = True
+
+        print(f"\nReplica of {host}:{DB_CONFIG['port']} streaming at {replica_host}:{args.port}")
+        print(f"  export DB_REPLICAS={replica_host}:{args.port}")
+        print("Ctrl-C to stop.")
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if started:
+            subprocess.run([pg_ctl, "-D", data_dir, "-m", "fast", "-w", "stop"])
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
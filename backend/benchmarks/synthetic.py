@@ -0,0 +1,132 @@
+# synthetic.py
+# BuildOps-style work and travel exports for the benchmarks.
+#
+#   names = technician_names(40)
+#   write_work_export("work.xlsx", rows=20000, technicians=names, noise=0.1)
+#
+# Headers match WORK_COLUMNS / TRAVEL_COLUMNS in the routes. `noise` is the
+# share of rows whose technician name is mangled the way hand-typed BuildOps
+# data is (case, stray spaces, a typo, "Last, First"), so the fuzzy matcher
+# gets real work to do. Output is deterministic for a given seed.
+import csv
+import random
+from datetime import datetime, timedelta
+from routes.travel_routes import TRAVEL_COLUMNS
+from routes.work_routes import WORK_COLUMNS
+
+FIRST = ["James", "Maria", "Robert", "Linda", "Michael", "Patricia", "David", "Jennifer", "Carlos",
+         "Thanh", "Minh", "Aisha", "Kevin", "Sofia", "Daniel", "Grace", "Luis", "Hannah", "Omar", "Emily"]
+LAST = ["Nguyen", "Smith", "Garcia", "Johnson", "Tran", "Williams", "Martinez", "Brown", "Lopez",
+        "Davis", "Pham", "Miller", "Hernandez", "Wilson", "Le", "Anderson", "Gonzalez", "Thomas"]
+CITIES = [("Houston", "TX", "770"), ("Dallas", "TX", "752"), ("Austin", "TX", "787"), ("San Antonio", "TX", "782")]
+JOB_TYPES = ["Maintenance", "Service Call", "Install", "Inspection", "Warranty"]
+DEPARTMENTS = ["HVAC", "Electrical", "Low Voltage", "Fire Alarm", "Plumbing"]
+STATUSES = ["Scheduled", "Dispatched", "In Progress", "Complete", "On Hold"]
+
+START = datetime(2025, 1, 6, 7, 0)
+
+
+def technician_names(count, seed=7):
+    """`count` distinct "First Last" names."""
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < count:
+        names.add(f"{rng.choice(FIRST)} {rng.choice(LAST)}")
+    return sorted(names)
+
+
+def _typo(rng, name):
+    # Swap two adjacent letters inside a word
+    i = rng.randrange(1, len(name) - 2)
+    if " " in name[i:i + 2]:
+        return name
+    return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+
+
+def noisy_name(rng, name, noise):
+    """Return `name`, or with probability `noise` a hand-typed variant of it."""
+    if rng.random() >= noise:
+        return name
+    kind = rng.randrange(4)
+    if kind == 0:
+        return name.upper() if rng.random() < 0.5 else name.lower()
+    if kind == 1:
+        return "  " + name.replace(" ", "  ") + " "
+    if kind == 2:
+        return _typo(rng, name)
+    first, _, last = name.partition(" ")
+    return f"{last}, {first}"
+
+
+def work_rows(rows, technicians, noise=0.0, seed=11):
+    rng = random.Random(seed)
+    for i in range(rows):
+        city, state, zip_prefix = rng.choice(CITIES)
+        when = START + timedelta(hours=4 * (i // len(technicians)), minutes=rng.randrange(0, 180))
+        yield {
+            "Date and Time": when,
+            "Customer Name": f"Customer {rng.randrange(800)}",
+            "Property": f"Property {rng.randrange(1500)}",
+            "Job": str(400000 + i // 3),
+            "Visit": str(i % 3 + 1),
+            "Description": f"{rng.choice(JOB_TYPES)} - unit {rng.randrange(1, 40)}",
+            "Job Type": rng.choice(JOB_TYPES),
+            "Primary Technician": noisy_name(rng, rng.choice(technicians), noise),
+            "Department": rng.choice(DEPARTMENTS),
+            "Visit Status": rng.choice(STATUSES),
+            "Last Updated Time Utc": when - timedelta(days=rng.randrange(1, 10)),
+            "Address Line 1": f"{rng.randrange(100, 9999)} {rng.choice(LAST)} St",
+            "City": city,
+            "State": state,
+            "Zipcode": f"{zip_prefix}{rng.randrange(10, 99)}",
+        }
+
+
+def travel_rows(rows, technicians, noise=0.0, seed=13):
+    rng = random.Random(seed)
+    for i in range(rows):
+        when = START + timedelta(hours=4 * (i // len(technicians)), minutes=rng.randrange(0, 180))
+        extra = rng.sample(technicians, k=min(len(technicians), rng.choice((0, 0, 1, 2))))
+        yield {
+            "Planned Start Time Utc": when,
+            "Name": f"Travel to Property {rng.randrange(1500)}",
+            "Property": f"Property {rng.randrange(1500)}",
+            "Job Number": str(400000 + i // 3),
+            "Visit Number": str(i % 3 + 1),
+            "Description": "Drive to site",
+            "Event Type": rng.choice(("Travel", "Travel", "Break", "Meeting")),
+            "Technician Name": noisy_name(rng, rng.choice(technicians), noise),
+            "Department Name": rng.choice(DEPARTMENTS),
+            "Status": rng.choice(STATUSES),
+            "Additional Technicians": ", ".join(extra) or None,
+            "Last Updated Time Utc": when - timedelta(days=rng.randrange(1, 10)),
+        }
+
+
+def _write(path, headers, rows):
+    if str(path).lower().endswith(".csv"):
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=headers)
+            writer.writeheader()
+            for row in rows:
+                writer.writerow({k: v.strftime("%Y-%m-%d %H:%M:%S") if isinstance(v, datetime) else v
+                                 for k, v in row.items()})
+        return path
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(headers)
+    for row in rows:
+        ws.append([row[h] for h in headers])
+    wb.save(path)
+    return path
+
+
+def write_work_export(path, rows, technicians, noise=0.0, seed=11):
+    """Write a work export (.xlsx or .csv by extension); returns `path`."""
+    return _write(path, list(WORK_COLUMNS), work_rows(rows, technicians, noise, seed))
+
+
+def write_travel_export(path, rows, technicians, noise=0.0, seed=13):
+    """Write a travel export (.xlsx or .csv by extension); returns `path`."""
+    return _write(path, list(TRAVEL_COLUMNS), travel_rows(rows, technicians, noise, seed))
@@ -10,6 +10,39 @@ DB_CONFIG = {
     "port": os.getenv("DB_PORT", "5432"),
 }
 
+# Background import threads per web worker (import_jobs.py)
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", "2"))
+
+# === Connection Pool Config (per gunicorn worker process) ===
+# maxconn defaults to one per request thread, one per import thread and one
+# spare. Imports run on their own connections outside the pool; their slots
+# cover anything they look up through it, so request threads never wait on
+# the pool. Raise it if you raise --threads or IMPORT_WORKERS.
+DB_POOL_CONFIG = {
+    "minconn": int(os.getenv("DB_POOL_MIN", "1")),
+    "maxconn": int(os.getenv("DB_POOL_MAX", str(int(os.getenv("GUNICORN_THREADS", "4")) + IMPORT_WORKERS + 1))),
+    "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),        # seconds to wait for a free connection
+    "max_uses": int(os.getenv("DB_POOL_MAX_USES", "1000")),      # recycle after N checkouts
+    "ping_after": float(os.getenv("DB_POOL_PING_AFTER", "30")),  # health-check if idle this long (seconds)
+}
+
+# === Read Replicas ===
+def _host_port(entry):
+    host, _, port = entry.rpartition(":")
+    return (host, port) if port.isdigit() else (entry, DB_CONFIG["port"])
+
+
+# Comma-separated host[:port] list of streaming replicas of the database
+# above (same name and credentials). Read-only handlers are spread across
+# them round-robin; leave unset to send everything to the primary.
+DB_REPLICAS = [_host_port(e.strip()) for e in os.getenv("DB_REPLICAS", "").split(",") if e.strip()]
+DB_REPLICA_CONFIG = {
+    "max_lag": float(os.getenv("DB_REPLICA_MAX_LAG", "10")),           # seconds behind before reads skip it
+    "lag_check_interval": float(os.getenv("DB_REPLICA_LAG_CHECK", "5")),  # seconds between lag checks
+    "retry_after": float(os.getenv("DB_REPLICA_RETRY_AFTER", "30")),    # seconds to skip a replica that failed
+    "connect_timeout": int(os.getenv("DB_REPLICA_CONNECT_TIMEOUT", "2")),  # seconds before a connect counts as down
+}
+
 # === Firebase Config Path ===
 # Set this env variable locally or default to a local secure path
 FIREBASE_CREDENTIALS = os.getenv(
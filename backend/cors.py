@@ -7,4 +7,5 @@ def init_cors(app):
         supports_credentials=True,
         methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
         allow_headers=["Content-Type", "Authorization", "X-User-Id", "X-User-Name"],
+        expose_headers=["X-Next-Cursor", "X-Request-ID"],
     )
@@ -1,9 +1,436 @@
+import itertools
+import logging
+import os
+import threading
+import time
 import psycopg2
 import psycopg2.extras
-from config import DB_CONFIG
+import psycopg2.extensions
+from config import DB_CONFIG, DB_POOL_CONFIG, DB_REPLICAS, DB_REPLICA_CONFIG
+from metrics import TimedCursor
 
-def get_db_connection():
-    return psycopg2.connect(
-        **DB_CONFIG,
-        cursor_factory=psycopg2.extras.RealDictCursor
-    )
+log = logging.getLogger(__name__)
+
+# Seconds a replica's replay is behind the primary; 0 when it has replayed
+# everything it received, or when the server is not a standby at all
+REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END AS lag
+"""
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection frees up within the checkout timeout."""
+
+
+class PooledConnection:
+    """Thin proxy around a psycopg2 connection that goes back to the pool.
+
+    Behaves like the raw connection (cursor(), commit(), rollback(), ...),
+    but `close()` and leaving a `with` block return it to the pool instead
+    of tearing down the socket.
+    """
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        conn = self.__dict__.get("_conn")
+        if conn is None:
+            raise psycopg2.InterfaceError("connection already returned to pool")
+        return getattr(conn, name)
+
+    def cursor(self, *args, **kwargs):
+        # Statement time is charged to the current request (see metrics.py)
+        return TimedCursor(self.__getattr__("cursor")(*args, **kwargs))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Same commit/rollback semantics as a psycopg2 connection block
+        try:
+            if self._conn is not None and not self._conn.closed:
+                if exc_type is None:
+                    self._conn.commit()
+                else:
+                    self._conn.rollback()
+        finally:
+            self.close()
+        return False
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.putconn(conn)
+
+    # Safety net for handlers that return early without closing
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """Process-wide, thread-safe psycopg2 connection pool.
+
+    - blocks up to `timeout` seconds for a free connection, then raises PoolTimeout
+    - pings connections that sat idle longer than `ping_after` seconds on checkout
+    - closes and replaces a connection once it has served `max_uses` checkouts
+    - with `readonly=True`, opens every connection as a read-only session
+    """
+
+    def __init__(self, minconn, maxconn, timeout, max_uses, ping_after, readonly=False, **connect_kwargs):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_uses = max_uses
+        self.ping_after = ping_after
+        self.readonly = readonly
+        self._connect_kwargs = connect_kwargs
+        self._cond = threading.Condition()
+        self._idle = []       # [(conn, last_used_monotonic)]
+        self._uses = {}       # id(conn) -> checkout count
+        self._in_use = 0
+        self._waiting = 0
+        self._stats = {
+            "checkouts": 0,
+            "timeouts": 0,
+            "connects": 0,
+            "recycled": 0,
+            "discarded": 0,
+            "wait_time_total_ms": 0.0,
+            "wait_time_max_ms": 0.0,
+        }
+        for _ in range(minconn):
+            self._idle.append((self._connect(), time.monotonic()))
+
+    def _connect(self):
+        conn = psycopg2.connect(**self._connect_kwargs)
+        if self.readonly:
+            # A write sent here by mistake fails, even against a server
+            # that is not a standby
+            conn.set_session(readonly=True)
+        # The network I/O above runs unlocked; the bookkeeping must not
+        with self._cond:
+            self._uses[id(conn)] = 0
+            self._stats["connects"] += 1
+        return conn
+
+    def _discard(self, conn):
+        with self._cond:
+            self._uses.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _healthy(self, conn, last_used):
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.ping_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        with self._cond:
+            self._waiting += 1
+            try:
+                while not self._idle and self._in_use >= self.maxconn:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeout(
+                            f"no database connection available after {self.timeout}s "
+                            f"({self._in_use}/{self.maxconn} in use)"
+                        )
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+            # Reserve the slot before doing any network I/O outside the lock
+            self._in_use += 1
+            idle = self._idle.pop() if self._idle else None
+
+        try:
+            conn = None
+            if idle is not None:
+                if self._healthy(*idle):
+                    conn = idle[0]
+                else:
+                    with self._cond:
+                        self._stats["discarded"] += 1
+                    self._discard(idle[0])
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        waited_ms = (time.monotonic() - start) * 1000
+        with self._cond:
+            self._uses[id(conn)] = self._uses.get(id(conn), 0) + 1
+            self._stats["checkouts"] += 1
+            self._stats["wait_time_total_ms"] += waited_ms
+            self._stats["wait_time_max_ms"] = max(self._stats["wait_time_max_ms"], waited_ms)
+        return conn
+
+    def putconn(self, conn):
+        keep = not conn.closed
+        if keep and conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            # Never hand the next request a half-finished transaction
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                keep = False
+
+        with self._cond:
+            self._in_use -= 1
+            if keep and self._uses.get(id(conn), 0) >= self.max_uses:
+                self._stats["recycled"] += 1
+                keep = False
+            if keep:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        if not keep:
+            self._discard(conn)
+
+    def closeall(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def stats(self):
+        with self._cond:
+            checkouts = self._stats["checkouts"]
+            return {
+                "min_size": self.minconn,
+                "max_size": self.maxconn,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                **self._stats,
+                "wait_time_avg_ms": self._stats["wait_time_total_ms"] / checkouts if checkouts else 0.0,
+            }
+
+
+class Replica:
+    """One read replica: its pool plus whether reads may use it right now.
+
+    Handed to PooledConnection in place of the pool, so a connection that
+    comes back broken (the replica went away mid-request) marks it down.
+    """
+
+    def __init__(self, host, port, connect_timeout, retry_after):
+        self.name = f"{host}:{port}"
+        # minconn=0: a replica that is down must not fail app startup
+        self.pool = ConnectionPool(
+            **dict(DB_POOL_CONFIG, minconn=0),
+            **dict(DB_CONFIG, host=host, port=port, connect_timeout=connect_timeout),
+            readonly=True,
+            cursor_factory=psycopg2.extras.RealDictCursor,
+        )
+        self.retry_after = retry_after
+        self.down_until = 0.0
+        self.lag = None
+        self.lag_checked_at = None
+        self.lagging = False
+
+    def mark_down(self):
+        self.down_until = time.monotonic() + self.retry_after
+        # Its idle connections are most likely dead too
+        self.pool.closeall()
+        log.warning("Read replica unavailable; reading from the primary",
+                    extra={"replica": self.name, "retry_after_sec": self.retry_after})
+
+    def putconn(self, conn):
+        broken = bool(conn.closed)
+        self.pool.putconn(conn)
+        if broken:
+            self.mark_down()
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "down": self.down_until > time.monotonic(),
+            "lagging": self.lagging,
+            "lag_seconds": self.lag,
+            **self.pool.stats(),
+        }
+
+
+class ReplicaRouter:
+    """Round-robin over read replicas, skipping ones that are down or behind.
+
+    - a replica that fails to connect, or drops a connection, is skipped
+      for `retry_after` seconds
+    - replication lag is measured on checkout, at most every
+      `lag_check_interval` seconds per replica; one more than `max_lag`
+      seconds behind is skipped until a later check finds it caught up
+    - connect() returns None when no replica is usable; callers go to the primary
+    """
+
+    def __init__(self, replicas, max_lag, lag_check_interval, retry_after, connect_timeout):
+        self.replicas = [Replica(host, port, connect_timeout, retry_after) for host, port in replicas]
+        self.max_lag = max_lag
+        self.lag_check_interval = lag_check_interval
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+        self._stats = {"replica_reads": 0, "primary_fallbacks": 0}
+
+    def _check_lag(self, replica, conn):
+        now = time.monotonic()
+        if replica.lag_checked_at is not None and now - replica.lag_checked_at < self.lag_check_interval:
+            return not replica.lagging
+        with conn.cursor() as cur:
+            cur.execute(REPLICA_LAG_SQL)
+            lag = float(cur.fetchone()["lag"])
+        conn.rollback()
+        with self._lock:
+            was_lagging = replica.lagging
+            replica.lag, replica.lag_checked_at = lag, now
+            replica.lagging = lag > self.max_lag
+        if replica.lagging and not was_lagging:
+            log.warning("Read replica is lagging; reading from the primary",
+                        extra={"replica": replica.name, "lag_seconds": round(lag, 1)})
+        elif was_lagging and not replica.lagging:
+            log.info("Read replica caught up", extra={"replica": replica.name, "lag_seconds": round(lag, 1)})
+        return not replica.lagging
+
+    def connect(self):
+        start = next(self._next)
+        for i in range(len(self.replicas)):
+            replica = self.replicas[(start + i) % len(self.replicas)]
+            if replica.down_until > time.monotonic():
+                continue
+            try:
+                conn = replica.pool.getconn()
+            except PoolTimeout:
+                # Busy, not broken: try the next one
+                continue
+            except psycopg2.OperationalError:
+                replica.mark_down()
+                continue
+            usable = broken = False
+            try:
+                usable = self._check_lag(replica, conn)
+            except psycopg2.Error:
+                broken = True
+            finally:
+                if not usable:
+                    replica.pool.putconn(conn)
+            if broken:
+                # After the putconn, so closeall() also drops this connection
+                replica.mark_down()
+            if not usable:
+                continue
+            with self._lock:
+                self._stats["replica_reads"] += 1
+            return PooledConnection(replica, conn)
+        with self._lock:
+            self._stats["primary_fallbacks"] += 1
+        return None
+
+    def closeall(self):
+        for replica in self.replicas:
+            replica.pool.closeall()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        return {**stats, "replicas": [r.stats() for r in self.replicas]}
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+# Pools inherited across fork are kept referenced so their sockets are never
+# closed (and the server-side session terminated) from the child process.
+_inherited_pools = []
+
+_router = None
+_router_pid = None
+
+
+def get_pool():
+    """Return this process's pool, creating it lazily (and again after a fork)."""
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                if _pool is not None:
+                    _inherited_pools.append(_pool)
+                _pool = ConnectionPool(
+                    **DB_POOL_CONFIG,
+                    **DB_CONFIG,
+                    cursor_factory=psycopg2.extras.RealDictCursor,
+                )
+                _pool_pid = pid
+    return _pool
+
+
+def get_replica_router():
+    """This process's ReplicaRouter (None without DB_REPLICAS), recreated after a fork."""
+    global _router, _router_pid
+    if not DB_REPLICAS:
+        return None
+    pid = os.getpid()
+    if _router is None or _router_pid != pid:
+        with _pool_lock:
+            if _router is None or _router_pid != pid:
+                if _router is not None:
+                    _inherited_pools.append(_router)
+                _router = ReplicaRouter(DB_REPLICAS, **DB_REPLICA_CONFIG)
+                _router_pid = pid
+    return _router
+
+
+def connect_unpooled():
+    """A connection of its own, outside the pool; the caller closes it.
+
+    For long-running background work (imports) that must not hold one of
+    the request threads' pool slots.
+    """
+    return psycopg2.connect(**DB_CONFIG, cursor_factory=psycopg2.extras.RealDictCursor)
+
+
+def get_db_connection(readonly=False):
+    """A pooled connection to the primary.
+
+    readonly=True asks for a read replica instead (see ReplicaRouter) and
+    falls back to the primary when none is configured or usable. Only for
+    reads that tolerate DB_REPLICA_MAX_LAG seconds of staleness: uploads,
+    login and deletes stay on the primary.
+    """
+    if readonly:
+        router = get_replica_router()
+        conn = router.connect() if router is not None else None
+        if conn is not None:
+            return conn
+    pool = get_pool()
+    return PooledConnection(pool, pool.getconn())
+
+
+def pool_stats():
+    if _pool is None or _pool_pid != os.getpid():
+        return {"initialized": False}
+    stats = {"initialized": True, **_pool.stats()}
+    if _router is not None and _router_pid == os.getpid():
+        stats["read_replicas"] = _router.stats()
+    return stats
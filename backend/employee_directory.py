@@ -0,0 +1,38 @@
+# employee_directory.py
+# Per-worker cache of the employees table, shared by /employees and the uploads.
+import os
+from collections import namedtuple
+from employee_matcher import normalize_name
+from table_cache import TableCache
+
+# How often (seconds) a read re-checks the table fingerprint before trusting the snapshot
+CHECK_INTERVAL = float(os.getenv("EMPLOYEE_CACHE_CHECK_INTERVAL", "30"))
+
+EmployeeSnapshot = namedtuple("EmployeeSnapshot", ["version", "fingerprint", "records", "by_id", "name_map"])
+
+
+class EmployeeDirectory(TableCache):
+    """Employees loaded once per worker and reloaded only when the table changes."""
+
+    def __init__(self, check_interval=CHECK_INTERVAL):
+        super().__init__("employees", check_interval)
+
+    def _load(self, cur, version, fingerprint):
+        cur.execute("""
+            SELECT id, name, position, phone, email, certifications
+            FROM employees
+            ORDER BY id;
+        """)
+        records = [dict(r) for r in cur.fetchall()]
+        name_map = {}
+        for r in records:
+            if r["name"]:
+                name_map[normalize_name(r["name"].strip())] = r["id"]
+        return EmployeeSnapshot(version, fingerprint, records, {r["id"]: r for r in records}, name_map)
+
+    def info(self):
+        snap = self._snapshot
+        return {**super().info(), "employees": len(snap.records) if snap else 0}
+
+
+employee_directory = EmployeeDirectory()
@@ -0,0 +1,107 @@
+# employee_matcher.py
+# Technician-name -> employee id resolution shared by the upload routes.
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+FUZZY_CUTOFF = 0.6          # same cutoff get_close_matches used before
+LOW_CONFIDENCE = 0.85       # fuzzy matches below this are reported back to the uploader
+MAX_CANDIDATES = 25         # best n-gram candidates scored with SequenceMatcher
+
+
+# === Name normalization helpers ===
+def normalize_name(name):
+    return "".join(e.lower() for e in str(name) if e.isalnum())
+
+
+def _trigrams(s):
+    padded = f"  {s} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TechnicianMatcher:
+    """Resolve raw technician names against `employee_map` ({normalized name: id}).
+
+    Build one per upload: each distinct normalized name is resolved once and
+    memoized. Fuzzy lookups only score employees that share character
+    trigrams with the query (or, failing that, whose length could still
+    reach the cutoff) instead of every key in the map.
+    """
+
+    def __init__(self, employee_map, cutoff=FUZZY_CUTOFF, low_confidence=LOW_CONFIDENCE):
+        self.employee_map = employee_map
+        self.cutoff = cutoff
+        self.low_confidence = low_confidence
+        self._memo = {}             # normalized name -> (employee_id, matched key, confidence)
+        self._raw = {}              # normalized name -> first raw spelling seen
+        self._grams = defaultdict(set)
+        self._by_length = defaultdict(list)
+        for key in employee_map:
+            for gram in _trigrams(key):
+                self._grams[gram].add(key)
+            self._by_length[len(key)].append(key)
+
+    def _length_window(self, n):
+        # ratio = 2M / (a + b) <= 2 * min(a, b) / (a + b), so lengths outside
+        # this window can never reach the cutoff.
+        lo = int(n * self.cutoff / (2 - self.cutoff))
+        hi = int(n * (2 - self.cutoff) / self.cutoff) + 1
+        return lo, hi
+
+    def _candidates(self, norm):
+        lo, hi = self._length_window(len(norm))
+        counts = defaultdict(int)
+        for gram in _trigrams(norm):
+            for key in self._grams.get(gram, ()):
+                if lo <= len(key) <= hi:
+                    counts[key] += 1
+        if counts:
+            return sorted(counts, key=counts.get, reverse=True)[:MAX_CANDIDATES]
+        return [key for n in range(lo, hi + 1) for key in self._by_length.get(n, ())]
+
+    def _resolve(self, norm):
+        if norm in self.employee_map:
+            return self.employee_map[norm], norm, 1.0
+
+        best_key, best_score = None, 0.0
+        sm = SequenceMatcher()
+        sm.set_seq2(norm)
+        for key in self._candidates(norm):
+            sm.set_seq1(key)
+            if sm.real_quick_ratio() < self.cutoff or sm.quick_ratio() < self.cutoff:
+                continue
+            score = sm.ratio()
+            if score > best_score:
+                best_key, best_score = key, score
+        if best_key is None or best_score < self.cutoff:
+            return None, None, 0.0
+        return self.employee_map[best_key], best_key, best_score
+
+    def match(self, tech_name_raw):
+        """Return (employee_id, matched key, confidence); (None, None, 0.0) if unmatched."""
+        if tech_name_raw is None or tech_name_raw != tech_name_raw:  # None / NaN
+            return None, None, 0.0
+        norm = normalize_name(str(tech_name_raw).strip())
+        if not norm:
+            return None, None, 0.0
+        if norm not in self._memo:
+            self._memo[norm] = self._resolve(norm)
+            self._raw[norm] = tech_name_raw
+        return self._memo[norm]
+
+    def find_employee_id(self, tech_name_raw):
+        return self.match(tech_name_raw)[0]
+
+    def report(self):
+        """Unmatched names and low-confidence fuzzy matches seen so far."""
+        unmatched, low_confidence = [], []
+        for norm, (emp_id, key, score) in self._memo.items():
+            if emp_id is None:
+                unmatched.append(self._raw[norm])
+            elif score < self.low_confidence:
+                low_confidence.append({
+                    "technician": self._raw[norm],
+                    "employee_id": emp_id,
+                    "matched_name": key,
+                    "confidence": round(score, 3),
+                })
+        return unmatched, low_confidence
@@ -0,0 +1,219 @@
+# event_partitions.py
+# Monthly range partitions of work_events and travel_events
+# (migrations/0005_partition_events.sql):
+#   - imports create the months their rows fall in before writing them, in
+#     a short transaction of their own (create_partitions_for)
+#   - archive_partitions() detaches months older than the retention window
+#     into the `archive` schema (or drops them). Nothing in the app runs
+#     it: retention is manual, or a scheduled job (cron, the platform's
+#     scheduler) running the `archive` command below, e.g. monthly
+#   - clear_events() empties a table by dropping its partitions, instead of
+#     a row-by-row DELETE that writes WAL for every row and leaves bloat
+#
+#   python event_partitions.py                          # list partitions
+#   python event_partitions.py archive --keep-months 24 [--drop]
+import argparse
+import os
+from contextlib import closing
+from datetime import datetime
+import psycopg2.extras
+from db import connect_unpooled, get_db_connection
+from event_sync import record_tombstones
+
+# table -> partition key
+PARTITIONED_TABLES = {"work_events": "date_and_time", "travel_events": "planned_start_time_utc"}
+
+ARCHIVE_SCHEMA = "archive"
+# Months kept attached by `archive` when --keep-months is not given; 0 keeps everything
+EVENT_RETENTION_MONTHS = int(os.getenv("EVENT_RETENTION_MONTHS", "0"))
+
+# pg_advisory_xact_lock(key, hashtext(table)): one partition creator per table
+PARTITION_LOCK_KEY = 0x1A51
+# How long creating a month may wait for its locks before the import fails,
+# rather than sit in the lock queue ahead of calendar reads
+PARTITION_LOCK_TIMEOUT = os.getenv("PARTITION_LOCK_TIMEOUT", "10s")
+
+PARTITIONS_SQL = """
+    SELECT c.relname AS name,
+           pg_get_expr(c.relpartbound, c.oid) AS bound,
+           pg_get_expr(c.relpartbound, c.oid) = 'DEFAULT' AS is_default
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = to_regclass(%s)
+    ORDER BY c.relname
+"""
+
+
+def month_start(value):
+    return datetime(value.year, value.month, 1)
+
+
+def next_month(month):
+    return datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_{month:%Y_%m}"
+
+
+def list_partitions(cur, table):
+    """[{name, month}] oldest first; month is None for the default partition."""
+    cur.execute(PARTITIONS_SQL, (table,))
+    partitions = []
+    for row in cur.fetchall():
+        month = None
+        if not row["is_default"]:
+            # "FOR VALUES FROM ('2025-01-01 00:00:00') TO ('2025-02-01 00:00:00')"
+            month = datetime.fromisoformat(row["bound"].split("'")[1])
+        partitions.append({"name": row["name"], "month": month})
+    partitions.sort(key=lambda p: (p["month"] is None, p["month"] or datetime.min))
+    return partitions
+
+
+def _create_partition(cur, table, column, month):
+    name, upper = partition_name(table, month), next_month(month)
+    # Created on its own and then attached. ATTACH takes SHARE UPDATE
+    # EXCLUSIVE on the parent, which reads do not wait for, but ACCESS
+    # EXCLUSIVE on the default partition, which they do (any query that is
+    # not pruned to one month scans the default). Hence the short
+    # transaction in create_partitions_for().
+    cur.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)")
+    # Proves the new table holds only its month, so ATTACH skips scanning it
+    cur.execute(f"ALTER TABLE {name} ADD CONSTRAINT {name}_bound "
+                f"CHECK ({column} IS NOT NULL AND {column} >= %s AND {column} < %s)", (month, upper))
+    # Rows written while the month had no partition sit in the default one
+    cur.execute(f"""
+        WITH moved AS (
+            DELETE FROM {table}_default WHERE {column} >= %s AND {column} < %s RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """, (month, upper))
+    cur.execute(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)", (month, upper))
+    # Redundant with the partition bound from here on
+    cur.execute(f"ALTER TABLE {name} DROP CONSTRAINT {name}_bound")
+
+
+def ensure_partitions(cur, table, months):
+    """Create any missing monthly partitions of `table` for `months`; returns the names created.
+
+    The caller commits, promptly: until then the default partition stays
+    locked against reads.
+    """
+    column = PARTITIONED_TABLES[table]
+    wanted = {month_start(m) for m in months if m is not None}
+    existing = {p["month"] for p in list_partitions(cur, table)}
+    if wanted <= existing:
+        return []
+    # Two imports into the same table must not race to create one month
+    cur.execute("SELECT pg_advisory_xact_lock(%s, hashtext(%s))", (PARTITION_LOCK_KEY, table))
+    existing = {p["month"] for p in list_partitions(cur, table)}
+    created = []
+    for month in sorted(wanted - existing):
+        _create_partition(cur, table, column, month)
+        created.append(partition_name(table, month))
+    return created
+
+
+def create_partitions_for(conn, table, source):
+    """Create the partitions rows in `source` (a staging table on `conn`) will land in.
+
+    Missing months are created on a separate connection and committed
+    straight away, so the default partition's lock is not held for the
+    rest of the import. `conn` must hold no lock on `table`'s partitions:
+    ATTACH needs ACCESS EXCLUSIVE on `{table}_default`, and even a plain
+    SELECT from `table` holds ACCESS SHARE on it until commit, so the
+    creation would wait out PARTITION_LOCK_TIMEOUT and fail (ingest._stage
+    reads column types from the catalog for this reason).
+    A no-op for tables that are not partitioned.
+    """
+    column = PARTITIONED_TABLES.get(table)
+    if column is None:
+        return []
+    with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        cur.execute(f"SELECT DISTINCT date_trunc('month', {column}) AS month FROM {source} WHERE {column} IS NOT NULL")
+        months = {month_start(r["month"]) for r in cur.fetchall()}
+        if months <= {p["month"] for p in list_partitions(cur, table)}:
+            return []
+    with closing(connect_unpooled()) as creator:
+        with creator.cursor() as cur:
+            cur.execute("SET LOCAL lock_timeout = %s", (PARTITION_LOCK_TIMEOUT,))
+            created = ensure_partitions(cur, table, months)
+        creator.commit()
+    return created
+
+
+def archive_partitions(conn, table, keep_months, drop=False, now=None):
+    """Detach every month older than the last `keep_months` (counting the current one).
+
+    Detached months move to the archive schema, or are dropped with
+    `drop=True`. Their events are tombstoned so syncing clients forget them.
+    Returns the partition names archived.
+    """
+    cutoff = add_months(month_start(now or datetime.now()), -(keep_months - 1))
+    archived = []
+    with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        for partition in list_partitions(cur, table):
+            if partition["month"] is None or partition["month"] >= cutoff:
+                continue
+            name = partition["name"]
+            cur.execute(f"SELECT id, employee_id FROM {name}")
+            rows = cur.fetchall()
+            if rows:
+                record_tombstones(cur, table, [r["id"] for r in rows], [r["employee_id"] for r in rows])
+            cur.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+            if drop:
+                cur.execute(f"DROP TABLE {name}")
+            else:
+                cur.execute(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}")
+                cur.execute(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}")
+            archived.append(name)
+    conn.commit()
+    return archived
+
+
+def clear_events(cur, table):
+    """Remove every event in `table`: drop the month partitions, truncate the default.
+
+    Takes a brief ACCESS EXCLUSIVE lock instead of deleting row by row;
+    the caller records the tombstone and commits.
+    """
+    months = [p["name"] for p in list_partitions(cur, table) if p["month"] is not None]
+    if months:
+        cur.execute(f"DROP TABLE {', '.join(months)}")
+    cur.execute(f"TRUNCATE {table}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and archive the monthly event partitions")
+    sub = parser.add_subparsers(dest="command")
+    archive = sub.add_parser("archive", help="detach months older than the retention window "
+                                             "(not scheduled by the app: run it by hand or from a job)")
+    archive.add_argument("--keep-months", type=int, default=EVENT_RETENTION_MONTHS)
+    archive.add_argument("--drop", action="store_true", help="drop old months instead of archiving them")
+    args = parser.parse_args()
+
+    with get_db_connection() as conn:
+        if args.command == "archive":
+            if args.keep_months <= 0:
+                raise SystemExit("Set --keep-months (or EVENT_RETENTION_MONTHS) to a positive number of months.")
+            for table in PARTITIONED_TABLES:
+                archived = archive_partitions(conn, table, args.keep_months, drop=args.drop)
+                print(f"{table}: {len(archived)} month(s) {'dropped' if args.drop else 'archived'}"
+                      + (f" ({', '.join(archived)})" if archived else ""))
+            return
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            for table in PARTITIONED_TABLES:
+                partitions = list_partitions(cur, table)
+                print(f"{table}: {len(partitions)} partition(s)")
+                for p in partitions:
+                    cur.execute(f"SELECT count(*) AS n FROM {p['name']}")
+                    print(f"  {p['name']:<32} {cur.fetchone()['n']:>10,} rows")
+
+
+if __name__ == "__main__":
+    main()
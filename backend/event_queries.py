@@ -0,0 +1,449 @@
+# event_queries.py
+# Shared read path for the calendar endpoints: window / keyset pagination
+# and the two ways of rendering FullCalendar events (Python or Postgres JSON).
+import base64
+import heapq
+import json
+import os
+from collections import namedtuple
+from datetime import datetime
+import psycopg2.extensions
+import psycopg2.extras
+from flask import Response, jsonify
+from db import get_db_connection
+from event_sync import decode_sync_token, deleted_since, issue_sync_token
+from response_encoding import dumps, encode_items, json_response
+from user_cache import get_user
+
+MAX_PAGE_SIZE = 5000
+STREAM_BATCH_SIZE = 2000
+
+# "python": fetch rows and build event dicts in Flask (default)
+# "db":     Postgres renders each event with json_build_object, streamed as bytes
+CALENDAR_RENDER = os.getenv("CALENDAR_RENDER", "python")
+
+# How a calendar table maps onto FullCalendar events:
+#   columns   - columns selected for the Python builder
+#   to_event  - row dict -> event dict
+#   json_sql  - json_build_object(...) expression producing the same event in SQL
+EventSource = namedtuple("EventSource", ["table", "time_column", "columns", "to_event", "json_sql"])
+
+
+class BadQuery(ValueError):
+    """Invalid window or pagination parameters (answer with 400)."""
+
+
+def _wall_time(value, param):
+    # FullCalendar sends ISO strings with an offset ("2025-01-01T00:00:00-06:00");
+    # events are stored as naive wall-clock times, so compare on wall time.
+    try:
+        dt = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        raise BadQuery(f"Invalid '{param}' datetime: {value}")
+    return dt.replace(tzinfo=None).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def encode_cursor(start, event_id):
+    # start is None for a row without a time (those sort last)
+    if isinstance(start, datetime):
+        start = start.strftime("%Y-%m-%d %H:%M:%S")
+    elif start is not None:
+        start = str(start)
+    raw = json.dumps([start, event_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor):
+    try:
+        start, event_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return (None if start is None else str(start)), int(event_id)
+    except Exception:
+        raise BadQuery("Invalid 'cursor'")
+
+
+def parse_event_args(args):
+    """Pull `start`, `end`, `limit` and `cursor` out of request.args."""
+    window_start = _wall_time(args["start"], "start") if args.get("start") else None
+    window_end = _wall_time(args["end"], "end") if args.get("end") else None
+
+    limit = args.get("limit")
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise BadQuery("Invalid 'limit'")
+        if limit < 1:
+            raise BadQuery("'limit' must be positive")
+        limit = min(limit, MAX_PAGE_SIZE)
+
+    cursor = decode_cursor(args["cursor"]) if args.get("cursor") else None
+
+    # Delta sync: since=<sync_token> (or since=0 for a first full sync)
+    delta = args.get("since") is not None
+    since = None
+    if delta:
+        if limit or cursor:
+            raise BadQuery("'since' cannot be combined with 'limit'/'cursor'")
+        try:
+            since = decode_sync_token(args["since"])
+        except ValueError:
+            raise BadQuery("Invalid 'since' token")
+
+    return {"start": window_start, "end": window_end, "limit": limit, "cursor": cursor,
+            "delta": delta, "since": since}
+
+
+def build_event_query(table, time_column, columns, params, employee_id=None):
+    """SELECT `columns` from `table` honoring window, keyset cursor and limit.
+
+    Ordered by (time_column, id) so the last row of a page is a stable cursor.
+    Rows without a time sort last (Postgres' NULLS LAST for ASC, which the
+    indexes share) and only appear when no window bound excludes them.
+    Bounds are passed as plain strings and coerced by Postgres to the
+    column's own type.
+    """
+    where, values = [], []
+    if employee_id is not None:
+        where.append("employee_id = %s")
+        values.append(employee_id)
+    # FullCalendar's range is [start, end)
+    if params["start"]:
+        where.append(f"{time_column} >= %s")
+        values.append(params["start"])
+    if params["end"]:
+        where.append(f"{time_column} < %s")
+        values.append(params["end"])
+    if params.get("since") is not None:
+        where.append("updated_xid >= %s::xid8")
+        values.append(str(params["since"]))
+
+    order = f" ORDER BY {time_column} ASC, id ASC"
+    limit, limit_values = "", []
+    if params["limit"]:
+        # One extra row tells us whether another page exists
+        limit, limit_values = " LIMIT %s", [params["limit"] + 1]
+
+    def select(extra_where):
+        clauses = where + extra_where
+        return f"SELECT {', '.join(columns)} FROM {table}" + (" WHERE " + " AND ".join(clauses) if clauses else "")
+
+    cursor = params["cursor"]
+    if cursor is None:
+        return select([]) + order + limit, values + limit_values
+    start, event_id = cursor
+    if start is None:
+        # Already in the timeless tail
+        return select([f"{time_column} IS NULL", "id > %s"]) + order + limit, values + [event_id] + limit_values
+    if params["start"] or params["end"]:
+        # A window bound already rules out rows without a time
+        return (select([f"({time_column}, id) > (%s, %s)"]) + order + limit,
+                values + [start, event_id] + limit_values)
+    # Rows after the cursor, then the timeless tail; each half is walked in
+    # index order, so the outer sort only sees two pages' worth of rows
+    sql = (
+        f"SELECT * FROM (({select([f'({time_column}, id) > (%s, %s)'])}{order}{limit})"
+        f" UNION ALL ({select([f'{time_column} IS NULL'])}{order}{limit})) AS page"
+        + order + limit
+    )
+    return sql, values + [start, event_id] + limit_values + values + limit_values + limit_values
+
+
+def split_page(rows, params, time_column):
+    """Trim the look-ahead row; return (rows, next_cursor or None)."""
+    limit = params["limit"]
+    if not limit or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last[time_column], last["id"])
+
+
+def json_event_columns(source):
+    return [f"{source.json_sql}::text AS doc", source.time_column, "id"]
+
+
+def json_array(docs):
+    """Join already-encoded JSON documents into one JSON array (bytes)."""
+    return b"[" + b",".join(d.encode("utf-8") for d in docs) + b"]"
+
+
+def _open_stream(conn, name, sql, values, cursor_factory, batch_size):
+    """Run `sql` on a named (server-side) cursor and fetch its first batch.
+
+    Postgres, not this worker, holds the rest of the result set. Called
+    before the Response is built, so a failing query is answered with a 500
+    instead of a 200 whose body stops short. Returns (cursor, first batch).
+    """
+    cur = conn.cursor(name=name, cursor_factory=cursor_factory)
+    cur.itersize = batch_size
+    try:
+        cur.execute(sql, values)
+        return cur, cur.fetchmany(batch_size)
+    except Exception:
+        cur.close()
+        raise
+
+
+def _batches(cur, first, batch_size):
+    batch = first
+    while batch:
+        yield batch
+        batch = cur.fetchmany(batch_size)
+
+
+class StreamBody:
+    """Response body that owns a connection and its server-side cursors.
+
+    They are released when the chunks run out or when the server closes
+    the body, whichever comes first. A generator's own `finally` would not
+    run if the client went away before the first chunk was pulled.
+    """
+
+    def __init__(self, chunks, conn, cursors):
+        self._chunks = chunks
+        self._conn = conn
+        self._cursors = cursors
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._chunks)
+        except BaseException:
+            # Exhausted or failed: nothing more will be read from the cursors
+            self.close()
+            raise
+
+    def close(self):
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        try:
+            self._chunks.close()
+        finally:
+            _close_stream(conn, self._cursors)
+
+
+def _stream_array(conn, sql, values, encode_batch, cursor_factory, batch_size):
+    try:
+        cur, first = _open_stream(conn, "calendar_stream", sql, values, cursor_factory, batch_size)
+    except Exception:
+        conn.close()
+        raise
+    return StreamBody(_array_body(cur, first, encode_batch, batch_size), conn, [cur])
+
+
+def _array_body(cur, first, encode_batch, batch_size):
+    yield b"["
+    for i, batch in enumerate(_batches(cur, first, batch_size)):
+        chunk = encode_batch(batch)
+        yield chunk if i == 0 else b"," + chunk
+    yield b"]"
+
+
+def stream_json_docs(conn, sql, values, batch_size=STREAM_BATCH_SIZE):
+    """A JSON array of `doc` rows from a server-side cursor, yielded batch by batch.
+
+    The query runs (and its first batch is fetched) here, so errors raise
+    before anything is sent. Takes ownership of `conn` and returns it to
+    the pool when the body is exhausted or closed (or right away on an error).
+    """
+    return _stream_array(
+        conn, sql, values, lambda batch: b",".join(row[0].encode("utf-8") for row in batch),
+        psycopg2.extensions.cursor, batch_size,
+    )
+
+
+def stream_events(conn, sql, values, to_event, batch_size=STREAM_BATCH_SIZE):
+    """Like stream_json_docs, but rows are built into events and encoded here."""
+    return _stream_array(
+        conn, sql, values, lambda batch: encode_items(to_event(row) for row in batch),
+        psycopg2.extras.RealDictCursor, batch_size,
+    )
+
+
+def wants_db_render(args):
+    return args.get("render", CALENDAR_RENDER) == "db"
+
+
+def lookup_user_scope(firebase_uid):
+    """Return (user, employee_id filter); schedulers and admins see everyone."""
+    user = get_user(firebase_uid)
+    if not user:
+        return None, None
+    # Role-based filtering
+    employee_id = None if user["role"].lower() in ["scheduler", "admin"] else user["id"]
+    return user, employee_id
+
+
+def delta_event_response(source, cur, params, employee_id, db_render):
+    """`?since=` body: events written after the token plus ids deleted since.
+
+    If the table was cleared after the token (or since=0) the client gets
+    `reset: true` with the full windowed list and should drop what it holds.
+    """
+    token = issue_sync_token(cur)
+    if params["since"] is None:
+        reset, deleted = True, []
+    else:
+        reset, deleted = deleted_since(cur, source.table, params["since"], employee_id)
+    if reset:
+        params = dict(params, since=None)
+
+    columns = json_event_columns(source) if db_render else source.columns
+    sql, values = build_event_query(source.table, source.time_column, columns, params, employee_id)
+    cur.execute(sql, values)
+    rows = cur.fetchall()
+    # An event moved between technicians is tombstoned for the previous one;
+    # whoever still sees it gets it as changed, not deleted
+    if deleted and rows:
+        present = {r["id"] for r in rows}
+        deleted = [event_id for event_id in deleted if event_id not in present]
+
+    if db_render:
+        body = (
+            b'{"events":' + json_array(r["doc"] for r in rows)
+            + b',"deleted":' + json.dumps(deleted).encode("utf-8")
+            + b',"reset":' + json.dumps(reset).encode("utf-8")
+            + b',"sync_token":' + json.dumps(token).encode("utf-8") + b"}"
+        )
+        return Response(body, mimetype="application/json"), 200
+    return json_response({
+        "events": [source.to_event(r) for r in rows],
+        "deleted": deleted,
+        "reset": reset,
+        "sync_token": token,
+    })
+
+
+def event_response(source, firebase_uid, args):
+    """Full GET handler body shared by /work/ and /travel/."""
+    try:
+        params = parse_event_args(args)
+    except BadQuery as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    user, employee_id = lookup_user_scope(firebase_uid)
+    if not user:
+        return jsonify({"success": False, "message": "User not found"}), 404
+
+    db_render = wants_db_render(args)
+    conn = get_db_connection(readonly=True)
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            if params["delta"]:
+                return delta_event_response(source, cur, params, employee_id, db_render)
+
+            columns = json_event_columns(source) if db_render else source.columns
+            sql, values = build_event_query(source.table, source.time_column, columns, params, employee_id)
+
+            if not params["limit"]:
+                # Unbounded window: stream it batch by batch from a server-side cursor
+                stream_conn, conn = conn, None
+                if db_render:
+                    body = stream_json_docs(stream_conn, sql, values)
+                else:
+                    body = stream_events(stream_conn, sql, values, source.to_event)
+                return Response(body, mimetype="application/json"), 200
+
+            cur.execute(sql, values)
+            rows, next_cursor = split_page(cur.fetchall(), params, source.time_column)
+    finally:
+        if conn is not None:
+            conn.close()
+
+    if db_render:
+        response = Response(json_array(r["doc"] for r in rows), mimetype="application/json")
+    else:
+        response = json_response([source.to_event(row) for row in rows])
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response, 200
+
+
+def _sorted_rows(cur, first, batch_size):
+    for batch in _batches(cur, first, batch_size):
+        yield from batch
+
+
+def _doc(row):
+    return row["doc"].encode("utf-8")
+
+
+def _dumper(to_event):
+    return lambda row: dumps(to_event(row))
+
+
+def _tagged(rows, index, render):
+    # (sort key, source index) orders the merge; ties keep source order
+    for row in rows:
+        yield _merge_key(row), index, render, row
+
+
+def _merge_key(row):
+    # ORDER BY ... ASC puts NULL times last; keep that across sources
+    return (row["sort_key"] is None, row["sort_key"] or datetime.min)
+
+
+def stream_merged_events(conn, sources, params, employee_id, db_render, batch_size=STREAM_BATCH_SIZE):
+    """One time-ordered JSON array of events from several EventSources, yielded in chunks.
+
+    Each source is read through its own server-side cursor (already ordered
+    by time in Postgres) and the streams are k-way merged with heapq.merge,
+    so memory stays at one batch per source. Every query runs (and fetches
+    its first batch) here, so errors raise before anything is sent. Takes
+    ownership of `conn`, released like stream_json_docs releases it.
+    """
+    cursors, streams = [], []
+    try:
+        for i, source in enumerate(sources):
+            columns = json_event_columns(source) if db_render else list(source.columns)
+            # Common sort key across tables (timestamptz -> session wall time)
+            columns.append(f"{source.time_column}::timestamp AS sort_key")
+            sql, values = build_event_query(source.table, source.time_column, columns, params, employee_id)
+            cur, first = _open_stream(conn, f"calendar_merge_{i}", sql, values,
+                                      psycopg2.extras.RealDictCursor, batch_size)
+            cursors.append(cur)
+            rows = _sorted_rows(cur, first, batch_size)
+            streams.append(_tagged(rows, i, _doc if db_render else _dumper(source.to_event)))
+    except Exception:
+        _close_stream(conn, cursors)
+        raise
+    return StreamBody(_merged_body(streams, batch_size), conn, cursors)
+
+
+def _close_stream(conn, cursors):
+    for cur in cursors:
+        cur.close()
+    conn.close()
+
+
+def _merged_body(streams, batch_size):
+    yield b"["
+    chunk, first = [], True
+    for _, _, render, row in heapq.merge(*streams, key=lambda item: item[:2]):
+        chunk.append(render(row))
+        if len(chunk) >= batch_size:
+            yield (b"" if first else b",") + b",".join(chunk)
+            chunk, first = [], False
+    if chunk:
+        yield (b"" if first else b",") + b",".join(chunk)
+    yield b"]"
+
+
+def merged_event_response(sources, firebase_uid, args):
+    """GET handler body for /calendar/: one auth'd user lookup, all sources merged."""
+    try:
+        params = parse_event_args(args)
+    except BadQuery as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    if params["limit"] or params["cursor"] or params["delta"]:
+        return jsonify({"success": False, "message": "/calendar/ is windowed with start/end; use /work/ or /travel/ to page or sync"}), 400
+
+    user, employee_id = lookup_user_scope(firebase_uid)
+    if not user:
+        return jsonify({"success": False, "message": "User not found"}), 404
+
+    body = stream_merged_events(get_db_connection(readonly=True), sources, params, employee_id, wants_db_render(args))
+    return Response(body, mimetype="application/json"), 200
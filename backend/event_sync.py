@@ -0,0 +1,72 @@
+# event_sync.py
+# Change tracking behind `?since=<sync_token>` on the calendar endpoints:
+# the id of the transaction that last wrote each event (updated_xid),
+# tombstones for deletions and opaque sync tokens. The schema is
+# migrations/0002_event_sync.sql and 0007_sync_by_xid.sql.
+#
+# A token is the xmin of a snapshot taken before the delta query: every
+# transaction with a lower id had finished by then, so its writes were
+# already returned. Anything still running (however long ago it started,
+# e.g. an upsert import parsing a large file) has an id at or above the
+# token and is picked up next time. Clients replace events by id, so the
+# few rows a token repeats cost nothing.
+import base64
+import psycopg2.extras
+
+TOKEN_PREFIX = "xid:"
+
+
+def record_tombstones(cur, source, ids=None, employee_ids=None):
+    """Remember deletions: specific event ids, or (ids=None) the whole table."""
+    if ids is None:
+        cur.execute("INSERT INTO event_tombstones (source, event_id) VALUES (%s, NULL)", (source,))
+        return
+    employee_ids = employee_ids or [None] * len(ids)
+    psycopg2.extras.execute_values(
+        cur,
+        "INSERT INTO event_tombstones (source, event_id, employee_id) VALUES %s",
+        [(source, event_id, emp) for event_id, emp in zip(ids, employee_ids)],
+        page_size=1000,
+    )
+
+
+def encode_sync_token(xid):
+    return base64.urlsafe_b64encode(f"{TOKEN_PREFIX}{xid}".encode("utf-8")).decode("ascii")
+
+
+def decode_sync_token(token):
+    """Token -> transaction id (int); None means "from the beginning". Raises ValueError.
+
+    "0" and tokens from before transaction ids (timestamps) both decode to
+    None, so those clients get a reset and a full list.
+    """
+    if token == "0":
+        return None
+    text = base64.urlsafe_b64decode(token.encode("ascii")).decode("utf-8")
+    if not text.startswith(TOKEN_PREFIX):
+        return None
+    return int(text[len(TOKEN_PREFIX):])
+
+
+def issue_sync_token(cur):
+    # Issue before running the delta query. Works on a read replica too:
+    # its snapshot only counts what it has replayed as finished.
+    cur.execute("SELECT pg_snapshot_xmin(pg_current_snapshot())::text AS xmin")
+    return encode_sync_token(int(cur.fetchone()["xmin"]))
+
+
+def deleted_since(cur, source, since_xid, employee_id=None):
+    """Return (reset, deleted ids) for `source` since transaction `since_xid`.
+
+    `reset` is True when the whole table was cleared in the meantime.
+    """
+    sql = "SELECT event_id FROM event_tombstones WHERE source = %s AND deleted_xid >= %s::xid8"
+    values = [source, str(since_xid)]
+    if employee_id is not None:
+        sql += " AND (employee_id = %s OR employee_id IS NULL)"
+        values.append(employee_id)
+    cur.execute(sql, values)
+    ids = [r["event_id"] for r in cur.fetchall()]
+    if any(event_id is None for event_id in ids):
+        return True, []
+    return False, sorted(set(ids))
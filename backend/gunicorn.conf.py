@@ -0,0 +1,42 @@
+# gunicorn.conf.py
+# Read automatically by `gunicorn server:app` when started from backend/.
+import os
+import tempfile
+
+# Load the app once in the master and fork workers from it: workers start
+# faster and share the imported code pages. server.create_app() opens no
+# connections or threads that would be shared across the fork (the DB pool,
+# import executor and log listener are all created per process).
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+# Keep in step with DB_POOL_MAX (defaults to threads + IMPORT_WORKERS + 1, see config.py)
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+
+# Workers share their metrics through this directory so /metrics reports the
+# whole server (metrics.py); give each server on one host its own
+os.environ.setdefault("METRICS_DIR", os.path.join(tempfile.gettempdir(), "portal-metrics"))
+
+
+def on_starting(server):
+    # Migrations run in the release step, not at request time: refuse to
+    # serve a database that is behind the code
+    from schema_migrations import check_schema
+    check_schema()
+
+    # Counts left by a previous run of the server must not be added in
+    from metrics import reset_metrics_dir
+    reset_metrics_dir()
+
+    # Optionally pay for pandas once in the master so the first upload in
+    # every worker skips the ~0.4s import
+    if preload_app and os.getenv("PRELOAD_PANDAS") == "1":
+        import pandas  # noqa: F401
+
+
+def post_worker_init(worker):
+    # Jobs a stopped worker left queued or running would otherwise never finish
+    try:
+        from import_jobs import recover_stale_jobs
+        recover_stale_jobs()
+    except Exception:
+        worker.log.exception("Could not recover stale import jobs")
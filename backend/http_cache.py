@@ -0,0 +1,44 @@
+# http_cache.py
+# Conditional GET for reference data: the JSON body of each snapshot version
+# is encoded once, with a strong ETag, and If-None-Match is answered with 304.
+import hashlib
+import os
+import threading
+from flask import current_app, request
+
+# Browser freshness for reference data; after that it revalidates (cheap 304)
+REFERENCE_MAX_AGE = int(os.getenv("REFERENCE_MAX_AGE", "60"))
+
+_bodies = {}    # key -> (version, body bytes, etag)
+_lock = threading.Lock()
+
+
+def _encoded(key, version, payload):
+    entry = _bodies.get(key)
+    if entry is None or entry[0] != version:
+        if callable(payload):
+            payload = payload()
+        body = current_app.json.dumps(payload).encode("utf-8") + b"\n"
+        entry = (version, body, hashlib.sha256(body).hexdigest()[:32])
+        with _lock:
+            _bodies[key] = entry
+    return entry
+
+
+def cache_control(max_age, private=False):
+    """Cache-Control for a revalidatable response; max_age=0 means revalidate every time."""
+    scope = "private" if private else "public"
+    return f"{scope}, max-age={max_age}, must-revalidate" if max_age else f"{scope}, no-cache"
+
+
+def snapshot_response(key, version, payload, private=False, max_age=REFERENCE_MAX_AGE):
+    """JSON response for `payload` (snapshot `version` of `key`), honoring If-None-Match.
+
+    `payload` may be a callable, called only when this version has not been
+    encoded yet. `private` keeps shared caches (CDN, proxies) from storing it.
+    """
+    _, body, etag = _encoded(key, version, payload)
+    response = current_app.response_class(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control(max_age, private)
+    return response.make_conditional(request)
@@ -0,0 +1,352 @@
+# import_jobs.py
+# Background import queue for the Excel uploads. The request only spools the
+# file to disk and records a job; a small thread pool per worker does the
+# parsing and ingest while /imports/<id> reports progress from the database
+# (so any gunicorn worker can answer, not just the one running the job).
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+import psycopg2
+from app_logging import current_request_id, reset_request_id, set_request_id
+from config import IMPORT_WORKERS
+from db import connect_unpooled, get_db_connection
+
+IMPORT_SPOOL_DIR = os.getenv("IMPORT_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "portal-imports"))
+IMPORT_GLOBAL_SLOTS = int(os.getenv("IMPORT_GLOBAL_SLOTS", "2"))   # concurrent imports across all workers
+PROGRESS_INTERVAL = 0.5                                             # seconds between progress writes
+SPOOL_GRACE_SECONDS = 60                                            # leave younger spool files alone
+OWNER_CHECK_INTERVAL = 5                                            # seconds between owner lock checks
+# Uploads that do not say (no `wait` param) are imported before the response.
+# The served frontend build predates background imports and treats a 202 as
+# done; set to 0 once a build that polls the job (sends wait=0) is deployed.
+IMPORT_WAIT_DEFAULT = os.getenv("IMPORT_WAIT_DEFAULT", "1") == "1"
+
+# pg_advisory_lock(key, slot) namespace for the global import slots
+IMPORT_LOCK_KEY = 0x1A4F
+# pg_advisory_lock(key, owner): held by each process that runs imports for as
+# long as it lives; its jobs record the owner id (see recover_stale_jobs)
+IMPORT_OWNER_KEY = 0x1A52
+
+STALE_JOB_ERROR = "The worker running this import stopped before it finished; upload the file again."
+
+# Queued/running jobs whose owner lock nobody holds any more. Rows an import
+# transaction has locked (JobProgress.fence) are skipped: that job is alive
+FAIL_STALE_JOBS_SQL = """
+    UPDATE import_jobs j
+    SET phase = 'failed', error = %(error)s, finished_at = now(), updated_at = now()
+    WHERE j.id IN (
+        SELECT s.id FROM import_jobs s
+        WHERE s.phase NOT IN ('done', 'failed') {only}
+          AND (s.owner IS NULL OR NOT EXISTS (
+              SELECT 1 FROM pg_locks l
+              WHERE l.locktype = 'advisory' AND l.granted
+                AND l.database = (SELECT oid FROM pg_database WHERE datname = current_database())
+                AND l.classid = %(key)s AND l.objid = s.owner AND l.objsubid = 2
+          ))
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING j.id
+"""
+
+log = logging.getLogger(__name__)
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_owner = None
+_owner_conn = None
+
+
+class JobAbandoned(RuntimeError):
+    """The job was marked failed while it ran; its remaining writes are rolled back."""
+
+
+def _take_owner_lock(owner):
+    """An autocommit connection holding the owner lock, or None if it is still held elsewhere."""
+    conn = connect_unpooled()
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_try_advisory_lock(%s, %s) AS ok", (IMPORT_OWNER_KEY, owner))
+        if cur.fetchone()["ok"]:
+            return conn
+    conn.close()
+    return None
+
+
+def _check_owner_lock():
+    """Re-take the owner lock if its connection dropped (the lock went with it)."""
+    global _owner_conn
+    try:
+        with _owner_conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        return
+    except psycopg2.Error:
+        log.warning("Import owner connection lost; taking the lock again", extra={"owner": _owner})
+    try:
+        _owner_conn.close()
+    except psycopg2.Error:
+        pass
+    try:
+        # Until this succeeds, fenced writes keep running jobs from being failed
+        conn = _take_owner_lock(_owner)
+    except psycopg2.Error:
+        log.exception("Could not reconnect for the import owner lock")
+        return
+    if conn is not None:
+        _owner_conn = conn
+
+
+def _watch_owner_lock(pid):
+    while _executor_pid == pid:
+        time.sleep(OWNER_CHECK_INTERVAL)
+        _check_owner_lock()
+
+
+def _get_executor():
+    """This process's import executor and owner id, created on first use (and after a fork)."""
+    global _executor, _executor_pid, _owner, _owner_conn
+    pid = os.getpid()
+    with _executor_lock:
+        if _executor is None or _executor_pid != pid:
+            owner = random.getrandbits(31)
+            conn = connect_unpooled()
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_lock(%s, %s)", (IMPORT_OWNER_KEY, owner))
+            _executor = ThreadPoolExecutor(max_workers=IMPORT_WORKERS, thread_name_prefix="import")
+            # Kept open (never closed from a forked child) so the lock lives as long as this process
+            _owner, _owner_conn, _executor_pid = owner, conn, pid
+            threading.Thread(target=_watch_owner_lock, args=(pid,), name="import-owner", daemon=True).start()
+    return _executor, _owner
+
+
+class JobProgress:
+    """Handed to the ingest function; writes phase/row counts to import_jobs.
+
+    Writes on its own autocommit connection (outside the pool), so progress
+    is visible while the ingest transaction is still open. Row updates are
+    throttled. A no-op when `job_id` is None (synchronous uploads).
+    """
+
+    def __init__(self, job_id=None):
+        self.job_id = job_id
+        self.started = time.perf_counter()
+        self._last_write = 0.0
+        self._conn = None
+        self.rows_processed = 0
+        self.rows_total = None
+
+    def connection(self):
+        if self._conn is None or self._conn.closed:
+            self._conn = connect_unpooled()
+            self._conn.autocommit = True
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _write(self, stamps=(), conn=None, **fields):
+        if self.job_id is None:
+            return
+        assignments = [f"{k} = %s" for k in fields]
+        assignments += [f"{c} = now()" for c in ("updated_at",) + tuple(stamps)]
+        with (conn or self.connection()).cursor() as cur:
+            cur.execute(
+                f"UPDATE import_jobs SET {', '.join(assignments)} WHERE id = %s",
+                list(fields.values()) + [self.job_id],
+            )
+
+    def phase(self, phase):
+        self._write(stamps=("started_at",) if phase == "parsing" else (), phase=phase)
+
+    def rows(self, processed, total=None):
+        self.rows_processed = processed
+        if total is not None:
+            self.rows_total = total
+        now = time.perf_counter()
+        if now - self._last_write < PROGRESS_INTERVAL and processed != self.rows_total:
+            return
+        self._last_write = now
+        elapsed = now - self.started
+        self._write(
+            rows_processed=processed,
+            rows_total=self.rows_total,
+            rows_per_sec=round(processed / elapsed, 1) if elapsed > 0 else None,
+        )
+
+    def fence(self, conn):
+        """Lock this job's row in `conn`'s transaction; raise JobAbandoned if it was failed.
+
+        The ingest calls this before each write. Until that transaction
+        ends, recover_stale_jobs() skips the job (even if this process lost
+        its owner lock meanwhile), and a job failed in between writes
+        nothing more. FOR KEY SHARE leaves progress updates unblocked.
+        """
+        if self.job_id is None:
+            return
+        with conn.cursor() as cur:
+            cur.execute("SELECT phase FROM import_jobs WHERE id = %s FOR KEY SHARE", (self.job_id,))
+            row = cur.fetchone()
+        if row is None or row["phase"] in ("done", "failed"):
+            raise JobAbandoned("This import was marked failed while it ran; nothing more was written")
+
+    def finish(self, result, conn=None):
+        """Mark the job done; pass the import's `conn` to commit that with its writes."""
+        self._write(
+            stamps=("finished_at",),
+            conn=conn,
+            phase="done",
+            result=json.dumps(result, default=str),
+            rows_processed=self.rows_processed,
+        )
+
+    def fail(self, error):
+        self._write(stamps=("finished_at",), phase="failed", error=error)
+
+
+def _acquire_slot(conn, progress):
+    """Block until one of IMPORT_GLOBAL_SLOTS advisory locks is ours; return the slot.
+
+    `conn` is an autocommit connection that stays open for the whole job.
+    """
+    announced = False
+    while True:
+        with conn.cursor() as cur:
+            for slot in range(IMPORT_GLOBAL_SLOTS):
+                cur.execute("SELECT pg_try_advisory_lock(%s, %s) AS ok", (IMPORT_LOCK_KEY, slot))
+                if cur.fetchone()["ok"]:
+                    return slot
+        if not announced:
+            progress.phase("waiting")
+            announced = True
+        time.sleep(1)
+
+
+def _release_slot(conn, slot):
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_advisory_unlock(%s, %s)", (IMPORT_LOCK_KEY, slot))
+
+
+def _run(job_id, path, runner, args, request_id):
+    # Log under the id of the upload request that queued the job
+    token = set_request_id(request_id)
+    progress = JobProgress(job_id)
+    try:
+        # Neither the wait for a slot nor the import itself holds a pooled
+        # connection: the pool is sized for request threads
+        with closing(connect_unpooled()) as conn:
+            # Fenced from here on, through the wait for a slot
+            progress.fence(conn)
+            slot = _acquire_slot(progress.connection(), progress)
+            try:
+                log.info("Import job started", extra={"job_id": job_id, "slot": slot})
+                result = runner(conn, path, progress=progress, **args)
+                # "done" commits with the import's last writes, or not at all
+                progress.fence(conn)
+                progress.finish(result, conn)
+                conn.commit()
+            finally:
+                _release_slot(progress.connection(), slot)
+        log.info("Import job done", extra={"job_id": job_id})
+    except Exception as e:
+        log.exception("Import job failed", extra={"job_id": job_id})
+        progress.fail(str(e))
+    finally:
+        progress.close()
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        reset_request_id(token)
+
+
+def wants_wait(value):
+    """The upload's `wait` param ("1"/"0", or None) -> import before responding?"""
+    if value is None or value == "":
+        return IMPORT_WAIT_DEFAULT
+    return value == "1"
+
+
+def submit_import(kind, file_storage, runner, runner_args, uploader_id=None, mode=None):
+    """Spool `file_storage` to disk, record a queued job and schedule `runner`.
+
+    `runner(conn, path, progress=..., **runner_args)` does the actual import
+    inside the connection's transaction and returns the JSON-able result.
+    """
+    os.makedirs(IMPORT_SPOOL_DIR, exist_ok=True)
+    job_id = uuid.uuid4().hex
+    filename = file_storage.filename or ""
+    path = os.path.join(IMPORT_SPOOL_DIR, job_id + os.path.splitext(filename)[1].lower())
+    file_storage.save(path)
+
+    executor, owner = _get_executor()
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """INSERT INTO import_jobs (id, kind, mode, filename, uploader_id, phase, owner)
+                   VALUES (%s, %s, %s, %s, %s, 'queued', %s)""",
+                (job_id, kind, mode or "", filename, uploader_id, owner),
+            )
+
+    executor.submit(_run, job_id, path, runner, runner_args, current_request_id())
+    log.info("Import job queued", extra={"job_id": job_id, "kind": kind, "mode": mode, "upload": filename})
+    return job_id
+
+
+def recover_stale_jobs():
+    """Fail jobs left queued or running by a worker that stopped, and delete
+    spool files no queued or running job needs.
+
+    Called as each gunicorn worker starts (gunicorn.conf.py); returns the
+    ids of the jobs failed.
+    """
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(FAIL_STALE_JOBS_SQL.format(only=""), {"error": STALE_JOB_ERROR, "key": IMPORT_OWNER_KEY})
+            failed = [r["id"] for r in cur.fetchall()]
+            cur.execute("SELECT id FROM import_jobs WHERE phase NOT IN ('done', 'failed')")
+            active = {r["id"] for r in cur.fetchall()}
+    if failed:
+        log.warning("Failed import jobs left behind by a stopped worker", extra={"job_ids": failed})
+
+    removed = 0
+    if os.path.isdir(IMPORT_SPOOL_DIR):
+        for name in os.listdir(IMPORT_SPOOL_DIR):
+            path = os.path.join(IMPORT_SPOOL_DIR, name)
+            # A file younger than the grace period may belong to an upload
+            # whose job row is not committed yet
+            if os.path.splitext(name)[0] in active or time.time() - os.path.getmtime(path) < SPOOL_GRACE_SECONDS:
+                continue
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+    if removed:
+        log.info("Removed orphaned import spool files", extra={"files": removed})
+    return failed
+
+
+def get_job(job_id, uploader_id=None):
+    """The job's status row; None if missing or (with `uploader_id`) someone else's."""
+    only = "AND s.id = %(id)s" + (" AND s.uploader_id = %(uploader_id)s" if uploader_id is not None else "")
+    params = {"error": STALE_JOB_ERROR, "key": IMPORT_OWNER_KEY, "id": job_id, "uploader_id": uploader_id}
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            # Report a job whose worker went away as failed, not "queued" forever
+            cur.execute(FAIL_STALE_JOBS_SQL.format(only=only), params)
+            cur.execute(f"""
+                SELECT id, kind, mode, filename, uploader_id, phase, rows_total, rows_processed,
+                       rows_per_sec, result, error, created_at, started_at, finished_at, updated_at
+                FROM import_jobs s WHERE TRUE {only}
+            """, params)
+            return cur.fetchone()
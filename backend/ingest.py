@@ -0,0 +1,397 @@
+# ingest.py
+# Bulk-load helpers shared by the /work/upload/ and /travel/upload/ routes.
+import io
+import logging
+import os
+import time
+import uuid
+from collections import namedtuple
+from employee_directory import employee_directory
+from employee_matcher import TechnicianMatcher
+from event_partitions import create_partitions_for
+from event_sync import record_tombstones
+from import_jobs import JobProgress
+from metrics import observe_import
+
+# pandas (~0.4s to import) is loaded on the first upload, not at app start;
+# the read paths never need it.
+
+# Rows per parsed chunk; peak memory scales with this, not with the file
+IMPORT_CHUNK_ROWS = int(os.getenv("IMPORT_CHUNK_ROWS", "5000"))
+
+# Staging table column types (see _stage)
+COLUMN_TYPES_SQL = """
+    SELECT attname AS name, format_type(atttypid, atttypmod) AS type
+    FROM pg_attribute
+    WHERE attrelid = to_regclass(%s) AND attname = ANY(%s) AND attnum > 0 AND NOT attisdropped
+"""
+
+# How an export maps onto an event table:
+#   kind               - "work" / "travel" (metrics, logs, import jobs)
+#   table              - destination table
+#   columns            - export header -> column
+#   key                - natural key of a row, for the upsert mode
+#   technician_column  - column holding the name employee_id is resolved from
+ImportSpec = namedtuple("ImportSpec", ["kind", "table", "columns", "key", "technician_column"])
+
+log = logging.getLogger(__name__)
+
+
+def _source_name(source, filename=None):
+    if filename:
+        return filename
+    if isinstance(source, (str, os.PathLike)):
+        return os.fspath(source)
+    return getattr(source, "filename", None) or ""
+
+
+def export_row_estimate(source, filename=None):
+    """Data-row count from the sheet dimensions (xlsx only); None if unknown."""
+    if not _source_name(source, filename).lower().endswith((".xlsx", ".xlsm")):
+        return None
+    from openpyxl import load_workbook
+    wb = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = wb.active.max_row
+    finally:
+        wb.close()
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return max(rows - 1, 0) if rows else None
+
+
+def iter_export_chunks(source, filename=None, chunk_rows=IMPORT_CHUNK_ROWS):
+    """Yield an export as DataFrames of at most `chunk_rows` rows.
+
+    .xlsx is read row by row with openpyxl in read-only mode and .csv with
+    pandas' chunked reader, so the whole workbook is never in memory.
+    Anything else (legacy .xls) falls back to pd.read_excel.
+    """
+    import pandas as pd
+    name = _source_name(source, filename).lower()
+    if name.endswith(".csv"):
+        yield from pd.read_csv(source, chunksize=chunk_rows)
+        return
+
+    if not name.endswith((".xlsx", ".xlsm")):
+        df = pd.read_excel(source)
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+        return
+
+    from openpyxl import load_workbook
+    wb = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        header = [str(h).strip() if h is not None else f"Unnamed: {i}" for i, h in enumerate(header)]
+        chunk = []
+        for row in rows:
+            if all(v is None for v in row):
+                continue
+            chunk.append(row)
+            if len(chunk) >= chunk_rows:
+                yield pd.DataFrame(chunk, columns=header)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=header)
+    finally:
+        wb.close()
+
+
+def prepare_frame(df, column_map):
+    """Project an export DataFrame onto DB column names, column by column.
+
+    `column_map` is {export header: db column}; headers missing from the
+    file become all-NULL columns, like `row.get()` did before.
+    """
+    import pandas as pd
+    out = pd.DataFrame(index=df.index)
+    for src, dest in column_map.items():
+        if src in df.columns:
+            col = df[src]
+            # Excel hands back whole numbers as floats once a column has a blank
+            # cell; store "12345", not "12345.0", whatever the chunk holds
+            # (rows stored before this are rewritten by migration 0008)
+            if pd.api.types.is_float_dtype(col):
+                non_null = col.dropna()
+                if len(non_null) and (non_null % 1 == 0).all():
+                    col = col.astype("Int64")
+            out[dest] = col
+        else:
+            out[dest] = None
+    return out
+
+
+def map_unique(series, fn):
+    """Apply `fn` once per distinct non-null value and broadcast the result."""
+    uniques = series.dropna().unique()
+    lookup = {value: fn(value) for value in uniques}
+    return series.map(lookup), lookup
+
+
+def _stage(cur, table, frames):
+    """COPY `frames` into a temp table shaped like `table`'s columns.
+
+    Returns (staging table name, columns, rows staged); (None, None, 0) when
+    `frames` is empty. Each frame is sent as its own COPY, so only one chunk
+    is ever serialized in memory.
+    """
+    staging, columns, staged = None, None, 0
+    for frame in frames:
+        if frame.empty:
+            continue
+        if staging is None:
+            columns = list(frame.columns)
+            staging = f"_stage_{table}_{uuid.uuid4().hex[:8]}"
+            # Column types only: no defaults (no sequence burn) and no constraints.
+            # Read from the catalog, not `FROM {table}`, so this transaction
+            # holds no lock on `table` when create_partitions_for() attaches months
+            cur.execute(COLUMN_TYPES_SQL, (table, columns))
+            types = {r["name"]: r["type"] for r in cur.fetchall()}
+            cur.execute(f"CREATE TEMP TABLE {staging} ("
+                        + ", ".join(f"{c} {types[c]}" for c in columns) + ") ON COMMIT DROP")
+        buf = io.StringIO()
+        frame.to_csv(buf, index=False, header=False, date_format="%Y-%m-%d %H:%M:%S")
+        buf.seek(0)
+        cur.copy_expert(f"COPY {staging} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buf)
+        staged += len(frame)
+    return staging, columns, staged
+
+
+def copy_into(conn, table, frame, stamp_columns=("created_at",)):
+    """Insert every row of `frame` into `table` in one COPY round trip.
+
+    Rows are streamed as CSV into a temp staging table (so Postgres does the
+    type coercion), then moved over with a single INSERT ... SELECT that also
+    fills `stamp_columns` with NOW(). Returns the number of rows inserted.
+    """
+    with conn.cursor() as cur:
+        staging, columns, _ = _stage(cur, table, [frame])
+        if staging is None:
+            return 0
+        create_partitions_for(conn, table, staging)
+        columns = ", ".join(columns)
+        stamps = "".join(f", {c}" for c in stamp_columns)
+        nows = ", NOW()" * len(stamp_columns)
+        cur.execute(f"INSERT INTO {table} ({columns}{stamps}) SELECT {columns}{nows} FROM {staging}")
+        inserted = cur.rowcount
+    return inserted
+
+
+def copy_chunks(conn, table, frames, **kwargs):
+    """copy_into() each frame and commit after every chunk; returns rows inserted."""
+    inserted = 0
+    for frame in frames:
+        inserted += copy_into(conn, table, frame, **kwargs)
+        conn.commit()
+    return inserted
+
+
+def upsert_into(conn, table, frames, key_columns, audit_columns=(), stamp_columns=("created_at",)):
+    """Make `table` match `frames` (the chunks of a full export), keyed on `key_columns`.
+
+    Every export row is paired with at most one table row: by key, with
+    the oldest row of a key that earlier appends duplicated (the others
+    are removed); or, for rows with a null key part, by a hash of their
+    content, identical rows pairing up one to one. Only paired rows whose
+    content changed are rewritten; `audit_columns` (who uploaded) are
+    written along with a change but never count as one. Unpaired table
+    rows are deleted and unpaired export rows inserted. All chunks are
+    staged first and merged in the caller's transaction, so readers see
+    the old table until commit.
+
+    Returns ({"inserted", "updated", "unchanged", "removed", "duplicates",
+    "keyless"}, tombstones); inserted + updated + unchanged is the number
+    of export rows (after repeated keys), and "duplicates" is the part of
+    "removed" that repeated a key. Tombstones are (id, employee_id)
+    tuples: rows deleted, and rows that moved to another employee (with
+    the employee they moved away from).
+    """
+    with conn.cursor() as cur:
+        staging, columns, staged = _stage(cur, table, frames)
+        if not staged:
+            # An empty export would otherwise "remove" every row
+            raise ValueError("Export has no rows; refusing to sync the table to it")
+        # Committed on their own before the lock below, which would block them
+        create_partitions_for(conn, table, staging)
+        # Serialize imports into this table; plain reads are not blocked
+        cur.execute(f"LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE")
+
+        content = [c for c in columns if c not in key_columns and c not in audit_columns]
+        keys = ", ".join(key_columns)
+        key_match = " AND ".join(f"t.{k} = s.{k}" for k in key_columns)
+        key_present = " AND ".join(f"{{a}}.{k} IS NOT NULL" for k in key_columns)
+        has_key = {a: key_present.format(a=a) for a in ("s", "t")}
+
+        def content_hash(alias):
+            return f"md5(ROW({', '.join(f'{alias}.{c}' for c in list(key_columns) + content)})::text)"
+
+        # The export can repeat a key: the last row wins
+        cur.execute(f"""
+            DELETE FROM {staging} a USING {staging} b
+            WHERE {" AND ".join(f"a.{k} = b.{k}" for k in key_columns)} AND a.ctid < b.ctid
+        """)
+        cur.execute(f"ALTER TABLE {staging} ADD COLUMN _sid BIGINT GENERATED ALWAYS AS IDENTITY")
+
+        cur.execute(f"SELECT count(*) AS n FROM {staging} s WHERE NOT ({has_key['s']})")
+        keyless = cur.fetchone()["n"]
+
+        # Export row -> the one table row it syncs to
+        pairs = f"{staging}_pairs"
+        cur.execute(f"""
+            CREATE TEMP TABLE {pairs} ON COMMIT DROP AS
+            SELECT s._sid, t.id
+            FROM {staging} s
+            JOIN (SELECT DISTINCT ON ({keys}) t.id, {", ".join(f"t.{k}" for k in key_columns)}
+                  FROM {table} t WHERE {has_key['t']} ORDER BY {keys}, t.id) t ON {key_match}
+            UNION ALL
+            SELECT s._sid, t.id
+            FROM (SELECT s._sid, {content_hash('s')} AS hash,
+                         row_number() OVER (PARTITION BY {content_hash('s')} ORDER BY s._sid) AS n
+                  FROM {staging} s WHERE NOT ({has_key['s']})) s
+            JOIN (SELECT t.id, {content_hash('t')} AS hash,
+                         row_number() OVER (PARTITION BY {content_hash('t')} ORDER BY t.id) AS n
+                  FROM {table} t WHERE NOT ({has_key['t']})) t USING (hash, n)
+        """)
+        cur.execute(f"ANALYZE {pairs}")
+        cur.execute(f"SELECT count(*) AS n FROM {pairs}")
+        matched = cur.fetchone()["n"]
+
+        track_employee = "employee_id" in content
+        cur.execute(f"""
+            WITH previous AS (
+                SELECT t.id, {"t.employee_id" if track_employee else "NULL::integer"} AS employee_id
+                FROM {table} t JOIN {pairs} p ON p.id = t.id JOIN {staging} s ON s._sid = p._sid
+                WHERE ({", ".join(f"t.{c}" for c in content)}) IS DISTINCT FROM ({", ".join(f"s.{c}" for c in content)})
+            )
+            UPDATE {table} t
+            SET {", ".join(f"{c} = s.{c}" for c in content + list(audit_columns))}
+            FROM previous p, {pairs} m, {staging} s
+            WHERE t.id = p.id AND m.id = t.id AND s._sid = m._sid
+            RETURNING t.id, p.employee_id AS previous_employee_id,
+                      {"t.employee_id" if track_employee else "NULL::integer"} AS employee_id
+        """)
+        changed = cur.fetchall()
+        updated = len(changed)
+        # The previous technician's client only hears about this as a deletion
+        reassigned = [(r["id"], r["previous_employee_id"]) for r in changed
+                      if r["previous_employee_id"] is not None and r["previous_employee_id"] != r["employee_id"]]
+
+        cur.execute(f"""
+            DELETE FROM {table} t
+            WHERE NOT EXISTS (SELECT 1 FROM {pairs} m WHERE m.id = t.id)
+            RETURNING t.id, t.employee_id,
+                      {has_key['t']} AND EXISTS (SELECT 1 FROM {staging} s WHERE {key_match}) AS duplicate
+        """)
+        deleted = cur.fetchall()
+        removed = [(r["id"], r["employee_id"]) for r in deleted]
+
+        stamps = "".join(f", {c}" for c in stamp_columns)
+        nows = ", NOW()" * len(stamp_columns)
+        cur.execute(f"""
+            INSERT INTO {table} ({", ".join(columns)}{stamps})
+            SELECT {", ".join(f"s.{c}" for c in columns)}{nows} FROM {staging} s
+            WHERE NOT EXISTS (SELECT 1 FROM {pairs} m WHERE m._sid = s._sid)
+        """)
+        inserted = cur.rowcount
+
+    counts = {
+        "inserted": inserted,
+        "updated": updated,
+        "unchanged": matched - updated,
+        "removed": len(removed),
+        "duplicates": sum(1 for r in deleted if r["duplicate"]),
+        "keyless": keyless,
+    }
+    return counts, removed + reassigned
+
+
+def ingest_file(conn, source, spec, uploader_id, uploader_name, mode, progress=None):
+    """Stream an export (.xlsx/.csv path or file object) into `spec.table`.
+
+    The file is read in IMPORT_CHUNK_ROWS chunks. Append mode commits after
+    each chunk; upsert stages every chunk and merges in one transaction.
+    Returns the upload summary.
+    """
+    progress = progress or JobProgress()
+    timer = IngestTimer()
+
+    progress.phase("parsing")
+    # Cached per worker; the fingerprint check picks up new hires
+    employee_map = employee_directory.snapshot(conn, force_check=True).name_map
+    # ✅ employee_id from the technician name (resolved once per distinct name)
+    matcher = TechnicianMatcher(employee_map)
+    processed = 0
+
+    def frames():
+        nonlocal processed
+        for chunk in iter_export_chunks(source):
+            # In the transaction this chunk is written in (see JobProgress.fence)
+            progress.fence(conn)
+            frame = prepare_frame(chunk, spec.columns)
+            employee_ids, _ = map_unique(frame[spec.technician_column], matcher.find_employee_id)
+            frame.insert(0, "employee_id", employee_ids.astype("Int64"))
+
+            # ✅ last_updated_by is always uploader
+            frame["last_updated_by"] = uploader_id
+            frame["last_updated_by_name"] = uploader_name
+
+            processed += len(frame)
+            progress.rows(processed)
+            yield frame
+
+    progress.rows(0, export_row_estimate(source))
+    progress.phase("writing")
+    if mode == "upsert":
+        counts, removed = upsert_into(
+            conn, spec.table, frames(), spec.key,
+            audit_columns=("last_updated_by", "last_updated_by_name"),
+        )
+        if removed:
+            with conn.cursor() as cur:
+                ids, employee_ids = zip(*removed)
+                record_tombstones(cur, spec.table, list(ids), list(employee_ids))
+        message = (f"✅ {counts['inserted']} added, {counts['updated']} updated, "
+                   f"{counts['unchanged']} unchanged, {counts['removed']} removed.")
+        if counts["duplicates"]:
+            message += f" {counts['duplicates']} of the removed rows repeated a job/visit already in the table."
+        if counts["keyless"]:
+            message += f" {counts['keyless']} rows without a job/visit were matched on their content."
+    else:
+        counts = {"inserted": copy_chunks(conn, spec.table, frames())}
+        message = f"✅ {counts['inserted']} {spec.kind} events uploaded successfully."
+
+    unmatched_techs, low_confidence = matcher.report()
+    stats = timer.report(processed)
+    observe_import(spec.kind, stats)
+    # One summary line per upload; per-row detail stays in the response
+    log.info("Import finished", extra={
+        "kind": spec.kind, "mode": mode, **counts, "rows": stats["rows"],
+        "rows_per_sec": stats["rows_per_sec"], "elapsed_sec": stats["elapsed_sec"],
+        "unmatched_technicians": len(unmatched_techs), "low_confidence_matches": len(low_confidence),
+    })
+    return {
+        "message": message,
+        **counts,
+        "unmatched_technicians": unmatched_techs,
+        "low_confidence_matches": low_confidence,
+        "stats": stats,
+    }
+
+
+class IngestTimer:
+    """Wall-clock timer for an upload; reports rows/sec for the response."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+
+    def report(self, rows):
+        elapsed = time.perf_counter() - self.start
+        return {
+            "rows": rows,
+            "elapsed_sec": round(elapsed, 3),
+            "rows_per_sec": round(rows / elapsed, 1) if elapsed > 0 else None,
+        }
@@ -0,0 +1,55 @@
+# materials_catalog.py
+# Per-worker cache of the materials table behind /materials/data and /materials/electrical.
+import os
+from collections import namedtuple
+from table_cache import TableCache
+
+CHECK_INTERVAL = float(os.getenv("MATERIALS_CACHE_CHECK_INTERVAL", "30"))
+
+MATERIALS_SQL = """
+    SELECT id, type, category, description, manufacture, vendor
+    FROM materials
+    WHERE type IN ('data', 'electrical')
+    ORDER BY id;
+"""
+
+MaterialsSnapshot = namedtuple("MaterialsSnapshot", ["version", "fingerprint", "data", "electrical"])
+
+
+class MaterialsCatalog(TableCache):
+    """Both material lists, loaded in one query and reloaded when `materials` changes."""
+
+    def __init__(self, check_interval=CHECK_INTERVAL):
+        super().__init__("materials", check_interval)
+
+    def _load(self, cur, version, fingerprint):
+        cur.execute(MATERIALS_SQL)
+        data, electrical = [], []
+        for r in cur.fetchall():
+            if r["type"] == "data":
+                data.append({
+                    "id": r["id"],
+                    "category": r["category"],
+                    "description": r["description"],
+                    "manufacture": r["manufacture"],
+                    "vendor": r["vendor"],
+                })
+            else:
+                electrical.append({
+                    "id": r["id"],
+                    "description": r["description"],
+                    "manufacture": r["manufacture"],
+                    "vendor": r["vendor"],
+                })
+        return MaterialsSnapshot(version, fingerprint, data, electrical)
+
+    def info(self):
+        snap = self._snapshot
+        return {
+            **super().info(),
+            "data": len(snap.data) if snap else 0,
+            "electrical": len(snap.electrical) if snap else 0,
+        }
+
+
+materials_catalog = MaterialsCatalog()
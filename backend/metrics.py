@@ -0,0 +1,491 @@
+# metrics.py
+# Request / query instrumentation and a Prometheus text endpoint.
+#
+#   init_metrics(app)   # before/after-request hooks + GET /metrics
+#
+# Values are kept in-process with no extra dependency. Under gunicorn every
+# worker also writes them to METRICS_DIR (one file per process, rewritten
+# every METRICS_FLUSH_INTERVAL seconds) and /metrics answers with the sum
+# of all files, so a scrape sees the whole server whichever worker answers.
+# Files of workers that exited are kept so counters never go backwards;
+# gunicorn.conf.py empties the directory when the server starts.
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from flask import Response, g, has_request_context, jsonify, request
+
+# Requests slower than this (ms) are logged with their query list; 0 disables
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))
+SLOW_QUERY_LIMIT = 100          # queries kept per request for the slow log
+# /metrics and /api/health/* answer loopback callers only unless this is set
+METRICS_ALLOW_REMOTE = os.getenv("METRICS_ALLOW_REMOTE", "") == "1"
+# Shared directory for multi-process aggregation; unset keeps it per process
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+
+log = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+RATE_BUCKETS = (100, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
+
+
+def _label_str(labels):
+    if not labels:
+        return ""
+    parts = []
+    for k, v in labels:
+        v = str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    def render(self, values):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_label_str(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}       # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {key: list(series) for key, series in self._series.items()}
+
+    def render(self, values):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(values.items()):
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_label_str(key + (('le', bound),))} {count}")
+            lines.append(f"{self.name}_bucket{_label_str(key + (('le', '+Inf'),))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_label_str(key)} {series[-2]}")
+            lines.append(f"{self.name}_count{_label_str(key)} {series[-1]}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    "portal_request_duration_seconds",
+    "Time to build the response (first byte for streamed bodies).")
+REQUEST_DB_SECONDS = Histogram(
+    "portal_request_db_seconds",
+    "Time spent in database calls per request, streamed bodies included.")
+REQUEST_QUERIES = Counter(
+    "portal_db_queries_total",
+    "Database statements executed while serving requests.")
+RESPONSE_BYTES = Histogram(
+    "portal_response_bytes",
+    "Response body size.", buckets=BYTES_BUCKETS)
+TOKEN_VERIFY_SECONDS = Histogram(
+    "portal_token_verify_seconds",
+    "Firebase ID token verification time, by token cache outcome.")
+IMPORT_ROWS = Counter(
+    "portal_import_rows_total",
+    "Rows processed by work/travel imports.")
+IMPORT_ROWS_PER_SEC = Histogram(
+    "portal_import_rows_per_second",
+    "Throughput of each completed import.", buckets=RATE_BUCKETS)
+
+REGISTRY = [REQUEST_SECONDS, REQUEST_DB_SECONDS, REQUEST_QUERIES, RESPONSE_BYTES,
+            TOKEN_VERIFY_SECONDS, IMPORT_ROWS, IMPORT_ROWS_PER_SEC]
+
+
+# === Query timing ===
+
+# Stats of the streamed body this thread is producing a chunk of; streamed
+# bodies run after the request context is gone
+_streaming = threading.local()
+
+
+def record_query(sql, elapsed):
+    """Charge one database call to the current request or streamed body (no-op otherwise)."""
+    if has_request_context():
+        stats = g.get("_metrics")
+    else:
+        stats = getattr(_streaming, "stats", None)
+    if stats is None:
+        return
+    stats["db_seconds"] += elapsed
+    stats["queries"] += 1
+    if SLOW_REQUEST_MS and len(stats["query_log"]) < SLOW_QUERY_LIMIT:
+        if isinstance(sql, bytes):
+            sql = sql.decode("utf-8", "replace")
+        stats["query_log"].append((" ".join(str(sql).split())[:300], elapsed))
+
+
+class TimedCursor:
+    """Cursor proxy that reports execute/copy (and server-side fetch) time to record_query()."""
+
+    def __init__(self, cur):
+        self._cur = cur
+
+    def _timed(self, method, sql, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(sql, *args, **kwargs)
+        finally:
+            record_query(sql, time.perf_counter() - start)
+
+    def execute(self, sql, *args, **kwargs):
+        return self._timed(self._cur.execute, sql, *args, **kwargs)
+
+    def executemany(self, sql, *args, **kwargs):
+        return self._timed(self._cur.executemany, sql, *args, **kwargs)
+
+    def copy_expert(self, sql, *args, **kwargs):
+        return self._timed(self._cur.copy_expert, sql, *args, **kwargs)
+
+    # Fetching from a named (server-side) cursor is a round trip to Postgres;
+    # from a client-side one it only reads rows already received
+    def _fetch(self, method, *args):
+        if self._cur.name is None:
+            return method(*args)
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            record_query(f"FETCH FROM {self._cur.name}", time.perf_counter() - start)
+
+    def fetchone(self):
+        return self._fetch(self._cur.fetchone)
+
+    def fetchmany(self, *args):
+        return self._fetch(self._cur.fetchmany, *args)
+
+    def fetchall(self):
+        return self._fetch(self._cur.fetchall)
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+    def __setattr__(self, name, value):
+        if name == "_cur":
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._cur, name, value)
+
+    def __iter__(self):
+        return iter(self._cur)
+
+    def __enter__(self):
+        self._cur.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._cur.__exit__(*exc)
+
+
+# === Other observations ===
+
+def observe_token_verify(elapsed, cache):
+    TOKEN_VERIFY_SECONDS.observe(elapsed, cache=cache)
+
+
+def observe_import(kind, stats):
+    """Record an IngestTimer report for a finished import."""
+    _start_flusher()
+    IMPORT_ROWS.inc(stats["rows"], kind=kind)
+    if stats.get("rows_per_sec"):
+        IMPORT_ROWS_PER_SEC.observe(stats["rows_per_sec"], kind=kind)
+
+
+# === Multi-process aggregation ===
+
+_flusher_pid = None
+_metrics_file = None
+_flusher_lock = threading.Lock()
+_write_lock = threading.Lock()
+
+
+def _snapshot():
+    """This process's values: metrics by name plus the DB pool counters."""
+    from db import pool_stats
+    snap = {"pid": os.getpid(),
+            "metrics": {metric.name: metric.snapshot() for metric in REGISTRY},
+            "pool": None, "replicas": None}
+    pool = pool_stats()
+    if pool.get("initialized"):
+        snap["pool"] = {key: pool[key] for key in
+                        ("in_use", "idle", "waiting", "max_size", "checkouts", "timeouts", "connects")}
+    replicas = pool.get("read_replicas")
+    if replicas:
+        snap["replicas"] = {
+            "replica_reads": replicas["replica_reads"],
+            "primary_fallbacks": replicas["primary_fallbacks"],
+            "usable": {r["name"]: int(not r["down"] and not r["lagging"]) for r in replicas["replicas"]},
+        }
+    return snap
+
+
+def _to_json(snap):
+    metrics = {name: [[[list(pair) for pair in key], value] for key, value in values.items()]
+               for name, values in snap["metrics"].items()}
+    return {**snap, "metrics": metrics}
+
+
+def _from_json(data):
+    metrics = {name: {tuple(tuple(pair) for pair in key): value for key, value in values}
+               for name, values in data["metrics"].items()}
+    return {**data, "metrics": metrics}
+
+
+def _flush():
+    if _flusher_pid != os.getpid():
+        return
+    data = json.dumps(_to_json(_snapshot()))
+    with _write_lock:
+        # Write aside and rename so a scrape never reads half a file
+        tmp = _metrics_file + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(data)
+        os.replace(tmp, _metrics_file)
+
+
+def _flush_loop():
+    while True:
+        time.sleep(METRICS_FLUSH_INTERVAL)
+        try:
+            _flush()
+        except Exception:
+            log.exception("Could not write metrics", extra={"dir": METRICS_DIR})
+
+
+def _start_flusher():
+    """Start writing this process's values to METRICS_DIR (once per process, after any fork)."""
+    global _flusher_pid, _metrics_file
+    if not METRICS_DIR or _flusher_pid == os.getpid():
+        return
+    with _flusher_lock:
+        if _flusher_pid == os.getpid():
+            return
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        # A fresh name per process: one that later gets the same pid must not
+        # overwrite (and so roll back) the counts of this one
+        _metrics_file = os.path.join(METRICS_DIR, f"{os.getpid()}-{uuid.uuid4().hex[:8]}.json")
+        _flusher_pid = os.getpid()
+        threading.Thread(target=_flush_loop, name="metrics-flush", daemon=True).start()
+        atexit.register(_flush)
+
+
+def reset_metrics_dir():
+    """Empty METRICS_DIR; the gunicorn master calls this before forking workers."""
+    if not METRICS_DIR:
+        return
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    for name in os.listdir(METRICS_DIR):
+        if name.endswith((".json", ".tmp")):
+            os.remove(os.path.join(METRICS_DIR, name))
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _collect():
+    """Snapshots of every process sharing METRICS_DIR (just this one without it)."""
+    if not METRICS_DIR or _flusher_pid != os.getpid():
+        return [_snapshot()]
+    _flush()
+    snaps = []
+    for name in os.listdir(METRICS_DIR):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(METRICS_DIR, name)) as f:
+                snaps.append(_from_json(json.load(f)))
+        except (OSError, ValueError):
+            log.exception("Skipping unreadable metrics file", extra={"file": name})
+    return snaps
+
+
+def _merge(values, more):
+    for key, value in more.items():
+        if key not in values:
+            values[key] = value
+        elif isinstance(value, list):
+            values[key] = [a + b for a, b in zip(values[key], value)]
+        else:
+            values[key] += value
+
+
+# === Flask wiring ===
+
+def _route_labels():
+    rule = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    return {"blueprint": request.blueprint or "", "route": rule, "method": request.method}
+
+
+def _before_request():
+    _start_flusher()
+    g._metrics = {"start": time.perf_counter(), "db_seconds": 0.0, "queries": 0, "query_log": []}
+
+
+def _observe_db(stats, labels):
+    REQUEST_DB_SECONDS.observe(stats["db_seconds"], **labels)
+    if stats["queries"]:
+        REQUEST_QUERIES.inc(stats["queries"], **labels)
+
+
+class _MeteredBody:
+    """Streamed body: counts bytes and charges the database time spent producing
+    each chunk to the request; observed once, when the server closes it."""
+
+    def __init__(self, body, stats, labels):
+        self._body = body
+        self._iter = iter(body)
+        self._stats = stats
+        self._labels = labels
+        self._sent = 0
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        _streaming.stats = self._stats
+        try:
+            chunk = next(self._iter)
+        finally:
+            _streaming.stats = None
+        self._sent += len(chunk)
+        return chunk
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        _streaming.stats = self._stats
+        try:
+            close = getattr(self._body, "close", None)
+            if close is not None:
+                close()
+        finally:
+            _streaming.stats = None
+            RESPONSE_BYTES.observe(self._sent, **self._labels)
+            _observe_db(self._stats, self._labels)
+
+
+def _after_request(response):
+    stats = g.get("_metrics")
+    if stats is None:
+        return response
+    elapsed = time.perf_counter() - stats["start"]
+    labels = _route_labels()
+
+    REQUEST_SECONDS.observe(elapsed, status=response.status_code, **labels)
+    # File bodies (static_assets) must stay unwrapped for sendfile; their length is known
+    if response.is_streamed and not response.direct_passthrough:
+        # Database time is observed when the body is done, with what it fetched
+        response.response = _MeteredBody(response.response, stats, labels)
+    else:
+        _observe_db(stats, labels)
+        RESPONSE_BYTES.observe(response.content_length or 0, **labels)
+
+    if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+        log.warning("Slow request", extra={
+            "method": request.method, "path": request.path, "status": response.status_code,
+            "elapsed_ms": round(elapsed * 1000, 1), "db_ms": round(stats["db_seconds"] * 1000, 1),
+            "queries": [{"ms": round(took * 1000, 2), "sql": sql} for sql, took in stats["query_log"]],
+        })
+    return response
+
+
+def render_metrics():
+    snaps = _collect()
+    lines = []
+    for metric in REGISTRY:
+        values = {}
+        for snap in snaps:
+            _merge(values, snap["metrics"].get(metric.name, {}))
+        lines.extend(metric.render(values))
+
+    # Counters add up over every process that ever ran; gauges over live ones
+    pools = [snap["pool"] for snap in snaps if snap["pool"]]
+    if pools:
+        live = [snap["pool"] for snap in snaps if snap["pool"] and _alive(snap["pid"])]
+        for key in ("in_use", "idle", "waiting", "max_size"):
+            lines.append(f"# TYPE portal_db_pool_{key} gauge")
+            lines.append(f"portal_db_pool_{key} {sum(pool[key] for pool in live)}")
+        for key in ("checkouts", "timeouts", "connects"):
+            lines.append(f"# TYPE portal_db_pool_{key}_total counter")
+            lines.append(f"portal_db_pool_{key}_total {sum(pool[key] for pool in pools)}")
+    replicas = [snap["replicas"] for snap in snaps if snap["replicas"]]
+    if replicas:
+        for key in ("replica_reads", "primary_fallbacks"):
+            lines.append(f"# TYPE portal_db_{key}_total counter")
+            lines.append(f"portal_db_{key}_total {sum(r[key] for r in replicas)}")
+        # Usable only while every live worker finds it usable
+        usable = {}
+        for snap in snaps:
+            if snap["replicas"] and _alive(snap["pid"]):
+                for name, ok in snap["replicas"]["usable"].items():
+                    usable[name] = min(usable.get(name, 1), ok)
+        lines.append("# TYPE portal_db_replica_usable gauge")
+        for name, ok in sorted(usable.items()):
+            lines.append(f'portal_db_replica_usable{{replica="{name}"}} {ok}')
+    return "\n".join(lines) + "\n"
+
+
+def internal_only():
+    """403 response for callers that may not read operational endpoints
+    (/metrics, /api/health/*), None for loopback or METRICS_ALLOW_REMOTE."""
+    if not METRICS_ALLOW_REMOTE and request.remote_addr not in ("127.0.0.1", "::1"):
+        return jsonify({"error": "Forbidden"}), 403
+    return None
+
+
+def metrics_view():
+    denied = internal_only()
+    if denied:
+        return denied
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+
+def init_metrics(app):
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.add_url_rule("/metrics", "metrics", metrics_view, methods=["GET"])
@@ -0,0 +1,74 @@
+-- 0001_base_tables.sql
+-- The tables the portal reads and writes. IF NOT EXISTS throughout, so an
+-- existing database (created by hand before migrations) is adopted as is.
+
+CREATE TABLE IF NOT EXISTS users (
+    id SERIAL PRIMARY KEY,
+    firebase_uid TEXT,
+    name TEXT,
+    email TEXT UNIQUE,                  -- /login upserts ON CONFLICT (email)
+    role TEXT NOT NULL DEFAULT 'technician'
+);
+
+CREATE TABLE IF NOT EXISTS employees (
+    id SERIAL PRIMARY KEY,
+    name TEXT,
+    position TEXT,
+    phone TEXT,
+    email TEXT UNIQUE,
+    certifications TEXT
+);
+
+CREATE TABLE IF NOT EXISTS materials (
+    id SERIAL PRIMARY KEY,
+    category TEXT,
+    description TEXT,
+    manufacture TEXT,
+    vendor TEXT,
+    type TEXT,                          -- data | electrical
+    UNIQUE (description, type)
+);
+
+-- Event times are naive wall-clock times, as exported (see event_queries._wall_time)
+CREATE TABLE IF NOT EXISTS work_events (
+    id SERIAL PRIMARY KEY,
+    employee_id INTEGER,
+    date_and_time TIMESTAMP,
+    customer_name TEXT,
+    property TEXT,
+    job TEXT,
+    visit TEXT,
+    description TEXT,
+    job_type TEXT,
+    primary_technician TEXT,
+    department TEXT,
+    visit_status TEXT,
+    last_updated_by INTEGER,
+    last_updated_by_name TEXT,
+    last_updated_time_utc TIMESTAMP,
+    address_line TEXT,
+    city TEXT,
+    state TEXT,
+    zipcode TEXT,
+    created_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS travel_events (
+    id SERIAL PRIMARY KEY,
+    employee_id INTEGER,
+    planned_start_time_utc TIMESTAMP,
+    name TEXT,
+    property TEXT,
+    job_number TEXT,
+    visit_number TEXT,
+    description TEXT,
+    event_type TEXT,
+    technician_name TEXT,
+    department_name TEXT,
+    status TEXT,
+    additional_technicians TEXT,
+    last_updated_by INTEGER,
+    last_updated_by_name TEXT,
+    last_updated_time_utc TIMESTAMP,
+    created_at TIMESTAMP
+);
@@ -0,0 +1,32 @@
+-- 0002_event_sync.sql
+-- Change tracking behind `?since=<sync_token>` (event_sync.py): an
+-- updated_at column kept current by a trigger, and tombstones for deletes.
+
+CREATE TABLE IF NOT EXISTS event_tombstones (
+    id BIGSERIAL PRIMARY KEY,
+    source TEXT NOT NULL,               -- table the event lived in
+    event_id INTEGER,                   -- NULL: every event in `source` was deleted
+    employee_id INTEGER,
+    deleted_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS event_tombstones_source_deleted_at_idx
+    ON event_tombstones (source, deleted_at);
+
+CREATE OR REPLACE FUNCTION touch_updated_at() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at := now();
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+ALTER TABLE work_events ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+CREATE INDEX IF NOT EXISTS work_events_updated_at_idx ON work_events (updated_at);
+DROP TRIGGER IF EXISTS work_events_touch_updated_at ON work_events;
+CREATE TRIGGER work_events_touch_updated_at BEFORE UPDATE ON work_events
+    FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+
+ALTER TABLE travel_events ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+CREATE INDEX IF NOT EXISTS travel_events_updated_at_idx ON travel_events (updated_at);
+DROP TRIGGER IF EXISTS travel_events_touch_updated_at ON travel_events;
+CREATE TRIGGER travel_events_touch_updated_at BEFORE UPDATE ON travel_events
+    FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
@@ -0,0 +1,21 @@
+-- 0003_import_jobs.sql
+-- Background upload jobs (import_jobs.py); /imports/<id> reads progress here.
+
+CREATE TABLE IF NOT EXISTS import_jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,                 -- work | travel
+    mode TEXT NOT NULL,
+    filename TEXT,
+    uploader_id INTEGER,
+    phase TEXT NOT NULL,                -- queued, waiting, parsing, writing, done, failed
+    rows_total INTEGER,
+    rows_processed INTEGER NOT NULL DEFAULT 0,
+    rows_per_sec DOUBLE PRECISION,
+    result JSONB,
+    error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    started_at TIMESTAMPTZ,
+    finished_at TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS import_jobs_created_at_idx ON import_jobs (created_at);
@@ -0,0 +1,31 @@
+-- 0004_hot_query_indexes.sql
+-- Indexes shaped after the queries every page load runs.
+-- benchmarks/check_query_plans.py fails if one of them falls back to a
+-- sequential scan.
+--
+-- Plain CREATE INDEX (not CONCURRENTLY) so the migration stays one
+-- transaction; at the portal's table sizes the write lock lasts seconds,
+-- and reads are not blocked.
+
+-- user_cache.get_user: WHERE firebase_uid = %s, answered from the index alone
+CREATE INDEX IF NOT EXISTS users_firebase_uid_idx ON users (firebase_uid) INCLUDE (id, email, name, role);
+
+-- /login arbitrates ON CONFLICT (email); databases created by hand may lack it
+-- (same name as the constraint 0001 creates, so this is a no-op there)
+CREATE UNIQUE INDEX IF NOT EXISTS users_email_key ON users (email);
+
+-- Technician calendar: WHERE employee_id = %s AND <window> ORDER BY time, id,
+-- with the keyset cursor on the same (time, id) pair
+CREATE INDEX IF NOT EXISTS work_events_employee_time_idx ON work_events (employee_id, date_and_time, id);
+CREATE INDEX IF NOT EXISTS travel_events_employee_time_idx ON travel_events (employee_id, planned_start_time_utc, id);
+
+-- Scheduler/admin calendar: the same window over every technician
+CREATE INDEX IF NOT EXISTS work_events_time_idx ON work_events (date_and_time, id);
+CREATE INDEX IF NOT EXISTS travel_events_time_idx ON travel_events (planned_start_time_utc, id);
+
+-- Upsert imports match staged rows to the table on the export's natural key
+CREATE INDEX IF NOT EXISTS work_events_job_visit_idx ON work_events (job, visit);
+CREATE INDEX IF NOT EXISTS travel_events_job_visit_idx ON travel_events (job_number, visit_number);
+
+-- materials_catalog reads both types (every row) in id order: the primary
+-- key already serves that, so materials gets no extra index to maintain
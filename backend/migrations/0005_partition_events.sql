@@ -0,0 +1,74 @@
+-- 0005_partition_events.sql
+-- Range-partition work_events and travel_events by month on their event
+-- time (event_partitions.py creates new months on import, archives old
+-- ones and clears a table by dropping partitions).
+--
+-- Each table is rebuilt: renamed aside, recreated PARTITION BY RANGE with
+-- one partition per month present in the data plus a DEFAULT partition
+-- (rows without a time), refilled, and the old copy dropped. The id
+-- sequence is kept. Skipped for a table that is already partitioned.
+--
+-- There is no primary key any more: a unique index on a partitioned table
+-- has to include the partition key, which may be NULL. Ids still come from
+-- the same sequence, and nothing looks events up by id alone.
+
+DO $$
+DECLARE
+    spec RECORD;
+    month TIMESTAMP;
+    seq TEXT;
+BEGIN
+    FOR spec IN
+        SELECT * FROM (VALUES ('work_events', 'date_and_time'),
+                              ('travel_events', 'planned_start_time_utc')) AS t(tbl, col)
+    LOOP
+        IF (SELECT relkind FROM pg_class WHERE oid = to_regclass(spec.tbl)) = 'p' THEN
+            CONTINUE;
+        END IF;
+
+        EXECUTE format('ALTER TABLE %I RENAME TO %I', spec.tbl, spec.tbl || '_unpartitioned');
+        EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS) PARTITION BY RANGE (%I)',
+                       spec.tbl, spec.tbl || '_unpartitioned', spec.col);
+        EXECUTE format('CREATE TABLE %I PARTITION OF %I DEFAULT', spec.tbl || '_default', spec.tbl);
+
+        FOR month IN EXECUTE format(
+            'SELECT DISTINCT date_trunc(''month'', %I) FROM %I WHERE %I IS NOT NULL',
+            spec.col, spec.tbl || '_unpartitioned', spec.col)
+        LOOP
+            EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                           spec.tbl || '_' || to_char(month, 'YYYY_MM'), spec.tbl,
+                           month, month + interval '1 month');
+        END LOOP;
+
+        EXECUTE format('INSERT INTO %I SELECT * FROM %I', spec.tbl, spec.tbl || '_unpartitioned');
+
+        -- The sequence belongs to the old table's id; hand it over before the drop
+        seq := pg_get_serial_sequence(spec.tbl || '_unpartitioned', 'id');
+        IF seq IS NOT NULL THEN
+            EXECUTE format('ALTER SEQUENCE %s OWNED BY %I.id', seq, spec.tbl);
+        END IF;
+        EXECUTE format('DROP TABLE %I', spec.tbl || '_unpartitioned');
+    END LOOP;
+END
+$$;
+
+-- Indexes and triggers went with the old tables; the partitioned ones
+-- pass these down to every partition, including ones attached later.
+CREATE INDEX IF NOT EXISTS work_events_employee_time_idx ON work_events (employee_id, date_and_time, id);
+CREATE INDEX IF NOT EXISTS work_events_time_idx ON work_events (date_and_time, id);
+CREATE INDEX IF NOT EXISTS work_events_job_visit_idx ON work_events (job, visit);
+CREATE INDEX IF NOT EXISTS work_events_updated_at_idx ON work_events (updated_at);
+DROP TRIGGER IF EXISTS work_events_touch_updated_at ON work_events;
+CREATE TRIGGER work_events_touch_updated_at BEFORE UPDATE ON work_events
+    FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+
+CREATE INDEX IF NOT EXISTS travel_events_employee_time_idx ON travel_events (employee_id, planned_start_time_utc, id);
+CREATE INDEX IF NOT EXISTS travel_events_time_idx ON travel_events (planned_start_time_utc, id);
+CREATE INDEX IF NOT EXISTS travel_events_job_visit_idx ON travel_events (job_number, visit_number);
+CREATE INDEX IF NOT EXISTS travel_events_updated_at_idx ON travel_events (updated_at);
+DROP TRIGGER IF EXISTS travel_events_touch_updated_at ON travel_events;
+CREATE TRIGGER travel_events_touch_updated_at BEFORE UPDATE ON travel_events
+    FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+
+-- Where event_partitions.archive_partitions() moves detached months
+CREATE SCHEMA IF NOT EXISTS archive;
@@ -0,0 +1,7 @@
+-- 0006_import_job_owner.sql
+-- Which process runs an import job: a random id that process holds an
+-- advisory lock on (IMPORT_OWNER_KEY in import_jobs.py) while it lives.
+-- A queued or running job whose owner lock is gone was left behind by a
+-- worker that stopped, and is failed by recover_stale_jobs().
+
+ALTER TABLE import_jobs ADD COLUMN IF NOT EXISTS owner INTEGER;
@@ -0,0 +1,31 @@
+-- 0007_sync_by_xid.sql
+-- Sync tokens ordered by commit, not by clock (event_sync.py): every event
+-- write and tombstone records the id of the transaction that made it, and
+-- a token is the oldest transaction still running when it was issued.
+-- updated_at/deleted_at are stamped at transaction start, so a long import
+-- could commit rows older than a token issued in the meantime.
+--
+-- The columns are added without a default first (no table rewrite);
+-- existing rows stay NULL, which only a since=0 full sync returns, and
+-- tokens issued before this migration are answered with a reset.
+
+CREATE OR REPLACE FUNCTION touch_updated_at() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at := now();
+    NEW.updated_xid := pg_current_xact_id();
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+ALTER TABLE work_events ADD COLUMN IF NOT EXISTS updated_xid xid8;
+ALTER TABLE work_events ALTER COLUMN updated_xid SET DEFAULT pg_current_xact_id();
+CREATE INDEX IF NOT EXISTS work_events_updated_xid_idx ON work_events (updated_xid);
+
+ALTER TABLE travel_events ADD COLUMN IF NOT EXISTS updated_xid xid8;
+ALTER TABLE travel_events ALTER COLUMN updated_xid SET DEFAULT pg_current_xact_id();
+CREATE INDEX IF NOT EXISTS travel_events_updated_xid_idx ON travel_events (updated_xid);
+
+ALTER TABLE event_tombstones ADD COLUMN IF NOT EXISTS deleted_xid xid8;
+ALTER TABLE event_tombstones ALTER COLUMN deleted_xid SET DEFAULT pg_current_xact_id();
+CREATE INDEX IF NOT EXISTS event_tombstones_source_deleted_xid_idx
+    ON event_tombstones (source, deleted_xid);
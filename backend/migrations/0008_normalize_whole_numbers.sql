@@ -0,0 +1,28 @@
+-- 0008_normalize_whole_numbers.sql
+-- Uploads used to store whole numbers from Excel as "12345.0" whenever the
+-- column had a blank cell (pandas read it as floats). ingest.prepare_frame
+-- now writes "12345" in every case, so an upsert would otherwise see each
+-- such legacy row as changed (or, through its job/visit key, as gone and
+-- new). Rewrite the legacy text the same way once.
+
+DO $$
+DECLARE
+    tbl TEXT;
+    cols TEXT[];
+BEGIN
+    FOREACH tbl IN ARRAY ARRAY['work_events', 'travel_events'] LOOP
+        SELECT array_agg(column_name::TEXT ORDER BY ordinal_position) INTO cols
+        FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = tbl AND data_type = 'text';
+
+        EXECUTE format(
+            'UPDATE %I SET %s WHERE %s',
+            tbl,
+            (SELECT string_agg(format('%1$I = regexp_replace(%1$I, ''^(-?[0-9]+)\.0$'', ''\1'')', c), ', ')
+             FROM unnest(cols) c),
+            (SELECT string_agg(format('%I ~ ''^-?[0-9]+\.0$''', c), ' OR ')
+             FROM unnest(cols) c)
+        );
+    END LOOP;
+END
+$$;
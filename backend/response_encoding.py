@@ -0,0 +1,134 @@
+# response_encoding.py
+# Large JSON bodies: a faster encoder for event lists, arrays built batch by
+# batch instead of as one string, and gzip/brotli on the way out.
+#
+# orjson and brotli are optional. Without orjson the stdlib encoder is used
+# (same JSON, several times slower); without brotli only gzip is offered.
+import json
+import os
+import zlib
+from flask import current_app, request
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_RESPONSES = os.getenv("COMPRESS_RESPONSES", "1") == "1"
+# Smaller bodies go out as they are (a packet or two either way)
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "2048"))
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+# On event JSON brotli 2 is ~30% smaller than gzip -6 and ~4x faster
+# (benchmarks/bench_response_encoding.py); 5+ is smaller still but slower
+# than gzip, and 11 is only for files compressed once (static_assets.py)
+COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "2"))
+COMPRESSIBLE_TYPES = {"application/json", "text/plain", "text/csv", "text/html"}
+
+
+# === JSON ===
+
+def dumps(obj):
+    """Compact JSON as bytes; values the encoder does not know become str()."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str)
+    return json.dumps(obj, default=str, separators=(",", ":")).encode("utf-8")
+
+
+def encode_items(items):
+    """JSON documents for a batch of items, comma-joined without brackets."""
+    if orjson is not None:
+        # One call for the whole batch, minus the "[" and "]"
+        return orjson.dumps(list(items), default=str)[1:-1]
+    return b",".join(dumps(item) for item in items)
+
+
+def json_response(obj, status=200):
+    return current_app.response_class(dumps(obj), status=status, mimetype="application/json")
+
+
+# === Compression ===
+
+def available_encodings():
+    """Content codings this process can produce, in order of preference."""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+class _Compressor:
+    """Incremental gzip or brotli with one interface."""
+
+    def __init__(self, encoding, gzip_level=None, brotli_quality=None):
+        if encoding == "br":
+            quality = COMPRESS_BROTLI_QUALITY if brotli_quality is None else brotli_quality
+            obj = brotli.Compressor(quality=quality)
+            self.compress, self.finish = obj.process, obj.finish
+        else:
+            level = COMPRESS_GZIP_LEVEL if gzip_level is None else gzip_level
+            obj = zlib.compressobj(level, zlib.DEFLATED, 31)    # wbits 31: gzip container
+            self.compress, self.finish = obj.compress, obj.flush
+
+
+def compress(data, encoding, **levels):
+    compressor = _Compressor(encoding, **levels)
+    return compressor.compress(data) + compressor.finish()
+
+
+def compress_stream(body, encoding, **levels):
+    """Compress a streamed body chunk by chunk; closes `body` when done or abandoned."""
+    compressor = _Compressor(encoding, **levels)
+    try:
+        for chunk in body:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            out = compressor.compress(chunk)
+            if out:
+                yield out
+        yield compressor.finish()
+    finally:
+        close = getattr(body, "close", None)
+        if close is not None:
+            close()    # e.g. returns a streaming query's connection to the pool
+
+
+def _compress_response(response):
+    if (
+        response.status_code != 200
+        or request.method == "HEAD"
+        or response.direct_passthrough    # files: static_assets serves precompressed variants
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_TYPES
+    ):
+        return response
+    if not response.is_streamed and (response.content_length or 0) < COMPRESS_MIN_SIZE:
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = request.accept_encodings.best_match(available_encodings() + ["identity"], default="identity")
+    if encoding == "identity":
+        return response
+
+    if response.is_streamed:
+        # Length unknown up front: only the big unbounded reads stream
+        response.response = compress_stream(response.response, encoding)
+        response.headers.pop("Content-Length", None)
+    else:
+        response.set_data(compress(response.get_data(), encoding))
+    response.content_encoding = encoding
+
+    # Same content, different bytes: a strong validator would now be wrong.
+    # Weak comparison (If-None-Match) still matches it, so 304s keep working.
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_compression(app):
+    """Call last in create_app: after_request hooks run in reverse, so the
+    body is compressed before metrics counts it."""
+    if COMPRESS_RESPONSES:
+        app.after_request(_compress_response)
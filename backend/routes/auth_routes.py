@@ -1,10 +1,49 @@
 # auth_routes.py
+import logging
 from flask import Blueprint, request, jsonify
-from firebase_admin import auth
+from auth_utils import verify_id_token_cached
 import psycopg2.extras
 from db import get_db_connection
+from user_cache import invalidate_user, remember
 
 bp = Blueprint("auth_routes", __name__)
+log = logging.getLogger(__name__)
+
+# Insert a new user, or refresh firebase_uid/name only when they changed, so a
+# routine login is a read (no row version, WAL or index churn). When the
+# update is skipped the INSERT returns nothing and the fallback SELECT does;
+# both see the pre-statement snapshot, which is also where previous_uid comes from.
+LOGIN_UPSERT_SQL = """
+    WITH upsert AS (
+        INSERT INTO users (firebase_uid, name, email, role)
+        VALUES (%(uid)s, %(name)s, %(email)s, 'technician')
+        ON CONFLICT (email) DO UPDATE
+            SET firebase_uid = EXCLUDED.firebase_uid, name = EXCLUDED.name
+            WHERE users.firebase_uid IS DISTINCT FROM EXCLUDED.firebase_uid
+               OR users.name IS DISTINCT FROM EXCLUDED.name
+        RETURNING id, email, name, firebase_uid, role
+    ), previous AS (
+        SELECT id, email, name, firebase_uid, role FROM users WHERE email = %(email)s
+    )
+    SELECT u.*, (SELECT firebase_uid FROM previous) AS previous_uid FROM upsert u
+    UNION ALL
+    SELECT p.*, p.firebase_uid AS previous_uid FROM previous p
+    WHERE NOT EXISTS (SELECT 1 FROM upsert)
+"""
+
+
+def upsert_login_user(cur, uid, name, email):
+    """Create or refresh the users row for a login; returns (user, previous firebase_uid)."""
+    cur.execute(LOGIN_UPSERT_SQL, {"uid": uid, "name": name, "email": email})
+    row = cur.fetchone()
+    if row is None:
+        # A concurrent first login inserted the same row after our snapshot
+        # and ours was a no-op; a fresh statement sees it.
+        cur.execute("SELECT id, email, name, firebase_uid, role FROM users WHERE email = %s", (email,))
+        return dict(cur.fetchone()), uid
+    user = dict(row)
+    return user, user.pop("previous_uid")
+
 
 @bp.route("/login", methods=["POST"])
 def login():
@@ -15,7 +54,7 @@ def login():
         return jsonify({"success": False, "message": "No ID token provided"}), 400
 
     try:
-        decoded_token = auth.verify_id_token(id_token)
+        decoded_token = verify_id_token_cached(id_token)
         email = decoded_token.get("email")
         name = decoded_token.get("name", "")
         uid = decoded_token.get("uid")
@@ -27,31 +66,19 @@ def login():
         if not any(email.endswith(f"@{d}") for d in allowed_domains):
             return jsonify({"success": False, "message": "Only STINTE and UPANDCS are allowed"}), 403
 
-        # DB lookup / create / update
+        # DB lookup / create / update, in one round trip
         with get_db_connection() as conn:
             with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-                cur.execute("SELECT * FROM users WHERE email = %s", (email,))
-                user = cur.fetchone()
-
-                if not user:
-                    cur.execute("""
-                        INSERT INTO users (firebase_uid, name, email, role)
-                        VALUES (%s, %s, %s, %s)
-                        RETURNING id, email, name, firebase_uid, role
-                    """, (uid, name, email, "technician"))
-                    user = cur.fetchone()
-                else:
-                    cur.execute("""
-                        UPDATE users
-                        SET firebase_uid = %s, name = %s
-                        WHERE email = %s
-                        RETURNING id, email, name, firebase_uid, role
-                    """, (uid, name, email))
-                    user = cur.fetchone()
-
+                user, previous_uid = upsert_login_user(cur, uid, name, email)
                 conn.commit()
 
+        # The email may have moved to a new Firebase UID; drop the old mapping
+        if previous_uid and previous_uid != uid:
+            invalidate_user(previous_uid)
+        remember(uid, user)
+
         return jsonify({"success": True, "user": dict(user)}), 200
 
     except Exception as e:
+        log.warning("Login failed", exc_info=True)
         return jsonify({"success": False, "message": "Authentication failed", "error": str(e)}), 401
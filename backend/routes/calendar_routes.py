@@ -0,0 +1,28 @@
+# calendar_routes.py
+import logging
+from flask import Blueprint, request, jsonify
+from auth_utils import verify_token
+from event_queries import merged_event_response
+from routes.work_routes import WORK_SOURCE
+from routes.travel_routes import TRAVEL_SOURCE
+
+bp = Blueprint("calendar_routes", __name__)
+log = logging.getLogger(__name__)
+
+# === Work + travel for FullCalendar in one time-ordered list ===
+# Same start/end and render params as /work/ and /travel/; one token check
+# and one users lookup instead of two.
+@bp.route("/calendar/", methods=["GET", "OPTIONS"])
+def get_calendar():
+    if request.method == "OPTIONS":
+        return jsonify({"status": "ok"}), 200
+
+    decoded, error_resp, status = verify_token()
+    if error_resp:
+        return error_resp, status
+
+    try:
+        return merged_event_response([WORK_SOURCE, TRAVEL_SOURCE], decoded.get("uid"), request.args)
+    except Exception as e:
+        log.exception("Error fetching calendar")
+        return jsonify({"success": False, "message": str(e)}), 500
@@ -1,13 +1,17 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint
+from http_cache import snapshot_response
 
 bp = Blueprint("company_routes", __name__)
 
+COMPANY_INFO = {
+    "name": "STRATEGIC INFRASTRUCTURE TECHNOLOGIES",
+    "address": "21121 W Hardy Rd, Houston, TX 77073",
+    "phone": "(833) 930-2583",
+    "email": "info@stinte.co",
+    "logo_url": "http://localhost:5000/static/logo.png"
+}
+
 @bp.route("/company-info", methods=["GET"])
 def company_info():
-    return jsonify({
-        "name": "STRATEGIC INFRASTRUCTURE TECHNOLOGIES",
-        "address": "21121 W Hardy Rd, Houston, TX 77073",
-        "phone": "(833) 930-2583",
-        "email": "info@stinte.co",
-        "logo_url": "http://localhost:5000/static/logo.png"
-    })
+    # Constant per deploy: version 1 is enough for the ETag cache
+    return snapshot_response("company-info", 1, COMPANY_INFO)
@@ -1,17 +1,11 @@
-from flask import Blueprint, jsonify
-from db import get_db_connection
-import psycopg2.extras
+from flask import Blueprint
+from employee_directory import employee_directory
+from http_cache import snapshot_response
 
 bp = Blueprint("employees_routes", __name__)
 
 @bp.route("/employees", methods=["GET"])
 def get_employees():
-    with get_db_connection() as conn:
-        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            cur.execute("""
-                SELECT id, name, position, phone, email, certifications
-                FROM employees
-                ORDER BY id;
-            """)
-            rows = cur.fetchall()
-    return jsonify(rows)
+    snap = employee_directory.snapshot()
+    # Phone numbers and emails: browsers may cache, shared caches may not
+    return snapshot_response("employees", snap.version, snap.records, private=True)
@@ -0,0 +1,32 @@
+from flask import Blueprint, jsonify
+from db import pool_stats
+from auth_utils import token_cache_stats
+from employee_directory import employee_directory
+from materials_catalog import materials_catalog
+from user_cache import user_cache_stats
+from metrics import internal_only
+
+bp = Blueprint("health_routes", __name__)
+
+# Pool and cache internals: same audience as /metrics
+bp.before_request(internal_only)
+
+@bp.route("/health/db-pool", methods=["GET"])
+def db_pool():
+    return jsonify(pool_stats()), 200
+
+@bp.route("/health/auth-cache", methods=["GET"])
+def auth_cache():
+    return jsonify(token_cache_stats()), 200
+
+@bp.route("/health/employee-cache", methods=["GET"])
+def employee_cache():
+    return jsonify(employee_directory.info()), 200
+
+@bp.route("/health/materials-cache", methods=["GET"])
+def materials_cache():
+    return jsonify(materials_catalog.info()), 200
+
+@bp.route("/health/user-cache", methods=["GET"])
+def user_cache():
+    return jsonify(user_cache_stats()), 200
@@ -0,0 +1,40 @@
+# import_routes.py
+import logging
+from flask import Blueprint, request, jsonify
+from auth_utils import verify_token
+from import_jobs import get_job
+from user_cache import get_user
+
+bp = Blueprint("import_routes", __name__)
+log = logging.getLogger(__name__)
+
+# === Status of a background upload ===
+@bp.route("/imports/<job_id>", methods=["GET", "OPTIONS"])
+def import_status(job_id):
+    if request.method == "OPTIONS":
+        return jsonify({"status": "ok"}), 200
+
+    decoded, error_resp, status = verify_token()
+    if error_resp:
+        return error_resp, status
+
+    try:
+        user = get_user(decoded["uid"])
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+        # Uploaders see their own jobs; admins see everyone's. Someone
+        # else's job is answered like a missing one.
+        uploader_id = None if user["role"].lower() == "admin" else user["id"]
+        job = get_job(job_id, uploader_id)
+        if not job:
+            return jsonify({"error": "Import job not found"}), 404
+
+        result = job["result"] or {}
+        return jsonify({
+            **job,
+            "unmatched_technicians": result.get("unmatched_technicians", []),
+            "low_confidence_matches": result.get("low_confidence_matches", []),
+        }), 200
+    except Exception as e:
+        log.exception("Error fetching import job")
+        return jsonify({"error": str(e)}), 500
@@ -1,49 +1,18 @@
-from flask import Blueprint, jsonify
-from db import get_db_connection
+from flask import Blueprint
+from http_cache import snapshot_response
+from materials_catalog import materials_catalog
 
 bp = Blueprint("materials_routes", __name__)
 
+# Served from the per-worker snapshot; revalidations get a 304 with no DB work
+# unless the snapshot is due for its fingerprint check.
 @bp.route("/materials/data", methods=["GET"])
 def get_data_materials():
-    with get_db_connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT id, category, description, manufacture, vendor
-                FROM materials
-                WHERE type = 'data'
-                ORDER BY id;
-            """)
-            rows = cur.fetchall()
-    return jsonify([
-        {
-            "id": r["id"],
-            "category": r["category"],
-            "description": r["description"],
-            "manufacture": r["manufacture"],
-            "vendor": r["vendor"],
-        }
-        for r in rows
-    ])
+    snap = materials_catalog.snapshot()
+    return snapshot_response("materials/data", snap.version, snap.data)
 
 
 @bp.route("/materials/electrical", methods=["GET"])
 def get_electrical_materials():
-    with get_db_connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT id, description, manufacture, vendor
-                FROM materials
-                WHERE type = 'electrical'
-                ORDER BY id;
-            """)
-            rows = cur.fetchall()
-    return jsonify([
-        {
-            "id": r["id"],
-            "description": r["description"],
-            "manufacture": r["manufacture"],
-            "vendor": r["vendor"],
-        }
-        for r in rows
-    ])
-
+    snap = materials_catalog.snapshot()
+    return snapshot_response("materials/electrical", snap.version, snap.electrical)
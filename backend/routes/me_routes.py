@@ -1,9 +1,10 @@
+import logging
 from flask import Blueprint, jsonify, request
-from db import get_db_connection
 from auth_utils import verify_token
-import psycopg2.extras
+from user_cache import get_user
 
 bp = Blueprint("me_routes", __name__)
+log = logging.getLogger(__name__)
 
 @bp.route("/me/", methods=["GET", "OPTIONS"])
 def get_current_user():
@@ -17,15 +18,7 @@ def get_current_user():
     firebase_uid = decoded.get("uid")
 
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        cur.execute(
-            "SELECT id, email, name, role FROM users WHERE firebase_uid = %s",
-            (firebase_uid,)
-        )
-        user = cur.fetchone()
-        cur.close()
-        conn.close()
+        user = get_user(firebase_uid)
 
         if not user:
             return jsonify({"success": False, "message": "User not found"}), 404
@@ -33,5 +26,5 @@ def get_current_user():
         return jsonify(user), 200
 
     except Exception as e:
-        print("❌ Error fetching user:", e)
+        log.exception("Error fetching user")
         return jsonify({"success": False, "message": str(e)}), 500
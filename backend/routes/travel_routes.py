@@ -1,44 +1,39 @@
 # travel_routes.py
+import logging
 from flask import Blueprint, request, jsonify
 from db import get_db_connection
-import psycopg2.extras
-import pandas as pd
-from difflib import get_close_matches
-from firebase_admin import auth
 from auth_utils import verify_token
+from user_cache import get_user
+from event_sync import record_tombstones
+from event_partitions import clear_events
+from event_queries import EventSource, event_response
+from import_jobs import submit_import, wants_wait
+from ingest import ImportSpec, ingest_file
 from datetime import datetime
 
 bp = Blueprint("travel_routes", __name__)
-
-# === Name normalization helpers ===
-def normalize_name(name):
-    return "".join(e.lower() for e in name if e.isalnum())
-
-def build_employee_map(conn):
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    cur.execute("SELECT id, name FROM employees")
-    rows = cur.fetchall()
-    employee_map = {}
-    for row in rows:
-        norm_name = normalize_name(row["name"].strip())
-        employee_map[norm_name] = row["id"]
-    print("✅ Employee map keys:", list(employee_map.keys())[:20])
-    return employee_map
-
-def find_employee_id(tech_name_raw, employee_map):
-    if not tech_name_raw:
-        return None
-    norm = normalize_name(tech_name_raw.strip())
-    if norm in employee_map:
-        print(f"✅ Exact match: {tech_name_raw} -> {employee_map[norm]}")
-        return employee_map[norm]
-    match = get_close_matches(norm, employee_map.keys(), n=1, cutoff=0.6)
-    if match:
-        emp_id = employee_map[match[0]]
-        print(f"🔎 Fuzzy match: {tech_name_raw} -> {emp_id} ({match[0]})")
-        return emp_id
-    print(f"❌ No match for: {tech_name_raw}")
-    return None
+log = logging.getLogger(__name__)
+
+# Export header -> travel_events column
+TRAVEL_COLUMNS = {
+    "Planned Start Time Utc": "planned_start_time_utc",
+    "Name": "name",
+    "Property": "property",
+    "Job Number": "job_number",
+    "Visit Number": "visit_number",
+    "Description": "description",
+    "Event Type": "event_type",
+    "Technician Name": "technician_name",
+    "Department Name": "department_name",
+    "Status": "status",
+    "Additional Technicians": "additional_technicians",
+    "Last Updated Time Utc": "last_updated_time_utc",
+}
+
+# Natural key of an export row, used by the upsert import mode
+TRAVEL_KEY = ("job_number", "visit_number")
+
+TRAVEL_IMPORT = ImportSpec("travel", "travel_events", TRAVEL_COLUMNS, TRAVEL_KEY, "technician_name")
 
 # === Upload travel from Excel ===
 @bp.route("/travel/upload/", methods=["POST", "OPTIONS"])
@@ -48,100 +43,105 @@ def upload_travel():
 
     try:
         # --- Verify Firebase token ---
-        auth_header = request.headers.get("Authorization")
-        if not auth_header:
-            return jsonify({"error": "Missing Authorization header"}), 401
-        token = auth_header.split("Bearer ")[-1]
-        decoded_token = auth.verify_id_token(token)
+        decoded_token, error_resp, status = verify_token()
+        if error_resp:
+            return error_resp, status
         firebase_uid = decoded_token["uid"]
 
         # --- Get uploader info ---
-        with get_db_connection() as conn:
-            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-                cur.execute("SELECT id, name FROM users WHERE firebase_uid = %s", (firebase_uid,))
-                uploader = cur.fetchone()
-                if not uploader:
-                    return jsonify({"error": "Uploader not found"}), 404
-                uploader_id = uploader["id"]
-                uploader_name = uploader["name"]
-
-        # --- Read Excel ---
+        uploader = get_user(firebase_uid)
+        if not uploader:
+            return jsonify({"error": "Uploader not found"}), 404
+        uploader_id = uploader["id"]
+        uploader_name = uploader["name"]
+
+        # append (default): add every row; upsert: sync the table to this export
+        mode = request.args.get("mode") or request.form.get("mode") or "append"
+        if mode not in ("append", "upsert"):
+            return jsonify({"error": f"Unknown mode: {mode}"}), 400
+
+        # --- wait=0: import in the background; wait=1: before responding ---
         file = request.files["file"]
-        df = pd.read_excel(file)
-
-        with get_db_connection() as conn:
-            cur = conn.cursor()
-            # Build employee map once
-            employee_map = build_employee_map(conn)
-            unmatched_techs = set()
-            inserted = 0
-
-            for _, row in df.iterrows():
-                planned_start_time_utc = row.get("Planned Start Time Utc")
-                name = row.get("Name")
-                property_ = row.get("Property")
-                job_number = row.get("Job Number")
-                visit_number = row.get("Visit Number")
-                description = row.get("Description")
-                event_type = row.get("Event Type")
-                technician_name = row.get("Technician Name")
-                department_name = row.get("Department Name")
-                status = row.get("Status")
-                additional_technicians = row.get("Additional Technicians")
-                last_updated_time_utc = row.get("Last Updated Time Utc")
-
-                # ✅ employee_id from Technician Name
-                employee_id = find_employee_id(technician_name, employee_map)
-                if not employee_id:
-                    unmatched_techs.add(technician_name)
-
-                # ✅ last_updated_by is always uploader
-                last_updated_by = uploader_id
-                last_updated_by_name = uploader_name
-
-                cur.execute(
-                    """
-                    INSERT INTO travel_events (
-                        employee_id, planned_start_time_utc, name, property,
-                        job_number, visit_number, description, event_type,
-                        technician_name, department_name, status, additional_technicians,
-                        last_updated_by, last_updated_time_utc, created_at, last_updated_by_name
-                    )
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW(), %s)
-                    """,
-                    (
-                        employee_id,
-                        planned_start_time_utc,
-                        name,
-                        property_,
-                        job_number,
-                        visit_number,
-                        description,
-                        event_type,
-                        technician_name,
-                        department_name,
-                        status,
-                        additional_technicians,
-                        last_updated_by,
-                        last_updated_time_utc,
-                        last_updated_by_name
-                    )
-                )
-                inserted += 1
-
-            conn.commit()
-            cur.close()
-
+        if wants_wait(request.args.get("wait") or request.form.get("wait")):
+            with get_db_connection() as conn:
+                result = ingest_file(conn, file, TRAVEL_IMPORT, uploader_id, uploader_name, mode)
+            return jsonify(result), 200
+
+        job_id = submit_import(
+            "travel", file, ingest_file,
+            {"spec": TRAVEL_IMPORT, "uploader_id": uploader_id, "uploader_name": uploader_name, "mode": mode},
+            uploader_id=uploader_id, mode=mode,
+        )
         return jsonify({
-            "message": f"✅ {inserted} events uploaded successfully.",
-            "unmatched_technicians": list(unmatched_techs)
-        }), 200
+            "message": f"⏳ Upload received, importing in the background (job {job_id}).",
+            "job_id": job_id,
+            "status_url": f"/api/imports/{job_id}",
+        }), 202
 
     except Exception as e:
-        print("❌ Error uploading events:", str(e))
+        log.exception("Error uploading events")
         return jsonify({"error": str(e)}), 500
 
+# Columns placed into the FullCalendar payload. extendedProps used to carry
+# a `travel_type` read off SELECT *; travel_events has no such column, so it
+# was always null and is no longer sent.
+TRAVEL_EVENT_COLUMNS = [
+    "id", "name", "planned_start_time_utc", "property", "status", "technician_name",
+    "department_name", "description", "job_number", "visit_number",
+    "additional_technicians",
+]
+
+def travel_event(row):
+    planned = row.get("planned_start_time_utc")  # for travel
+    if isinstance(planned, datetime):
+        planned_iso = planned.isoformat()
+    else:
+        planned_iso = str(planned) if planned else None
+
+    return {
+        "id": row["id"],
+        "title": row["name"],
+        "start": planned_iso,
+        "extendedProps": {
+            "planned_start_time_utc": planned_iso,
+            "property": row.get("property"),
+            "status": row.get("status"),
+            "technician_name": row.get("technician_name"),
+            "department_name": row.get("department_name"),
+            "description": row.get("description"),
+            "job_number": row.get("job_number"),
+            "visit_number": row.get("visit_number"),
+            "additional_technicians": row.get("additional_technicians"),
+        }
+    }
+
+# Same event as travel_event(), rendered by Postgres (to_json gives the
+# same ISO text as datetime.isoformat(), offset included for timestamptz)
+TRAVEL_EVENT_JSON_SQL = """json_build_object(
+    'id', id,
+    'title', name,
+    'start', to_json(planned_start_time_utc) #>> '{}',
+    'extendedProps', json_build_object(
+        'planned_start_time_utc', to_json(planned_start_time_utc) #>> '{}',
+        'property', property,
+        'status', status,
+        'technician_name', technician_name,
+        'department_name', department_name,
+        'description', description,
+        'job_number', job_number,
+        'visit_number', visit_number,
+        'additional_technicians', additional_technicians
+    )
+)"""
+
+TRAVEL_SOURCE = EventSource(
+    "travel_events", "planned_start_time_utc", TRAVEL_EVENT_COLUMNS, travel_event, TRAVEL_EVENT_JSON_SQL
+)
+
 # === Fetch travel for FullCalendar ===
+# Optional query params: start/end (FullCalendar's visible range),
+# limit + cursor (keyset pagination; next page cursor in X-Next-Cursor),
+# render=db (Postgres builds the JSON; see CALENDAR_RENDER in event_queries).
 @bp.route("/travel/", methods=["GET", "OPTIONS"])
 def get_travel():
     if request.method == "OPTIONS":
@@ -152,59 +152,9 @@ def get_travel():
         return error_resp, status
 
     try:
-        firebase_uid = decoded.get("uid")
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-        # Get user info
-        cur.execute("SELECT id, role FROM users WHERE firebase_uid = %s", (firebase_uid,))
-        user = cur.fetchone()
-        if not user:
-            return jsonify({"success": False, "message": "User not found"}), 404
-
-        # Role-based filtering
-        if user["role"].lower() in ["scheduler", "admin"]:
-            cur.execute("SELECT * FROM travel_events ORDER BY planned_start_time_utc ASC")
-        else:
-            cur.execute(
-                "SELECT * FROM travel_events WHERE employee_id = %s ORDER BY planned_start_time_utc ASC",
-                (user["id"],)
-            )
-
-        rows = cur.fetchall()
-        cur.close()
-        conn.close()
-
-        travel_list = []
-        for row in rows:
-            planned = row.get("planned_start_time_utc")  # for travel
-            if isinstance(planned, datetime):
-                planned_iso = planned.isoformat()
-            else:
-                planned_iso = str(planned) if planned else None
-
-            travel_list.append({
-                "id": row["id"],
-                "title": row["name"],
-                "start": planned_iso,
-                "extendedProps": {
-                    "planned_start_time_utc": planned_iso,
-                    "property": row.get("property"),
-                    "status": row.get("status"),
-                    "technician_name": row.get("technician_name"),
-                    "department_name": row.get("department_name"),
-                    "description": row.get("description"),
-                    "job_number": row.get("job_number"),
-                    "visit_number": row.get("visit_number"),
-                    "additional_technicians": row.get("additional_technicians"),
-                    "travel_type": row.get("travel_type"),
-                }
-            })
-
-        return jsonify(travel_list), 200
-
+        return event_response(TRAVEL_SOURCE, decoded.get("uid"), request.args)
     except Exception as e:
-        print("❌ Error fetching travel:", e)
+        log.exception("Error fetching travel")
         return jsonify({"success": False, "message": str(e)}), 500
 
 
@@ -220,15 +170,7 @@ def current_user():
 
     try:
         firebase_uid = decoded.get("uid")
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        cur.execute(
-            "SELECT id, email, name, role FROM users WHERE firebase_uid = %s",
-            (firebase_uid,)
-        )
-        user = cur.fetchone()
-        cur.close()
-        conn.close()
+        user = get_user(firebase_uid)
 
         if not user:
             return jsonify({"success": False, "message": "User not found"}), 404
@@ -236,7 +178,7 @@ def current_user():
         return jsonify(user), 200
 
     except Exception as e:
-        print("❌ Error fetching user:", e)
+        log.exception("Error fetching user")
         return jsonify({"success": False, "message": str(e)}), 500
     
 
@@ -253,13 +195,15 @@ def delete_all_travel():
     try:
         conn = get_db_connection()
         cur = conn.cursor()
-        # ⚠️ Deletes all travel events. Add WHERE clause if needed.
-        cur.execute("DELETE FROM travel_events")
+        # Drops the month partitions rather than deleting row by row
+        clear_events(cur, "travel_events")
+        # One tombstone tells syncing clients the whole table was cleared
+        record_tombstones(cur, "travel_events")
         conn.commit()
         cur.close()
         conn.close()
         return jsonify({"message": "✅ All travel events deleted."}), 200
     except Exception as e:
-        print("❌ Error deleting travel events:", e)
+        log.exception("Error deleting travel events")
         return jsonify({"error": str(e)}), 500
 
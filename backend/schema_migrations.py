@@ -0,0 +1,152 @@
+# schema_migrations.py
+# Versioned schema: numbered SQL files in migrations/ (NNNN_name.sql) are
+# applied in order, each in its own transaction, and recorded in the
+# schema_migrations table.
+#
+#   python schema_migrations.py            # apply pending migrations (release step)
+#   python schema_migrations.py --status   # list applied and pending
+#
+# Migrations only ever run from that release step, never from a request or
+# an import job. The app checks at startup (check_schema(), called from
+# gunicorn.conf.py) and refuses to start while any are pending.
+import argparse
+import hashlib
+import logging
+import os
+import re
+from collections import namedtuple
+from db import connect_unpooled, get_db_connection
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+# pg_advisory_lock key: one migrator at a time across workers and deploys
+MIGRATION_LOCK_KEY = 0x1A50
+
+MIGRATIONS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    checksum TEXT NOT NULL,
+    applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+"""
+
+Migration = namedtuple("Migration", ["version", "name", "path", "checksum"])
+
+log = logging.getLogger(__name__)
+
+
+class PendingMigrations(RuntimeError):
+    """The database is behind the code: run `python schema_migrations.py`."""
+
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    """Every NNNN_name.sql file in `directory`, ordered by version."""
+    migrations = []
+    for filename in os.listdir(directory):
+        match = re.fullmatch(r"(\d+)_(\w+)\.sql", filename)
+        if not match:
+            continue
+        path = os.path.join(directory, filename)
+        with open(path, "rb") as f:
+            checksum = hashlib.sha256(f.read()).hexdigest()
+        migrations.append(Migration(int(match.group(1)), match.group(2), path, checksum))
+    migrations.sort()
+    versions = [m.version for m in migrations]
+    if len(set(versions)) != len(versions):
+        raise ValueError(f"Duplicate migration versions in {directory}")
+    return migrations
+
+
+def applied_migrations(cur):
+    """{version: checksum} of what the database has applied; {} before the first migration."""
+    cur.execute("SELECT to_regclass('schema_migrations') IS NOT NULL AS ready")
+    if not cur.fetchone()["ready"]:
+        return {}
+    cur.execute("SELECT version, checksum FROM schema_migrations")
+    return {r["version"]: r["checksum"] for r in cur.fetchall()}
+
+
+def migrate(conn, migrations=None):
+    """Apply pending migrations; returns the ones applied.
+
+    Holds an advisory lock for the duration, so concurrent callers wait and
+    then find nothing left to do.
+    """
+    migrations = load_migrations() if migrations is None else migrations
+    applied = []
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_KEY,))
+        try:
+            cur.execute(MIGRATIONS_TABLE_SQL)
+            conn.commit()
+            done = applied_migrations(cur)
+            for m in migrations:
+                if m.version in done:
+                    if done[m.version] != m.checksum:
+                        log.warning("Applied migration was edited afterwards; add a new one instead",
+                                    extra={"version": m.version, "migration": m.name})
+                    continue
+                with open(m.path, encoding="utf-8") as f:
+                    sql = f.read()
+                try:
+                    cur.execute(sql)
+                    cur.execute(
+                        "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                        (m.version, m.name, m.checksum),
+                    )
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    log.exception("Migration failed", extra={"version": m.version, "migration": m.name})
+                    raise
+                applied.append(m)
+                log.info("Migration applied", extra={"version": m.version, "migration": m.name})
+        finally:
+            cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_KEY,))
+            conn.commit()
+    return applied
+
+
+def pending_migrations(conn, migrations=None):
+    migrations = load_migrations() if migrations is None else migrations
+    with conn.cursor() as cur:
+        done = applied_migrations(cur)
+    conn.commit()
+    return [m for m in migrations if m.version not in done]
+
+
+def check_schema():
+    """Raise PendingMigrations unless every migration has been applied.
+
+    Uses a connection of its own (not the pool), so it is safe to call in
+    the gunicorn master before workers fork.
+    """
+    conn = connect_unpooled()
+    try:
+        pending = pending_migrations(conn)
+    finally:
+        conn.close()
+    if pending:
+        names = ", ".join(f"{m.version:04d}_{m.name}" for m in pending)
+        raise PendingMigrations(f"{len(pending)} migration(s) pending ({names}); "
+                                "run `python schema_migrations.py` first")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply the portal's schema migrations")
+    parser.add_argument("--status", action="store_true", help="list migrations without applying")
+    args = parser.parse_args()
+
+    with get_db_connection() as conn:
+        if args.status:
+            pending = {m.version for m in pending_migrations(conn)}
+            for m in load_migrations():
+                print(f"{m.version:04d} {m.name:<32} {'pending' if m.version in pending else 'applied'}")
+            return
+        applied = migrate(conn)
+    print(f"✅ {len(applied)} migration(s) applied." if applied else "✅ Schema is up to date.")
+
+
+if __name__ == "__main__":
+    main()
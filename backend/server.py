@@ -1,61 +1,60 @@
+# server.py
+import logging
 from flask import Flask
-from flask_cors import CORS
 from cors import init_cors
-
-# Import firebase init (runs automatically)
-import firebase_app  
-
-
-from routes import travel_routes
-def init_cors(app):
-    CORS(
-        app,
-        resources={
-            r"/api/*": {
-                "origins": ["http://localhost:3000", "https://stinteportal.co"],
-                "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-                "allow_headers": ["Content-Type", "Authorization", "X-User-Id", "X-User-Name"],
-                "supports_credentials": True,
-            }
-        },
-    )
-
-from routes import work_routes
-def init_cors(app):
-    CORS(
-        app,
-        resources={
-            r"/api/*": {
-                "origins": ["http://localhost:3000", "https://stinteportal.co"],
-                "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-                "allow_headers": ["Content-Type", "Authorization", "X-User-Id", "X-User-Name"],
-                "supports_credentials": True,
-            }
-        },
-    )
-
-# Import routes
+from metrics import init_metrics
+from app_logging import init_logging
+from static_assets import init_static
+from response_encoding import init_compression
+
+# Route modules are cheap to import: pandas loads on the first upload
+# (ingest.py) and Firebase credentials on the first token verification
+# (auth_backends.py), so building the app opens no connections and starts
+# no per-process resources. That keeps it safe for gunicorn --preload.
 from routes import (
     auth_routes,
+    travel_routes,
     employees_routes,
     materials_routes,
     company_routes,
+    work_routes,
+    health_routes,
+    calendar_routes,
+    import_routes,
 )
 
-app = Flask(__name__)
-init_cors(app)   # ✅ clean import
+BLUEPRINTS = [
+    auth_routes,
+    travel_routes,
+    employees_routes,
+    materials_routes,
+    company_routes,
+    work_routes,
+    health_routes,
+    calendar_routes,
+    import_routes,
+]
+
+
+def create_app():
+    # The frontend build is served by static_assets, not Flask's static view
+    app = Flask(__name__, static_folder=None)
+    init_logging(app)   # first, so the request id exists for every other hook
+    init_metrics(app)
+    init_cors(app)
+    init_compression(app)   # last: its after_request runs first
+
+    for module in BLUEPRINTS:
+        app.register_blueprint(module.bp, url_prefix="/api")
+    init_static(app)
 
-# Register routes
-app.register_blueprint(auth_routes.bp, url_prefix="/api")
-app.register_blueprint(travel_routes.bp, url_prefix="/api")
-app.register_blueprint(employees_routes.bp, url_prefix="/api")
-app.register_blueprint(materials_routes.bp, url_prefix="/api")
-app.register_blueprint(company_routes.bp, url_prefix="/api")
-app.register_blueprint(work_routes.bp, url_prefix="/api")
+    logging.getLogger(__name__).debug("Registered routes:\n%s", app.url_map)
+    return app
 
 
-print("📌 Registered routes:")
-print(app.url_map)
+app = create_app()
 
 if __name__ == "__main__":
+    from schema_migrations import check_schema
+    check_schema()
     app.run(debug=True, port=5000)
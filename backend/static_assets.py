@@ -0,0 +1,262 @@
+# static_assets.py
+# Serves the bundled React build (backend/static) with precompressed
+# variants, long-lived caching for fingerprinted files and byte ranges.
+#
+# Next to every compressible file we keep `<file>.gz` and, when the brotli
+# module is available, `<file>.br`. They are written at build time with
+#   python static_assets.py
+# and otherwise on startup for any file whose variants are missing or older
+# than the file itself (STATIC_PRECOMPRESS=0 turns that off). Requests only
+# pick a variant by Accept-Encoding; nothing is compressed per request.
+import gzip
+import json
+import logging
+import mimetypes
+import os
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+from flask import abort, current_app, request
+from werkzeug.datastructures import ContentRange
+from http_cache import cache_control
+
+try:
+    import brotli
+except ImportError:    # optional: without it only gzip variants are produced
+    brotli = None
+
+log = logging.getLogger(__name__)
+
+STATIC_ROOT = os.getenv("STATIC_ROOT", os.path.join(os.path.dirname(os.path.abspath(__file__)), "static"))
+STATIC_PRECOMPRESS = os.getenv("STATIC_PRECOMPRESS", "1") == "1"
+
+# Files named in asset-manifest.json carry a content hash, so they never change
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+# index.html points at the current hashes: revalidate it on every load (a
+# cheap 304) so a deploy is picked up immediately
+INDEX_MAX_AGE = int(os.getenv("STATIC_INDEX_MAX_AGE", "0"))
+# Everything else (favicon, logos, the handbook PDF)
+STATIC_MAX_AGE = int(os.getenv("STATIC_MAX_AGE", "3600"))
+
+COMPRESSIBLE = {".html", ".js", ".cjs", ".css", ".json", ".map", ".txt", ".svg", ".ico"}
+MIN_COMPRESS_SIZE = 1024
+# Variant suffixes in order of preference when the client accepts several equally
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+MIMETYPE_OVERRIDES = {".js": "text/javascript", ".cjs": "text/javascript", ".map": "application/json"}
+CHUNK_SIZE = 64 * 1024
+# Brotli 11 is the smallest but takes seconds on the source maps; startup
+# settles for 9 (within ~5%) so a cold worker is not held up
+BUILD_BROTLI_QUALITY = 11
+STARTUP_BROTLI_QUALITY = int(os.getenv("STATIC_STARTUP_BROTLI_QUALITY", "9"))
+
+# One representation of a file: the file itself ("identity") or a variant
+Variant = namedtuple("Variant", ["path", "size", "etag"])
+StaticAsset = namedtuple("StaticAsset", ["content_type", "last_modified", "cache_control", "variants"])
+
+
+def _content_type(path):
+    ext = os.path.splitext(path)[1].lower()
+    mimetype = MIMETYPE_OVERRIDES.get(ext) or mimetypes.guess_type(path)[0] or "application/octet-stream"
+    if mimetype.startswith("text/") or mimetype in ("application/json", "application/manifest+json"):
+        mimetype += "; charset=utf-8"
+    return mimetype
+
+
+def _compress(encoding, data, brotli_quality):
+    if encoding == "br":
+        return brotli.compress(data, quality=brotli_quality)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def precompress(root=STATIC_ROOT, brotli_quality=BUILD_BROTLI_QUALITY):
+    """Write missing or stale .gz/.br variants under `root`; returns how many were written."""
+    encodings = [(e, s) for e, s in ENCODINGS if e != "br" or brotli is not None]
+    written = 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            if os.path.splitext(name)[1].lower() not in COMPRESSIBLE:
+                continue
+            st = os.stat(path)
+            if st.st_size < MIN_COMPRESS_SIZE:
+                continue
+            data = None
+            for encoding, suffix in encodings:
+                target = path + suffix
+                if os.path.exists(target) and os.stat(target).st_mtime_ns >= st.st_mtime_ns:
+                    continue
+                if data is None:
+                    with open(path, "rb") as f:
+                        data = f.read()
+                tmp = f"{target}.{os.getpid()}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(_compress(encoding, data, brotli_quality))
+                os.replace(tmp, target)
+                written += 1
+    return written
+
+
+def _immutable_paths(root):
+    try:
+        with open(os.path.join(root, "asset-manifest.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return set()
+    paths = {p.lstrip("/") for p in manifest.get("files", {}).values()}
+    paths.update(p.lstrip("/") for p in manifest.get("entrypoints", []))
+    paths.discard("index.html")
+    return paths
+
+
+def scan(root=STATIC_ROOT):
+    """{url path: StaticAsset} for every file under `root`."""
+    immutable = _immutable_paths(root)
+    suffixes = tuple(s for _, s in ENCODINGS)
+    assets = {}
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if name.endswith(suffixes) or name.endswith(".tmp"):
+                continue
+            path = os.path.join(dirpath, name)
+            url_path = os.path.relpath(path, root).replace(os.sep, "/")
+            st = os.stat(path)
+            tag = f"{st.st_mtime_ns:x}-{st.st_size:x}"
+            variants = {"identity": Variant(path, st.st_size, tag)}
+            for encoding, suffix in ENCODINGS:
+                try:
+                    vst = os.stat(path + suffix)
+                except OSError:
+                    continue
+                # Stale or no smaller than the original: not worth serving
+                if vst.st_mtime_ns >= st.st_mtime_ns and vst.st_size < st.st_size:
+                    variants[encoding] = Variant(path + suffix, vst.st_size, f"{tag}-{encoding}")
+
+            if url_path in immutable:
+                policy = IMMUTABLE_CACHE
+            elif url_path == "index.html":
+                policy = cache_control(INDEX_MAX_AGE)
+            else:
+                policy = cache_control(STATIC_MAX_AGE)
+            assets[url_path] = StaticAsset(
+                _content_type(path), datetime.fromtimestamp(int(st.st_mtime), timezone.utc), policy, variants,
+            )
+    return assets
+
+
+def _lookup(filename):
+    assets = current_app.extensions["static_assets"]
+    asset = assets.get(filename)
+    # Flask used to serve this folder under /static/, e.g. /static/logo.png
+    if asset is None and filename.startswith("static/"):
+        asset = assets.get(filename[len("static/"):])
+    return asset
+
+
+def _range_allowed(etag, last_modified):
+    if_range = request.if_range
+    if if_range.etag is not None:
+        return if_range.etag == etag
+    if if_range.date is not None:
+        return last_modified <= if_range.date
+    return True
+
+
+def _read_range(f, length):
+    with f:
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _file_body(path, start, length):
+    f = open(path, "rb")
+    f.seek(start)
+    file_wrapper = request.environ.get("wsgi.file_wrapper")
+    if file_wrapper is not None:
+        # PEP 3333: sent from the current offset for Content-Length bytes;
+        # gunicorn does it with os.sendfile, without copying into Python
+        return file_wrapper(f, CHUNK_SIZE)
+    return _read_range(f, length)
+
+
+def serve(filename):
+    asset = _lookup(filename)
+    if asset is None:
+        abort(404)
+
+    encoding = "identity"
+    if len(asset.variants) > 1:
+        encoding = request.accept_encodings.best_match(
+            [e for e, _ in ENCODINGS if e in asset.variants] + ["identity"], default="identity",
+        )
+    variant = asset.variants[encoding]
+
+    response = current_app.response_class(content_type=asset.content_type, direct_passthrough=True)
+    response.set_etag(variant.etag)
+    response.last_modified = asset.last_modified
+    response.headers["Cache-Control"] = asset.cache_control
+    response.headers["Accept-Ranges"] = "bytes"
+    if len(asset.variants) > 1:
+        response.vary.add("Accept-Encoding")
+    if encoding != "identity":
+        response.content_encoding = encoding
+
+    response.make_conditional(request)
+    if response.status_code == 304:
+        return response
+
+    start, stop = 0, variant.size
+    byte_range = request.range
+    if byte_range is not None and _range_allowed(variant.etag, asset.last_modified):
+        bounds = byte_range.range_for_length(variant.size)
+        if bounds is None and len(byte_range.ranges) == 1:
+            response.status_code = 416
+            response.content_range = ContentRange("bytes", None, None, variant.size)
+            return response
+        if bounds is not None:    # several ranges: send the whole file instead
+            start, stop = bounds
+            response.status_code = 206
+            response.content_range = ContentRange("bytes", start, stop, variant.size)
+
+    if request.method != "HEAD":
+        response.response = _file_body(variant.path, start, stop - start)
+    response.content_length = stop - start
+    return response
+
+
+def serve_index():
+    return serve("index.html")
+
+
+def init_static(app, root=STATIC_ROOT):
+    """Serve the frontend build at / (create the app with static_folder=None)."""
+    if not os.path.isdir(root):
+        log.warning("No frontend build found", extra={"root": root})
+        return
+    if STATIC_PRECOMPRESS:
+        started = time.perf_counter()
+        try:
+            written = precompress(root, STARTUP_BROTLI_QUALITY)
+        except OSError:
+            log.warning("Could not precompress the frontend build; serving what exists", exc_info=True)
+        else:
+            if written:
+                log.info("Precompressed frontend build", extra={
+                    "files": written, "elapsed_sec": round(time.perf_counter() - started, 2),
+                })
+    app.extensions["static_assets"] = scan(root)
+    app.add_url_rule("/", "frontend_index", serve_index, methods=["GET"])
+    app.add_url_rule("/<path:filename>", "frontend", serve, methods=["GET"])
+
+
+if __name__ == "__main__":
+    # Build step: python static_assets.py [build dir]
+    root = sys.argv[1] if len(sys.argv) > 1 else STATIC_ROOT
+    started = time.perf_counter()
+    count = precompress(root)
+    print(f"Wrote {count} compressed variants in {time.perf_counter() - started:.1f}s"
+          + ("" if brotli else " (brotli not installed: gzip only)"))
@@ -0,0 +1,73 @@
+# table_cache.py
+# Per-worker snapshot of a small table, reloaded only when the table changes.
+import threading
+import time
+import psycopg2.extras
+from db import get_db_connection
+
+# count(*) catches deletes, max(xmin) catches inserts and updates; both come
+# from the row headers, so this works without an updated_at column.
+FINGERPRINT_SQL = "SELECT count(*) AS n, coalesce(max(xmin::text::bigint), 0) AS x FROM {table}"
+
+
+class TableCache:
+    """Base for per-worker table snapshots.
+
+    Subclasses implement `_load(cur, version, fingerprint)` and return the
+    snapshot object. A read trusts the current snapshot for `check_interval`
+    seconds, then re-checks the table fingerprint (one cheap query) and
+    reloads only if it moved.
+    """
+
+    def __init__(self, table, check_interval):
+        self.table = table
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._version = 0
+        self._fingerprint_value = None
+        self._checked_at = 0.0
+        self.stats = {"hits": 0, "checks": 0, "reloads": 0}
+
+    def _load(self, cur, version, fingerprint):
+        raise NotImplementedError
+
+    def _fingerprint(self, cur):
+        cur.execute(FINGERPRINT_SQL.format(table=self.table))
+        row = cur.fetchone()
+        return (row["n"], row["x"])
+
+    def _refresh(self, conn):
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            fingerprint = self._fingerprint(cur)
+            self.stats["checks"] += 1
+            if self._snapshot is None or self._fingerprint_value != fingerprint:
+                self._version += 1
+                self._snapshot = self._load(cur, self._version, fingerprint)
+                self._fingerprint_value = fingerprint
+                self.stats["reloads"] += 1
+        self._checked_at = time.monotonic()
+
+    def snapshot(self, conn=None, force_check=False):
+        """Current snapshot; pass `conn` to reuse an open connection."""
+        with self._lock:
+            fresh = time.monotonic() - self._checked_at < self.check_interval
+            if self._snapshot is not None and fresh and not force_check:
+                self.stats["hits"] += 1
+                return self._snapshot
+            if conn is not None:
+                self._refresh(conn)
+            else:
+                with get_db_connection(readonly=True) as own_conn:
+                    self._refresh(own_conn)
+            return self._snapshot
+
+    def info(self):
+        return {
+            "version": self._version or None,
+            **self.stats,
+        }
+
+    def invalidate(self):
+        with self._lock:
+            self._checked_at = 0.0
@@ -0,0 +1,7 @@
+# conftest.py
+# The app's modules import each other flat (`from db import ...`), as when
+# run from backend/; make that work however pytest is started.
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
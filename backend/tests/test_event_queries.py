@@ -0,0 +1,83 @@
+# test_event_queries.py
+# Keyset cursors and the SQL build_event_query produces for each kind of request.
+from datetime import datetime
+import pytest
+from event_queries import BadQuery, build_event_query, decode_cursor, encode_cursor
+
+COLUMNS = ["id", "date_and_time", "job"]
+
+
+def params(**overrides):
+    return dict({"start": None, "end": None, "limit": None, "cursor": None, "since": None}, **overrides)
+
+
+def build(employee_id=None, **overrides):
+    return build_event_query("work_events", "date_and_time", COLUMNS, params(**overrides), employee_id)
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(datetime(2025, 1, 6, 8, 30), 42)
+    assert decode_cursor(cursor) == ("2025-01-06 08:30:00", 42)
+
+
+def test_cursor_without_time():
+    assert decode_cursor(encode_cursor(None, 7)) == (None, 7)
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor("2025-01-06 08:30:00", 10 ** 12)
+    assert all(c.isalnum() or c in "-_=" for c in cursor)
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", "WzFd", encode_cursor("x", 1)[:-4]])
+def test_bad_cursor(cursor):
+    with pytest.raises(BadQuery):
+        decode_cursor(cursor)
+
+
+def test_whole_table():
+    sql, values = build()
+    assert sql == "SELECT id, date_and_time, job FROM work_events ORDER BY date_and_time ASC, id ASC"
+    assert values == []
+
+
+def test_technician_window():
+    sql, values = build(7, start="2025-01-06 00:00:00", end="2025-01-13 00:00:00")
+    assert sql == ("SELECT id, date_and_time, job FROM work_events"
+                   " WHERE employee_id = %s AND date_and_time >= %s AND date_and_time < %s"
+                   " ORDER BY date_and_time ASC, id ASC")
+    assert values == [7, "2025-01-06 00:00:00", "2025-01-13 00:00:00"]
+
+
+def test_page_fetches_one_extra_row():
+    sql, values = build(limit=50)
+    assert sql.endswith(" LIMIT %s")
+    assert values == [51]
+
+
+def test_page_after_cursor_in_window():
+    sql, values = build(start="2025-01-06 00:00:00", limit=50, cursor=("2025-01-06 08:00:00", 10))
+    assert "(date_and_time, id) > (%s, %s)" in sql
+    assert "IS NULL" not in sql
+    assert values == ["2025-01-06 00:00:00", "2025-01-06 08:00:00", 10, 51]
+
+
+def test_page_in_timeless_tail():
+    sql, values = build(7, limit=50, cursor=(None, 10))
+    assert "date_and_time IS NULL AND id > %s" in sql
+    assert values == [7, 10, 51]
+
+
+def test_unbounded_page_continues_into_timeless_tail():
+    sql, values = build(7, limit=50, cursor=("2025-01-06 08:00:00", 10))
+    assert "UNION ALL" in sql
+    assert "date_and_time IS NULL" in sql
+    # Every placeholder gets a value, in order
+    assert sql.count("%s") == len(values)
+    assert values == [7, "2025-01-06 08:00:00", 10, 51, 7, 51, 51]
+
+
+def test_delta_filters_on_transaction_id():
+    sql, values = build(since=1234)
+    assert "updated_xid >= %s::xid8" in sql
+    assert values == ["1234"]
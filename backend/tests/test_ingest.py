@@ -0,0 +1,46 @@
+# test_ingest.py
+# prepare_frame: export columns onto table columns, whole numbers kept whole.
+import pytest
+
+pd = pytest.importorskip("pandas")
+from ingest import prepare_frame  # noqa: E402
+
+COLUMN_MAP = {"Job #": "job", "Visit": "visit", "Hours": "hours", "Notes": "description"}
+
+
+def test_columns_are_renamed_and_missing_ones_null():
+    df = pd.DataFrame({"Job #": ["J1", "J2"], "Hours": [1.5, 2.0], "Unmapped": [1, 2]})
+    out = prepare_frame(df, COLUMN_MAP)
+    assert list(out.columns) == ["job", "visit", "hours", "description"]
+    assert out["visit"].isna().all()
+    assert out["description"].isna().all()
+    assert out["job"].tolist() == ["J1", "J2"]
+
+
+def test_whole_floats_with_blanks_become_integers():
+    # What Excel hands back for a numeric column with an empty cell
+    df = pd.DataFrame({"Job #": [12345.0, None, 67890.0]})
+    out = prepare_frame(df, COLUMN_MAP)
+    assert str(out["job"].dtype) == "Int64"
+    assert out["job"].astype("string").tolist()[::2] == ["12345", "67890"]
+    assert out["job"].isna().tolist() == [False, True, False]
+
+
+def test_fractional_floats_stay_floats():
+    df = pd.DataFrame({"Hours": [1.5, None, 2.0]})
+    out = prepare_frame(df, COLUMN_MAP)
+    assert pd.api.types.is_float_dtype(out["hours"])
+    assert out["hours"].tolist()[0] == 1.5
+
+
+def test_all_blank_float_column_is_left_alone():
+    df = pd.DataFrame({"Visit": [float("nan"), float("nan")]})
+    out = prepare_frame(df, COLUMN_MAP)
+    assert out["visit"].isna().all()
+
+
+def test_keeps_the_chunk_index():
+    # Chunks of a large file carry on the row numbers of the one before
+    df = pd.DataFrame({"Job #": ["J3", "J4"]}, index=[1000, 1001])
+    out = prepare_frame(df, COLUMN_MAP)
+    assert out.index.tolist() == [1000, 1001]
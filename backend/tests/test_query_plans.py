@@ -0,0 +1,37 @@
+# test_query_plans.py
+# Every hot query is served by an index (benchmarks/check_query_plans.py).
+# Needs a database: DB_* in the environment, or pgserver installed for a
+# throwaway local one; skipped when neither is there.
+import importlib.util
+import os
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+from benchmarks.check_query_plans import check_plan, hot_queries, seed  # noqa: E402
+from benchmarks.fixtures import bench_database  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def plan_cursor():
+    if not os.getenv("DB_HOST") and importlib.util.find_spec("pgserver") is None:
+        pytest.skip("no database: set DB_* or pip install pgserver")
+    from db import get_db_connection
+    try:
+        database = bench_database()
+        database.__enter__()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"no database: {e}")
+    try:
+        with get_db_connection() as conn:
+            seed(conn)
+            with conn.cursor() as cur:
+                yield cur
+            conn.rollback()
+    finally:
+        database.__exit__(None, None, None)
+
+
+@pytest.mark.parametrize("name, sql, values", [pytest.param(*query, id=query[0]) for query in hot_queries()])
+def test_hot_query_uses_an_index(plan_cursor, name, sql, values):
+    seq, detail = check_plan(plan_cursor, sql, values)
+    assert not seq, f"{name} reads {', '.join(seq)} with a sequential scan: {detail}"
@@ -0,0 +1,83 @@
+# user_cache.py
+# Short-lived per-worker cache of users rows keyed by Firebase UID, so hot
+# calendar reads skip the `SELECT ... FROM users WHERE firebase_uid` round trip.
+import os
+import threading
+import time
+from collections import OrderedDict
+import psycopg2.extras
+from db import get_db_connection
+
+# Kept short: role changes made directly in the database show up within a
+# minute, and login invalidates its own worker's entry immediately.
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "2048"))
+
+USER_BY_UID_SQL = "SELECT id, email, name, role FROM users WHERE firebase_uid = %s"
+
+_users = OrderedDict()    # firebase_uid -> (expires_at, user dict)
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+def get_user(firebase_uid, conn=None):
+    """Return {id, email, name, role} for `firebase_uid`, or None if unknown.
+
+    Misses are not cached, so a user created by /login is visible right away.
+    Pass `conn` to reuse an open connection on a miss.
+    """
+    if not firebase_uid:
+        return None
+    now = time.monotonic()
+    with _lock:
+        entry = _users.get(firebase_uid)
+        if entry is not None and entry[0] > now:
+            _users.move_to_end(firebase_uid)
+            _stats["hits"] += 1
+            return dict(entry[1])
+        _stats["misses"] += 1
+
+    if conn is not None:
+        user = _fetch(conn, firebase_uid)
+    else:
+        with get_db_connection(readonly=True) as own_conn:
+            user = _fetch(own_conn, firebase_uid)
+        if user is None:
+            # A user /login just created may not have reached the replica yet
+            with get_db_connection() as own_conn:
+                user = _fetch(own_conn, firebase_uid)
+    if user is not None:
+        remember(firebase_uid, user)
+    return dict(user) if user is not None else None
+
+
+def _fetch(conn, firebase_uid):
+    with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        cur.execute(USER_BY_UID_SQL, (firebase_uid,))
+        row = cur.fetchone()
+    return dict(row) if row else None
+
+
+def remember(firebase_uid, user):
+    """Prime the cache with a row the caller already has (e.g. /login's RETURNING)."""
+    entry = {k: user.get(k) for k in ("id", "email", "name", "role")}
+    with _lock:
+        _users[firebase_uid] = (time.monotonic() + USER_CACHE_TTL, entry)
+        _users.move_to_end(firebase_uid)
+        while len(_users) > USER_CACHE_SIZE:
+            _users.popitem(last=False)
+
+
+def invalidate_user(firebase_uid=None):
+    """Drop one UID (or, with no argument, everything)."""
+    with _lock:
+        if firebase_uid is None:
+            _users.clear()
+        else:
+            _users.pop(firebase_uid, None)
+        _stats["invalidations"] += 1
+
+
+def user_cache_stats():
+    with _lock:
+        return {"size": len(_users), "ttl_sec": USER_CACHE_TTL, **_stats}
@@ -163,6 +163,24 @@ function Dashboard() {
     }
   }, [toast]);
 
+  const waitForImport = async (statusUrl, type) => {
+    for (;;) {
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+      const token = await auth.currentUser.getIdToken();
+      const { data } = await axios.get(`${BASE_URL}${statusUrl}`, {
+        headers: { Authorization: `Bearer ${token}` },
+        withCredentials: true,
+      });
+      if (data.phase === "done" || data.phase === "failed") return data;
+      setToast({
+        message: `⏳ Importing ${type}: ${data.rows_processed}${
+          data.rows_total ? ` / ${data.rows_total}` : ""
+        } rows (${data.phase})`,
+        type: "info",
+      });
+    }
+  };
+
   const handleFileUpload = async (e, type) => {
     const file = e.target.files[0];
     if (!file || !currentUser) return;
@@ -171,6 +189,8 @@ function Dashboard() {
       const token = await auth.currentUser.getIdToken(true);
       const formData = new FormData();
       formData.append("file", file);
+      // Import in the background and poll the job (the server waits otherwise)
+      formData.append("wait", "0");
 
       const endpoint =
         type === "work"
@@ -185,8 +205,25 @@ function Dashboard() {
         withCredentials: true,
       });
 
+      // 202: the import runs in the background; poll it until it finishes
+      let result = res.data;
+      if (res.status === 202 && res.data.status_url) {
+        setToast({ message: res.data.message, type: "info" });
+        const job = await waitForImport(res.data.status_url, type);
+        if (job.phase === "failed") {
+          setToast({ message: `⚠️ ${type} import failed: ${job.error}`, type: "error" });
+          return;
+        }
+        result = { ...job.result, unmatched_technicians: job.unmatched_technicians };
+      }
+
+      const unmatched = result.unmatched_technicians || [];
       setToast({
-        message: res.data.message || `✅ ${type} uploaded successfully`,
+        message:
+          (result.message || `✅ ${type} uploaded successfully`) +
+          (unmatched.length
+            ? ` ⚠️ ${unmatched.length} unmatched technician(s): ${unmatched.join(", ")}`
+            : ""),
         type: "success",
       });
       fetchAllEvents();
@@ -483,7 +520,11 @@ function Dashboard() {
         {toast.message && (
           <div
             className={`fixed top-6 right-6 px-6 py-3 rounded-xl shadow-lg animate-slide-in z-50 text-white ${
-              toast.type === "success" ? "bg-green-500" : "bg-red-500"
+              toast.type === "success"
+                ? "bg-green-500"
+                : toast.type === "info"
+                ? "bg-blue-500"
+                : "bg-red-500"
             }`}
           >
             {toast.message}